@@ -0,0 +1,270 @@
+# Command line entry point for batch jobs (cron, servers without a display):
+# imports, exports, usage reports and predictions without the Tk window.
+# Nothing here imports tkinter.
+#
+# Usage:
+#   python -m agri import supplies|suppliers FILE
+#   python -m agri export supplies|suppliers [--format "CSV (gzip)"]
+#                                           [--incremental]
+#   python -m agri report [--format json|csv] [--output FILE]
+#   python -m agri predict [--horizon DAYS] [--method M] [--seasonal]
+#                          [--growth-rate %] [--waste-rate %] [--workers N]
+#                          [--format json|csv] [--output FILE]
+import argparse
+import csv
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+from common import format_row_errors, json_default
+from database import close_pool, iter_supplier_items, iter_supply_items
+from exporters import EXPORT_OPTIONS, export_table
+from forecasting import (
+    FORECAST_METHODS,
+    PARALLEL_FORECAST_MIN_VALUES,
+    predict_usage,
+)
+from json_import import import_suppliers_file, import_supplies_file
+from records import SupplierRecord, SupplyRecord
+from usage_prediction import (
+    DEFAULT_GROWTH_RATE,
+    DEFAULT_HORIZON,
+    SEASON_LENGTH,
+    fetch_usage_series,
+    supplier_label,
+)
+from usage_report import fetch_sorted_usage
+
+# Tables that can be imported and exported: name -> (import function, items
+# of the export, fields)
+TABLES = {
+    "supplies": (import_supplies_file, iter_supply_items, SupplyRecord.FIELDS),
+    "suppliers": (import_suppliers_file, iter_supplier_items, SupplierRecord.FIELDS),
+}
+
+# Sections of the usage report, in the order of fetch_sorted_usage
+REPORT_SECTIONS = ("type", "name", "supplier", "month", "day")
+REPORT_FIELDS = ("section", "key", "quantity")
+PREDICTION_FIELDS = (
+    "type",
+    "name",
+    "supplier_id",
+    "supplier",
+    "total_used",
+    "daily_usage",
+    "predicted_usage",
+)
+
+
+# Timings of the stages of a command, printed as a summary at the end
+class StageTimer:
+    def __init__(self):
+        self.stages = []  # (stage, seconds)
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - start))
+
+    # Function to print the timing summary (on stderr, so the output of the
+    # command can be redirected)
+    def report(self, file=sys.stderr):
+        print("Timing summary:", file=file)
+        for name, seconds in self.stages:
+            print(f"  {name:<30} {seconds:8.3f} s", file=file)
+        total = time.perf_counter() - self.start
+        print(f"  {'total':<30} {total:8.3f} s", file=file)
+
+
+# Function to write rows (dicts) as a JSON array or as CSV, one row at a time
+def write_rows(rows, fields, output_format, text_file):
+    count = 0
+    if output_format == "csv":
+        writer = csv.DictWriter(text_file, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+
+    separator = "["
+    for row in rows:
+        text_file.write(f"{separator}\n    ")
+        text_file.write(json.dumps(row, default=json_default))
+        separator = ","
+        count += 1
+    text_file.write("[]\n" if separator == "[" else "\n]\n")
+    return count
+
+
+# Function to write the rows to the output file, or to stdout without one
+def write_output(rows, fields, args):
+    if args.output is None:
+        return write_rows(rows, fields, args.format, sys.stdout)
+    with open(args.output, "w", newline="") as text_file:
+        return write_rows(rows, fields, args.format, text_file)
+
+
+# Function to import a JSON file into a table
+def run_import(args, timer):
+    import_function = TABLES[args.table][0]
+    with timer.stage(f"import {args.table}"):
+        result = import_function(args.file)
+    print(f"{result.saved} of {result.read} {args.table} imported.", file=sys.stderr)
+    if result.errors:
+        print(
+            f"{len(result.errors)} skipped:\n{format_row_errors(result.errors)}",
+            file=sys.stderr,
+        )
+    return 1 if result.errors else 0
+
+
+# Function to export a table, streamed from the database
+def run_export(args, timer):
+    _, iter_items, fields = TABLES[args.table]
+    export_format, compression = EXPORT_OPTIONS[args.format]
+    with timer.stage(f"export {args.table}"):
+        result = export_table(
+            args.table,
+            iter_items,
+            fields,
+            export_format,
+            compression,
+            args.incremental,
+        )
+    print(f"Exported {result.rows} rows to {result.filename}.", file=sys.stderr)
+    return 0
+
+
+# Function to print the usage report read from the rollups
+def run_report(args, timer):
+    with timer.stage("read usage report"):
+        sections = fetch_sorted_usage()
+
+    rows = (
+        {"section": section, "key": key, "quantity": quantity}
+        for section, totals in zip(REPORT_SECTIONS, sections)
+        for key, quantity in totals
+    )
+    with timer.stage("write report"):
+        count = write_output(rows, REPORT_FIELDS, args)
+    print(f"{count} report rows written.", file=sys.stderr)
+    return 0
+
+
+# Function to print the usage predictions of every (type, name, supplier)
+def run_predict(args, timer):
+    with timer.stage("read suppliers"):
+        suppliers = dict(
+            (supplier_id, details["name"])
+            for supplier_id, details in iter_supplier_items()
+        )
+    with timer.stage("read usage series"):
+        series = fetch_usage_series()
+    with timer.stage(f"forecast {len(series.keys)} series"):
+        predictions = predict_usage(
+            series,
+            args.horizon,
+            args.method,
+            SEASON_LENGTH if args.seasonal else None,
+            args.growth_rate,
+            args.waste_rate,
+            args.workers,
+        )
+
+    rows = (
+        {
+            "type": supply_type,
+            "name": name,
+            "supplier_id": supplier_id,
+            "supplier": supplier_label(supplier_id, suppliers),
+            "total_used": total,
+            "daily_usage": daily,
+            "predicted_usage": predicted,
+        }
+        for (supply_type, name, supplier_id), total, daily, predicted in predictions
+    )
+    with timer.stage("write predictions"):
+        count = write_output(rows, PREDICTION_FIELDS, args)
+    print(f"{count} predictions written.", file=sys.stderr)
+    return 0
+
+
+# Function to build the command line parser
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m agri",
+        description="Agricultural input management batch jobs.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="import a JSON file")
+    import_parser.add_argument("table", choices=TABLES)
+    import_parser.add_argument("file")
+    import_parser.set_defaults(run=run_import)
+
+    export_parser = commands.add_parser("export", help="export a table")
+    export_parser.add_argument("table", choices=TABLES)
+    export_parser.add_argument(
+        "--format",
+        choices=EXPORT_OPTIONS,
+        default="JSON",
+        help="export format, as in the GUI (default: JSON)",
+    )
+    export_parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only export the rows created since the last export",
+    )
+    export_parser.set_defaults(run=run_export)
+
+    report_parser = commands.add_parser("report", help="print the usage report")
+    report_parser.set_defaults(run=run_report)
+
+    predict_parser = commands.add_parser("predict", help="predict the usage")
+    predict_parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON)
+    predict_parser.add_argument(
+        "--method", choices=FORECAST_METHODS, default="smoothing"
+    )
+    predict_parser.add_argument(
+        "--seasonal", action="store_true", help="weekly seasonality"
+    )
+    predict_parser.add_argument(
+        "--growth-rate", type=float, default=DEFAULT_GROWTH_RATE
+    )
+    predict_parser.add_argument("--waste-rate", type=float, default=0)
+    predict_parser.add_argument(
+        "--workers",
+        type=int,
+        help="forecasting processes, even for a small history (default: cores, "
+        f"only for histories of {PARALLEL_FORECAST_MIN_VALUES:,} values or more)",
+    )
+    predict_parser.set_defaults(run=run_predict)
+
+    for output_parser in (report_parser, predict_parser):
+        output_parser.add_argument("--format", choices=("json", "csv"), default="json")
+        output_parser.add_argument("--output", help="output file (default: stdout)")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    timer = StageTimer()
+    try:
+        return args.run(args, timer)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        timer.report()
+        close_pool()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
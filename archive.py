@@ -0,0 +1,90 @@
+# Job moving old soft deleted rows out of the supply and supplier tables into
+# supply_archive and supplier_archive, so the tables read by the app only
+# hold live rows and recent deletes. Schedule it (e.g. daily with cron):
+#
+# Usage: python archive.py [days]
+import os
+import sys
+from datetime import datetime, timedelta
+
+from database import get_backend
+
+# Soft deleted rows older than this are archived (overridable through an
+# environment variable)
+ARCHIVE_AFTER_DAYS = int(os.environ.get("AGRI_ARCHIVE_AFTER_DAYS", "90"))
+
+# Number of rows moved per transaction, so the tables are never locked long
+ARCHIVE_BATCH_SIZE = int(os.environ.get("AGRI_ARCHIVE_BATCH_SIZE", "1000"))
+
+
+# Function to move the rows returned by candidates_query to the archive, one
+# batch per transaction. Returns the number of rows moved.
+def archive_rows(
+    storage, candidates_query, archive_query, purge_query, cutoff, batch_size
+):
+    moved = 0
+    with storage.connection() as connection:
+        cursor = storage.cursor(connection, batch_size)
+        try:
+            while True:
+                # Archived rows leave the table, so each query returns the next batch
+                cursor.execute(candidates_query, {"cutoff": cutoff})
+                ids = [row[0] for row in cursor.fetchmany(batch_size)]
+                if not ids:
+                    break
+
+                storage.begin(cursor)
+                archived_at = datetime.now().replace(microsecond=0)
+                cursor.executemany(
+                    archive_query,
+                    [{"id": row_id, "archived_at": archived_at} for row_id in ids],
+                )
+                cursor.executemany(purge_query, [{"id": row_id} for row_id in ids])
+                connection.commit()
+                moved += len(ids)
+
+                if len(ids) < batch_size:
+                    break
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+    return moved
+
+
+# Function to archive the supplies and then the suppliers soft deleted more
+# than older_than_days ago. Returns the number of (supplies, suppliers) moved.
+def archive_deleted_rows(
+    older_than_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE
+):
+    storage = get_backend()
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+
+    # Supplies first: a supplier is only archived once no supply refers to it
+    supplies = archive_rows(
+        storage,
+        storage.SUPPLY_ARCHIVE_CANDIDATES_QUERY,
+        storage.SUPPLY_ARCHIVE_QUERY,
+        storage.SUPPLY_PURGE_QUERY,
+        cutoff,
+        batch_size,
+    )
+    suppliers = archive_rows(
+        storage,
+        storage.SUPPLIER_ARCHIVE_CANDIDATES_QUERY,
+        storage.SUPPLIER_ARCHIVE_QUERY,
+        storage.SUPPLIER_PURGE_QUERY,
+        cutoff,
+        batch_size,
+    )
+    return supplies, suppliers
+
+
+if __name__ == "__main__":
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else ARCHIVE_AFTER_DAYS
+    supplies, suppliers = archive_deleted_rows(days)
+    print(
+        f"Archived {supplies} supplies and {suppliers} suppliers "
+        f"deleted more than {days} days ago."
+    )
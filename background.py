@@ -0,0 +1,147 @@
+import queue
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk
+
+# Worker threads shared by every background task (database loads and saves)
+executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="db-worker")
+
+# Interval (ms) used to check for results posted by the worker threads
+POLL_INTERVAL = 50
+
+
+# Task that runs a function on a worker thread and delivers its progress and
+# result back on the Tk main thread. Tk widgets must only be touched from the
+# callbacks, never from the work function itself.
+class BackgroundTask:
+    def __init__(
+        self,
+        widget,
+        work,
+        on_done=None,
+        on_error=None,
+        on_progress=None,
+        on_cancel=None,
+    ):
+        self.widget = widget
+        self.work = work
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancel = on_cancel
+        self.messages = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.finished = False
+        self.finish_callbacks = []
+
+    # Function to start the work on the shared executor
+    def start(self):
+        executor.submit(self.run)
+        self.widget.after(POLL_INTERVAL, self.poll)
+        return self
+
+    # Function executed on the worker thread
+    def run(self):
+        try:
+            result = self.work(self)
+            self.messages.put(("done", result))
+        except Exception as e:
+            self.messages.put(("error", e))
+
+    # Function called by the work function to post partial results
+    def report(self, item):
+        if not self.cancelled:
+            self.messages.put(("progress", item))
+
+    # Function to request cancellation, checked by the work function
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    # Function to dispatch the posted messages on the Tk main thread
+    def poll(self):
+        while not self.finished:
+            try:
+                kind, payload = self.messages.get_nowait()
+            except queue.Empty:
+                break
+
+            if self.cancelled and kind != "error":
+                self.finished = True
+                if self.on_cancel:
+                    self.on_cancel()
+            elif kind == "progress":
+                if self.on_progress:
+                    self.on_progress(payload)
+            elif kind == "done":
+                self.finished = True
+                if self.on_done:
+                    self.on_done(payload)
+            else:
+                self.finished = True
+                if self.on_error:
+                    self.on_error(payload)
+
+        if not self.finished:
+            self.widget.after(POLL_INTERVAL, self.poll)
+        else:
+            for callback in self.finish_callbacks:
+                callback(self)
+
+
+# Function to run a function in the background and get its task
+def run_in_background(widget, work, **callbacks):
+    return BackgroundTask(widget, work, **callbacks).start()
+
+
+# Status bar with an indeterminate progress bar and a cancel button that is
+# shown while background tasks are running
+class ProgressIndicator:
+    def __init__(self, parent):
+        self.frame = tk.Frame(parent)
+        self.label = tk.Label(self.frame)
+        self.label.pack(side="left", padx=5)
+        self.progressbar = ttk.Progressbar(self.frame, mode="indeterminate", length=150)
+        self.progressbar.pack(side="left", padx=5)
+        self.btn_cancel = tk.Button(self.frame, text="Cancel", command=self.cancel)
+        self.btn_cancel.pack(side="left", padx=5)
+        self.tasks = {}
+
+    # Function to show the indicator until the task is over. Saves are not
+    # cancellable since their transaction may already be committed.
+    def track(self, task, text, cancellable=True):
+        self.tasks[task] = cancellable
+        task.finish_callbacks.append(self.untrack)
+        self.label.config(text=text)
+        self.update_cancel_button()
+        if len(self.tasks) == 1:
+            self.frame.pack(pady=5)
+            self.progressbar.start(10)
+        return task
+
+    # Function to enable the cancel button only for cancellable tasks
+    def update_cancel_button(self):
+        state = "normal" if any(self.tasks.values()) else "disabled"
+        self.btn_cancel.config(state=state)
+
+    # Function to update the text shown next to the progress bar
+    def set_text(self, text):
+        self.label.config(text=text)
+
+    # Function to hide the indicator once the task is over
+    def untrack(self, task):
+        self.tasks.pop(task, None)
+        self.update_cancel_button()
+        if not self.tasks:
+            self.progressbar.stop()
+            self.frame.pack_forget()
+
+    # Function to cancel every running cancellable task
+    def cancel(self):
+        for task, cancellable in self.tasks.items():
+            if cancellable:
+                task.cancel()
@@ -0,0 +1,58 @@
+# Benchmark: file size, time and peak memory of each export format, streaming
+# synthetic supplies like the database cursor does. The peak memory should
+# not grow with the number of rows.
+#
+# Usage: python -m benchmarks.bench_export_formats [rows]
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_record_memory import fetch_rows
+from database import supply_item_from_row
+from exporters import EXPORT_OPTIONS, export_table
+from records import SupplyRecord
+
+DEFAULT_ROWS = 100_000
+
+
+# Function to export the synthetic supplies in one format
+def export(count, export_format, compression):
+    return export_table(
+        "supplies",
+        lambda since=None: map(supply_item_from_row, fetch_rows(count)),
+        SupplyRecord.FIELDS,
+        export_format,
+        compression,
+    )
+
+
+def main(count):
+    print(f"{count} supplies")
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        for label, (export_format, compression) in EXPORT_OPTIONS.items():
+            start = time.perf_counter()
+            try:
+                result = export(count, export_format, compression)
+            except RuntimeError as e:
+                print(f"{label:14} skipped: {e}")
+                continue
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(result.filename)
+
+            # Peak memory is measured on a second run, tracing slows it down
+            tracemalloc.start()
+            export(count, export_format, compression)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(
+                f"{label:14} {size / 2**20:8.1f} MiB {elapsed:7.2f} s "
+                f"peak {peak / 2**20:6.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
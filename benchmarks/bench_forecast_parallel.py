@@ -0,0 +1,48 @@
+# Benchmark: parallel batch forecasting, in series per second at 1, 2, 4 and
+# N (all cores) worker processes, over 200k synthetic series of 365 days by
+# default. Every worker count must return exactly the serial forecasts.
+#
+# Usage: python -m benchmarks.bench_forecast_parallel [series] [days] [method]
+import os
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.bench_forecasting import HORIZON, make_history
+from forecasting import forecast_series, forecast_series_parallel
+
+DEFAULT_SERIES = 200_000
+DEFAULT_DAYS = 365
+
+
+def main(count, days, method):
+    history = make_history(count, days)
+    print(f"{count} series of {days} days, {method}, weekly seasonality")
+
+    start = time.perf_counter()
+    expected = forecast_series(history, HORIZON, method, 7)
+    elapsed = time.perf_counter() - start
+    print(f"{'serial':<12} {elapsed:8.3f} s {count / elapsed:12,.0f} series/s")
+
+    for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        forecast = forecast_series_parallel(
+            history, HORIZON, method, 7, workers=workers
+        )
+        elapsed = time.perf_counter() - start
+        print(
+            f"{f'{workers} workers':<12} {elapsed:8.3f} s"
+            f" {count / elapsed:12,.0f} series/s"
+        )
+        if not np.array_equal(forecast, expected):
+            sys.exit(f"{workers} workers: forecasts differ from the serial ones")
+    print("identical forecasts for every worker count")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SERIES,
+        int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_DAYS,
+        sys.argv[3] if len(sys.argv) > 3 else "holt",
+    )
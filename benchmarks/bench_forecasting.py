@@ -0,0 +1,129 @@
+# Benchmark: batch forecasting of many daily usage series at once (one
+# vectorized pass over the days for every series), at 50k synthetic series of
+# 90 days by default. A sample of the series is checked against a
+# straightforward per-series implementation of each method.
+#
+# Usage: python -m benchmarks.bench_forecasting [series]
+import sys
+
+import numpy as np
+
+from benchmarks.bench_usage_columnar import make_supplies, timed
+from forecasting import (
+    DEFAULT_ALPHA,
+    DEFAULT_BETA,
+    DEFAULT_PHI,
+    FORECAST_METHODS,
+    HISTORY_DAYS,
+    DailySeries,
+    forecast_series,
+    predict_usage,
+    series_from_snapshot,
+)
+from supply_snapshot import SupplySnapshot
+
+DEFAULT_SERIES = 50_000
+HORIZON = 30
+SAMPLE = 50
+
+
+# Function to forecast one series with plain Python, for the checks
+def reference_forecast(values, method, horizon, season_length=None):
+    values = list(values)
+    days = len(values)
+    seasonal = None
+    if season_length and days >= 2 * season_length:
+        means = []
+        for k in range(season_length):
+            position_values = values[k::season_length]
+            means.append(sum(position_values) / len(position_values))
+        mean = sum(means) / season_length
+        seasonal = [value - mean for value in means]
+        values = [value - seasonal[t % season_length] for t, value in enumerate(values)]
+
+    if method == "smoothing":
+        level = values[0]
+        for value in values[1:]:
+            level = DEFAULT_ALPHA * value + (1 - DEFAULT_ALPHA) * level
+        forecast = [level] * horizon
+    elif method == "holt":
+        level = values[0]
+        trend = 0
+        for value in values[1:]:
+            previous = level
+            level = DEFAULT_ALPHA * value + (1 - DEFAULT_ALPHA) * (
+                level + DEFAULT_PHI * trend
+            )
+            trend = (
+                DEFAULT_BETA * (level - previous)
+                + (1 - DEFAULT_BETA) * DEFAULT_PHI * trend
+            )
+        forecast = []
+        damping = 0
+        for h in range(1, horizon + 1):
+            damping += DEFAULT_PHI**h
+            forecast.append(level + trend * damping)
+    else:
+        t_mean = (days - 1) / 2
+        y_mean = sum(values) / days
+        slope = sum((t - t_mean) * (y - y_mean) for t, y in enumerate(values))
+        slope /= sum((t - t_mean) ** 2 for t in range(days))
+        forecast = [y_mean + slope * (t - t_mean) for t in range(days, days + horizon)]
+
+    if seasonal is not None:
+        forecast = [
+            value + seasonal[(days + h) % season_length]
+            for h, value in enumerate(forecast)
+        ]
+    return forecast
+
+
+# Function to build synthetic series: a level, a trend, a weekly pattern and
+# noise per series
+def make_history(count, days=HISTORY_DAYS):
+    rng = np.random.default_rng(42)
+    t = np.arange(days)
+    level = rng.uniform(5, 100, (count, 1))
+    trend = rng.normal(0, 0.2, (count, 1))
+    weekly = rng.uniform(0, 10, (count, 7))[:, t % 7]
+    noise = rng.normal(0, 3, (count, days))
+    return np.clip(level + trend * t + weekly + noise, 0, None)
+
+
+def main(count):
+    history = make_history(count)
+    print(f"{count} series of {history.shape[1]} days")
+
+    for method in FORECAST_METHODS:
+        for season_length in (None, 7):
+            label = f"forecast_series {method}" + (" weekly" if season_length else "")
+            forecast = timed(
+                label, forecast_series, history, HORIZON, method, season_length
+            )
+
+            for index in range(0, count, max(count // SAMPLE, 1)):
+                expected = reference_forecast(
+                    history[index].tolist(), method, HORIZON, season_length
+                )
+                if not np.allclose(forecast[index], expected):
+                    sys.exit(f"{label}: series {index} differs from the reference")
+
+    series = DailySeries([(None, str(i), None) for i in range(count)], history, None)
+    timed("predict_usage (holt weekly)", predict_usage, series, HORIZON, "holt", 7)
+
+    # End to end from the loaded supplies (offline mode)
+    supplies, _ = make_supplies(count * 4)
+    snapshot = timed("SupplySnapshot", SupplySnapshot, supplies)
+    series = timed("series_from_snapshot", series_from_snapshot, snapshot)
+    total = sum(
+        details["quantity"]
+        for details in supplies.values()
+        if details["created_at"][:10] >= str(series.start)
+    )
+    if series.history.sum() != total:
+        sys.exit("series_from_snapshot: quantities differ from the supplies")
+    print(f"{len(series.keys)} series from {len(supplies)} supplies, all checked")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SERIES)
@@ -0,0 +1,97 @@
+# Benchmark: rows/sec of the serial import versus the staged pipeline with
+# different numbers of validators and writers. The database is replaced by a
+# local stand-in that keeps the rows in a dict and waits a fixed round trip
+# per executemany batch, like a remote Oracle would. Every run must report
+# the same rows and the same errors, in the same order.
+#
+# 0 validators parse and validate in the calling thread, 0 writers is the
+# fully serial import.
+#
+# Usage: python -m benchmarks.bench_import_pipeline [rows] [round trip ms]
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_usage_columnar import make_supplies
+from json_import import import_supplies_file
+
+DEFAULT_ROWS = 200_000
+DEFAULT_ROUND_TRIP_MS = 20
+CONFIGURATIONS = [(0, 0), (0, 2), (0, 4), (1, 2), (2, 2), (2, 4), (4, 4)]
+
+
+# Local database stand-in: saves batches into a dict and rejects the
+# supplies whose quantity is 13, like a CHECK constraint would
+class StandInDatabase:
+    def __init__(self, round_trip):
+        self.round_trip = round_trip
+        self.rows = {}
+        self.lock = threading.Lock()
+
+    def save(self, batch, batch_size):
+        time.sleep(self.round_trip)
+        errors = {
+            supply_id: "ORA-02290: check constraint violated"
+            for supply_id, details in batch.items()
+            if details["quantity"] == 13
+        }
+        with self.lock:
+            self.rows.update(
+                (supply_id, details)
+                for supply_id, details in batch.items()
+                if supply_id not in errors
+            )
+        return errors
+
+
+# Function to write a supplies file where about 1% of the records are invalid
+def write_supplies_file(filename, count):
+    supplies, suppliers = make_supplies(count)
+    for index, details in enumerate(supplies.values()):
+        if index % 100 == 7:
+            details["type"] = "Unknown"
+    with open(filename, "w") as json_file:
+        json.dump(supplies, json_file, indent=4)
+    return set(suppliers)
+
+
+def main(count, round_trip_ms):
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "supplies.json")
+        supplier_ids = write_supplies_file(filename, count)
+        size = os.path.getsize(filename) / 2**20
+        print(f"{count} supplies ({size:.1f} MiB), {round_trip_ms} ms per batch")
+
+        reference = None
+        for validators, writers in CONFIGURATIONS:
+            database = StandInDatabase(round_trip_ms / 1000)
+            start = time.perf_counter()
+            result = import_supplies_file(
+                filename,
+                supplier_ids,
+                validators=validators,
+                writers=writers,
+                save=database.save,
+            )
+            elapsed = time.perf_counter() - start
+
+            outcome = (result.read, result.saved, list(result.errors.items()))
+            reference = reference or outcome
+            assert outcome == reference, "Results differ between configurations"
+            assert len(database.rows) == result.saved
+
+            label = f"{validators}v/{writers}w" if writers else "serial"
+            print(
+                f"{label:8} {elapsed:6.2f} s {count / elapsed:10.0f} rows/s "
+                f"({result.saved} saved, {len(result.errors)} errors)"
+            )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS,
+        float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_ROUND_TRIP_MS,
+    )
@@ -0,0 +1,90 @@
+# Benchmark: memory used by the in-memory supplies, as a dict of dicts (the
+# previous format) versus the RecordStore of __slots__ SupplyRecord objects.
+#
+# Usage: python -m benchmarks.bench_record_memory [rows]
+import random
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+from records import RecordStore, SupplyRecord
+from common import SUPPLY_TYPES
+
+DEFAULT_ROWS = 500_000
+
+
+# Function to generate rows like the ones fetched from the database, where
+# every string is a separate object
+def fetch_rows(count):
+    random.seed(42)
+    now = datetime.now()
+    for i in range(count):
+        supply_type = random.choice(list(SUPPLY_TYPES))
+        yield (
+            f"supply-{i:08d}",
+            "".join(random.choice(SUPPLY_TYPES[supply_type])),
+            random.randint(1, 100),
+            f"supplier-{random.randint(0, 200):04d}",
+            "".join(supply_type),
+            now - timedelta(seconds=random.randint(0, 365 * 24 * 3600)),
+        )
+
+
+# Function to load the rows as a dict of dicts with string timestamps
+def load_dicts(count):
+    return {
+        supply_id: {
+            "name": name,
+            "quantity": quantity,
+            "supplier": supplier_id,
+            "type": supply_type,
+            "created_at": created_at.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        for supply_id, name, quantity, supplier_id, supply_type, created_at in (
+            fetch_rows(count)
+        )
+    }
+
+
+# Function to load the rows into a record store
+def load_records(count):
+    store = RecordStore(SupplyRecord)
+    store.load_more(
+        (
+            supply_id,
+            {
+                "name": name,
+                "quantity": quantity,
+                "supplier": supplier_id,
+                "type": supply_type,
+                "created_at": created_at,
+            },
+        )
+        for supply_id, name, quantity, supplier_id, supply_type, created_at in (
+            fetch_rows(count)
+        )
+    )
+    return store
+
+
+# Function to measure the memory still allocated by the result of a loader
+def measure(loader, count):
+    tracemalloc.start()
+    data = loader(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return current
+
+
+def main(count):
+    dict_bytes = measure(load_dicts, count)
+    record_bytes = measure(load_records, count)
+    print(f"{count} supplies")
+    print(f"dict of dicts: {dict_bytes / 2**20:8.1f} MiB")
+    print(f"RecordStore:   {record_bytes / 2**20:8.1f} MiB")
+    print(f"ratio:         {dict_bytes / record_bytes:8.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
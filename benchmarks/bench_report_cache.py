@@ -0,0 +1,65 @@
+# Benchmark: usage report read from the rollups (cache miss) versus from the
+# report cache (hit), and the invalidation by a save. Prints the cache
+# counters (hits, misses, evictions, invalidations) at the end. Runs on the
+# configured backend (AGRI_DB_BACKEND=sqlite for the embedded file).
+#
+# Usage: python -m benchmarks.bench_report_cache [rows]
+import sys
+
+from benchmarks.bench_save_supplies import make_supplies
+from benchmarks.bench_usage_columnar import timed
+from change_set import ChangeTrackingDict
+from common import generate_unique_id, get_current_timestamp
+from database import save_suppliers, save_supplies
+from report_cache import report_cache
+from usage_report import fetch_sorted_usage
+
+DEFAULT_ROWS = 50_000
+
+
+# Function to soft delete the rows of the benchmark (the rollups are updated
+# by the save, like for a delete in the GUI)
+def delete_rows(rows, save):
+    tracked = ChangeTrackingDict()
+    tracked.load(list(rows.items()))
+    for row_id in rows:
+        tracked.mark_deleted(row_id)
+    save(tracked)
+
+
+def main(count):
+    supplier_id = generate_unique_id()
+    suppliers = {
+        supplier_id: {
+            "name": "Benchmark Supplier",
+            "email": "bench@example.com",
+            "created_at": get_current_timestamp(),
+        }
+    }
+    save_suppliers(suppliers)
+    supplies = make_supplies(count, supplier_id)
+    save_supplies(supplies)
+    print(f"{count} supplies")
+
+    try:
+        timed("usage report (miss)", fetch_sorted_usage)
+        timed("usage report (hit)", fetch_sorted_usage)
+
+        # A save changes the data version, the next read computes it again
+        new_supply = make_supplies(1, supplier_id)
+        save_supplies(new_supply)
+        supplies.update(new_supply)
+        timed("usage report (after a save)", fetch_sorted_usage)
+        timed("usage report (hit)", fetch_sorted_usage)
+    finally:
+        delete_rows(supplies, save_supplies)
+        delete_rows(suppliers, save_suppliers)
+
+    stats = report_cache.stats()
+    print(", ".join(f"{name} {value}" for name, value in stats.items()))
+    if (stats["hits"], stats["misses"], stats["invalidations"]) != (2, 2, 1):
+        sys.exit("Unexpected cache counters.")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
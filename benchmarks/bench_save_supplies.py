@@ -0,0 +1,73 @@
+# Benchmark: latency of saving one new supply as the supply table grows.
+# Runs on the configured backend: the Oracle database from docker-compose.yml
+# or, with AGRI_DB_BACKEND=sqlite, the embedded SQLite file.
+#
+# Usage: python -m benchmarks.bench_save_supplies [sizes...]
+import sys
+import time
+
+from change_set import ChangeTrackingDict
+from common import generate_unique_id, get_current_timestamp
+from database import get_connection, save_suppliers, save_supplies
+
+DEFAULT_SIZES = [1_000, 10_000, 50_000, 200_000]
+
+
+# Function to build synthetic supply rows for a benchmark supplier
+def make_supplies(count, supplier_id):
+    return {
+        generate_unique_id(): {
+            "name": "Urea",
+            "quantity": 1,
+            "supplier": supplier_id,
+            "type": "Fertilizers",
+            "created_at": get_current_timestamp(),
+        }
+        for _ in range(count)
+    }
+
+
+# Function to remove every row created by the benchmark
+def cleanup(supplier_id):
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        params = {"supplier_id": supplier_id}
+        cursor.execute("DELETE FROM supply WHERE supplier_id = :supplier_id", params)
+        cursor.execute("DELETE FROM supplier WHERE id = :supplier_id", params)
+        connection.commit()
+        cursor.close()
+
+
+def main(sizes):
+    supplier_id = generate_unique_id()
+    save_suppliers(
+        {
+            supplier_id: {
+                "name": "Benchmark Supplier",
+                "email": "bench@example.com",
+                "created_at": get_current_timestamp(),
+            }
+        }
+    )
+
+    supplies = ChangeTrackingDict()
+    try:
+        for size in sizes:
+            # Grow the table up to the requested size (not timed)
+            missing = size - len(supplies)
+            new_rows = make_supplies(missing, supplier_id)
+            save_supplies(new_rows)
+            supplies.load(list(supplies.items()) + list(new_rows.items()))
+
+            # Time the save that follows a single "Add Supply" click
+            supplies.update(make_supplies(1, supplier_id))
+            start = time.perf_counter()
+            save_supplies(supplies)
+            elapsed = time.perf_counter() - start
+            print(f"{size:>10} rows: save one supply in {elapsed * 1000:8.2f} ms")
+    finally:
+        cleanup(supplier_id)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
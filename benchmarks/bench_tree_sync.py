@@ -0,0 +1,74 @@
+# Microbenchmark: cost of showing one new row in a Treeview holding N rows,
+# rebuilding the whole table versus applying the change incrementally.
+# Requires a display (Tk).
+#
+# Usage: python -m benchmarks.bench_tree_sync [sizes...]
+import sys
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from common import TreeviewSync, generate_unique_id, get_current_timestamp
+
+DEFAULT_SIZES = [10_000, 100_000]
+COLUMNS = ("ID", "Name", "Quantity", "Supplier", "Type", "Created At")
+
+
+# Function to build N synthetic supply rows keyed by ID
+def make_rows(count):
+    rows = {}
+    for _ in range(count):
+        supply_id = generate_unique_id()
+        rows[supply_id] = (
+            supply_id,
+            "Urea",
+            1,
+            "Benchmark Supplier",
+            "Fertilizers",
+            get_current_timestamp(),
+        )
+    return rows
+
+
+# Function to clear the Treeview and insert every row again (previous behavior)
+def rebuild(tree, rows):
+    for item in tree.get_children():
+        tree.delete(item)
+    for values in rows.values():
+        tree.insert("", "end", values=values)
+
+
+def main(sizes):
+    root = tk.Tk()
+    root.withdraw()
+
+    for size in sizes:
+        rows = make_rows(size)
+
+        tree = ttk.Treeview(root, columns=COLUMNS, show="headings")
+        rebuild(tree, rows)
+        rows.update(make_rows(1))
+        start = time.perf_counter()
+        rebuild(tree, rows)
+        rebuild_time = time.perf_counter() - start
+        tree.destroy()
+
+        tree = ttk.Treeview(root, columns=COLUMNS, show="headings")
+        sync = TreeviewSync(tree)
+        sync.sync(list(rows.items()))
+        new_rows = make_rows(1)
+        start = time.perf_counter()
+        sync.apply(new_rows)
+        sync_time = time.perf_counter() - start
+        tree.destroy()
+
+        print(
+            f"{size:>10} rows: rebuild {rebuild_time * 1000:10.2f} ms, "
+            f"incremental {sync_time * 1000:8.3f} ms"
+        )
+
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,63 @@
+# Benchmark: cost of keeping the usage report up to date with running
+# aggregates (one O(1) update per added supply) versus recomputing it with
+# calculate_usage. The running totals are checked against the recompute after
+# the loads, after removals and after the windows moved forward in time.
+#
+# Usage: python -m benchmarks.bench_usage_aggregates [rows]
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.bench_usage_columnar import make_supplies, timed
+from usage_aggregates import UsageAggregates, check_consistency
+from usage_report import DAY_WINDOW, MONTH_WINDOW, calculate_usage
+
+DEFAULT_ROWS = 200_000
+
+
+# Function to stop the benchmark when the running totals drift
+def assert_consistent(label, usage, supplies, suppliers):
+    differences = check_consistency(usage, supplies, suppliers)
+    if differences:
+        sys.exit(f"{label}: {len(differences)} differences, e.g. {differences[:3]}")
+    print(f"{label:<40} consistent")
+
+
+def main(count):
+    supplies, suppliers = make_supplies(count)
+    print(f"{count} supplies")
+
+    usage = UsageAggregates(MONTH_WINDOW, DAY_WINDOW)
+    timed("UsageAggregates.add_many (load)", usage.add_many, supplies.values())
+    timed("calculate_usage (full recompute)", calculate_usage, supplies, suppliers)
+    assert_consistent("after load", usage, supplies, suppliers)
+
+    # One "Add Supply" click: a single update versus a full recompute
+    supply = dict(next(iter(supplies.values())))
+    supply["created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    supplies["new-supply"] = supply
+    start = time.perf_counter()
+    usage.add(supply)
+    elapsed = time.perf_counter() - start
+    print(f"{'UsageAggregates.add (one supply)':<40} {elapsed * 1e6:8.1f} us")
+    timed("calculate_usage (after one supply)", calculate_usage, supplies, suppliers)
+
+    # Deletes
+    random.seed(7)
+    for supply_id in random.sample(list(supplies), count // 10):
+        usage.remove(supplies.pop(supply_id))
+    assert_consistent("after removing 10%", usage, supplies, suppliers)
+
+    # The windows move forward: totals loaded 20 days ago must match the
+    # recompute of today once the old days expired
+    now = [datetime.now() - timedelta(days=20)]
+    later = UsageAggregates(MONTH_WINDOW, DAY_WINDOW, clock=lambda: now[0])
+    later.add_many(supplies.values())
+    now[0] = datetime.now()
+    timed("UsageAggregates.expire (20 days)", later.expire)
+    assert_consistent("after 20 days of expiry", later, supplies, suppliers)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
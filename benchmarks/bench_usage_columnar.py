@@ -0,0 +1,157 @@
+# Benchmark: row-at-a-time analytics versus the columnar NumPy path, at 1M
+# synthetic supplies by default. Both paths must return identical results.
+# The 30-day predictions below are the reference implementations of the
+# former prediction modal (the app now forecasts the daily usage series).
+#
+# Usage: python -m benchmarks.bench_usage_columnar [rows]
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import SUPPLY_TYPES, generate_unique_id
+from supply_snapshot import SupplySnapshot
+from usage_report import calculate_usage, calculate_usage_columnar
+
+DEFAULT_ROWS = 1_000_000
+
+
+# Function to build synthetic supplies spread over the last 120 days
+def make_supplies(count, supplier_count=200):
+    random.seed(42)
+    suppliers = {generate_unique_id(): f"Supplier {i}" for i in range(supplier_count)}
+    supplier_ids = list(suppliers)
+    now = datetime.now()
+    supplies = {}
+    for i in range(count):
+        supply_type = random.choice(list(SUPPLY_TYPES))
+        created_at = now - timedelta(seconds=random.randint(0, 120 * 24 * 3600))
+        supplies[f"supply-{i}"] = {
+            "name": random.choice(SUPPLY_TYPES[supply_type]),
+            "quantity": random.randint(1, 100),
+            "supplier": random.choice(supplier_ids),
+            "type": supply_type,
+            "created_at": created_at.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+    return supplies, suppliers
+
+
+# Function to filter supplies within the last 30 days and calculate daily usage.
+# supplies can be a dictionary or an iterable of (id, details) pairs.
+def filter_recent_supplies(supplies):
+    filtered_supplies = {}
+    today = datetime.now()
+    thirty_days_ago = today - timedelta(days=30)
+
+    items = supplies.items() if hasattr(supplies, "items") else supplies
+
+    for supply_id, details in items:
+        # Convert the 'created_at' field to a datetime object if it's a string
+        if isinstance(details["created_at"], str):
+            supply_date = datetime.strptime(details["created_at"], "%Y-%m-%d %H:%M:%S")
+        else:
+            supply_date = details["created_at"]
+
+        # If the supply was created within the last 30 days, include it
+        if supply_date is not None and supply_date >= thirty_days_ago:
+            filtered_supplies[supply_id] = details
+
+    return filtered_supplies
+
+
+# Function to calculate predicted usage based on actual usage over the past 30 days
+def calculate_predicted_usage(supplies, growth_rate, waste_rate):
+    predictions = {}
+    for supply_id, details in supplies.items():
+        # Assuming 'quantity' is the total amount used in the last 30 days
+        total_used = details["quantity"]
+
+        # Calculate daily usage as the total used divided by 30 days
+        daily_usage = total_used / 30 if total_used else 0
+
+        # Apply growth rate to future usage
+        future_usage = (daily_usage * 30) * (1 + growth_rate / 100)
+
+        # Add waste rate to future usage
+        future_usage = future_usage * (1 + waste_rate / 100)
+
+        predictions[details["name"]] = {
+            "Total Used (last 30 days)": total_used,
+            "Daily Usage (avg)": round(daily_usage, 2),
+            "Predicted Usage (next 30 days)": round(future_usage, 2),
+        }
+
+    return predictions
+
+
+# Function to get the rows of a SupplySnapshot created within the last 30
+# days, as a boolean mask (vectorized filter_recent_supplies)
+def filter_recent_snapshot(snapshot):
+    return snapshot.created_since(datetime.now() - timedelta(days=30))
+
+
+# Function to calculate the same predictions as calculate_predicted_usage
+# over the masked rows of a SupplySnapshot, with vectorized arithmetic
+def calculate_predicted_usage_columnar(snapshot, mask, growth_rate, waste_rate):
+    last_rows = snapshot.last_row_by_name(mask)
+    total_used = snapshot.quantity[[position for _, position in last_rows]]
+
+    # Daily usage over 30 days, then growth and waste rates applied
+    daily_usage = total_used / 30
+    future_usage = (daily_usage * 30) * (1 + growth_rate / 100)
+    future_usage = future_usage * (1 + waste_rate / 100)
+
+    predictions = {}
+    for (name, _), total, daily, future in zip(
+        last_rows, total_used.tolist(), daily_usage.tolist(), future_usage.tolist()
+    ):
+        predictions[name] = {
+            "Total Used (last 30 days)": total,
+            "Daily Usage (avg)": round(daily, 2) if total else 0,
+            "Predicted Usage (next 30 days)": round(future, 2),
+        }
+
+    return predictions
+
+
+# Function to time a call and return its result
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<40} {time.perf_counter() - start:8.3f} s")
+    return result
+
+
+def main(count):
+    supplies, suppliers = make_supplies(count)
+    print(f"{count} supplies")
+
+    expected_usage = timed("calculate_usage", calculate_usage, supplies, suppliers)
+    recent = timed("filter_recent_supplies", filter_recent_supplies, supplies)
+    expected_predictions = timed(
+        "calculate_predicted_usage", calculate_predicted_usage, recent, 10, 5
+    )
+
+    snapshot = timed("SupplySnapshot (build once)", SupplySnapshot, supplies)
+    usage = timed(
+        "calculate_usage_columnar", calculate_usage_columnar, snapshot, suppliers
+    )
+    mask = timed("filter_recent_snapshot", filter_recent_snapshot, snapshot)
+    predictions = timed(
+        "calculate_predicted_usage_columnar",
+        calculate_predicted_usage_columnar,
+        snapshot,
+        mask,
+        10,
+        5,
+    )
+
+    assert usage == expected_usage, "usage report differs"
+    assert list(predictions.items()) == list(
+        expected_predictions.items()
+    ), "predictions differ"
+    print("Results are identical.")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
@@ -0,0 +1,83 @@
+# Check: `agri report` and `agri predict` write only their data to stdout, so
+# it can be piped into another tool. Each command runs on a fresh embedded
+# database (the migrations are applied on the first connection), and then on
+# the same database after an import and an export; its stdout must parse as
+# JSON every time. Diagnostics go to stderr and are not checked.
+#
+# Usage: python -m benchmarks.check_cli_output
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMANDS = [["report"], ["predict"]]
+EXAMPLE_FILES = {
+    "suppliers": os.path.join(ROOT, "example_supplier_data.json"),
+    "supplies": os.path.join(ROOT, "example_supply_data.json"),
+}
+
+
+# Function to run the CLI on the database of env, from its temporary directory
+# (where the exports are written). Returns the completed process.
+def run_agri(arguments, env):
+    return subprocess.run(
+        [sys.executable, "-m", "agri", *arguments],
+        cwd=os.path.dirname(env["AGRI_SQLITE_PATH"]),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+
+# Function to run the data commands and check that their stdout is JSON.
+# Returns the failures.
+def check_commands(label, env):
+    failures = []
+    for arguments in COMMANDS:
+        name = " ".join(arguments)
+        process = run_agri(arguments, env)
+        if process.returncode != 0:
+            failures.append(f"{label}: agri {name} failed: {process.stderr.strip()}")
+            continue
+        try:
+            rows = json.loads(process.stdout)
+        except ValueError as e:
+            failures.append(f"{label}: agri {name} stdout is not JSON ({e})")
+            continue
+        print(f"{label}: agri {name} -> {len(rows)} rows")
+    return failures
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(
+            os.environ,
+            AGRI_DB_BACKEND="sqlite",
+            AGRI_SQLITE_PATH=os.path.join(directory, "check.db"),
+            PYTHONPATH=ROOT,
+        )
+        failures = check_commands("fresh database", env)
+
+        # Imports and exports report on stderr only
+        steps = [["import", table, path] for table, path in EXAMPLE_FILES.items()]
+        steps.append(["export", "supplies"])
+        for arguments in steps:
+            name = " ".join(arguments[:2])
+            process = run_agri(arguments, env)
+            if process.returncode != 0:
+                failures.append(f"agri {name} failed: {process.stderr.strip()}")
+            elif process.stdout.strip():
+                failures.append(f"agri {name} writes to stdout: {process.stdout}")
+        failures += check_commands("after import and export", env)
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit("CLI output checks failed.")
+    print("All CLI output checks passed.")
+
+
+if __name__ == "__main__":
+    main()
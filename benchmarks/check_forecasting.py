@@ -0,0 +1,100 @@
+# Check: the forecasts stay plausible on the series the app really has. Most
+# daily usage series are intermittent (a few days with usage, zeros
+# otherwise), so a lone recent delivery must not be extrapolated as a trend.
+# Fails when a forecast goes past the checks below. Needs no database.
+#
+# Usage: python -m benchmarks.check_forecasting
+import sys
+
+import numpy as np
+
+from forecasting import (
+    FORECAST_METHODS,
+    HISTORY_DAYS,
+    DailySeries,
+    forecast_series,
+    predict_usage,
+)
+
+HORIZON = 30
+SERIES = 10_000
+
+
+# Function to build intermittent series: usage on about one day in twenty,
+# with a random quantity, the last series only used on the last day
+def make_intermittent_history(count, days=HISTORY_DAYS):
+    rng = np.random.default_rng(7)
+    used = rng.random((count, days)) < 0.05
+    history = np.where(used, rng.integers(1, 20, (count, days)), 0).astype(float)
+    history[-1] = 0
+    history[-1, -1] = 6
+    return history
+
+
+# Function to check that no day of a forecast is above the largest daily usage
+# of its series (exponential smoothing and the damped trend cannot go further
+# on intermittent series)
+def check_upper_bound(history, method):
+    forecast = forecast_series(history, HORIZON, method)
+    excess = forecast.max(axis=1) - history.max(axis=1)
+    worst = int(np.argmax(excess))
+    if excess[worst] > 1e-9:
+        return (
+            f"{method}: series {worst} forecasts {forecast[worst].max():.2f} a day, "
+            f"more than its largest day ({history[worst].max():.2f})"
+        )
+    return None
+
+
+# Function to check that a steady trend is still followed (the damping only
+# levels it off over the horizon)
+def check_trend(method):
+    days = np.arange(HISTORY_DAYS, dtype=float)
+    history = (10 + 0.5 * days)[None, :]
+    forecast = forecast_series(history, HORIZON, method)[0]
+    if not (forecast[0] > history[0, -1] - 2 and np.all(np.diff(forecast) >= 0)):
+        return f"{method}: does not follow a rising series"
+    return None
+
+
+# Function to check that predicted totals are clipped at 0 as a whole, not day
+# by day (which would add the negative days back as usage)
+def check_clipping():
+    days = np.arange(HISTORY_DAYS, dtype=float)
+    history = np.stack([np.clip(40 - 0.5 * days, 0, None), np.full(HISTORY_DAYS, 3)])
+    series = DailySeries([("Seeds", "A", None), ("Seeds", "B", None)], history, None)
+    for method in FORECAST_METHODS:
+        expected = np.clip(
+            forecast_series(history, HORIZON, method).sum(axis=1), 0, None
+        )
+        predicted = sorted(row[3] for row in predict_usage(series, HORIZON, method))
+        if not np.allclose(predicted, sorted(np.round(expected, 2))):
+            return f"{method}: predicted totals {predicted}, expected {expected}"
+    return None
+
+
+def main():
+    history = make_intermittent_history(SERIES)
+    print(f"{SERIES} intermittent series of {HISTORY_DAYS} days")
+
+    failures = [
+        check_upper_bound(history, "smoothing"),
+        check_upper_bound(history, "holt"),
+        check_trend("holt"),
+        check_trend("linear"),
+        check_clipping(),
+    ]
+    for method in FORECAST_METHODS:
+        total = forecast_series(history[-1:], HORIZON, method).sum()
+        print(f"{method:<10} single use of 6 on the last day -> {total:8.2f}")
+
+    failures = [failure for failure in failures if failure]
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit("Forecast checks failed.")
+    print("All forecast checks passed.")
+
+
+if __name__ == "__main__":
+    main()
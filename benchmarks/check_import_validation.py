@@ -0,0 +1,116 @@
+# Check: records with an invalid created_at (not a string, or not a valid
+# 'YYYY-MM-DD HH:MM:SS' timestamp) are skipped and reported one by one, the
+# valid records of the same batch are imported, and the table can still be
+# read afterwards. Runs on the configured backend (AGRI_DB_BACKEND=sqlite for
+# the embedded file).
+#
+# Usage: python -m benchmarks.check_import_validation
+import json
+import os
+import sys
+import tempfile
+
+from benchmarks.bench_report_cache import delete_rows
+from common import generate_unique_id, get_current_timestamp
+from database import (
+    iter_supplier_items,
+    iter_supply_items,
+    save_suppliers,
+    save_supplies,
+)
+from json_import import import_suppliers_file, import_supplies_file
+
+# Invalid created_at values: label -> value
+BAD_CREATED_AT = {
+    "integer": 1700000000,
+    "out of range": "2024-13-45 99:00:00",
+    "not a date": "yesterday",
+}
+
+
+# Function to write records to a temporary JSON file
+def write_records(records):
+    json_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+    with json_file:
+        json.dump(records, json_file)
+    return json_file.name
+
+
+# Function to import the records of a file and check that exactly the bad
+# ones were skipped. Returns the failures.
+def check_import(label, import_file, records, bad_ids):
+    filename = write_records(records)
+    try:
+        result = import_file(filename)
+    finally:
+        os.remove(filename)
+
+    failures = []
+    if set(result.errors) != set(bad_ids):
+        failures.append(f"{label}: skipped {sorted(result.errors)}")
+    if result.saved != len(records) - len(bad_ids):
+        failures.append(f"{label}: {result.saved} of {len(records)} imported")
+    print(f"{label}: {result.saved} imported, {len(result.errors)} skipped")
+    for record_id, message in result.errors.items():
+        print(f"    {record_id}: {message}")
+    return failures
+
+
+def main():
+    now = get_current_timestamp()
+    supplier_id = generate_unique_id()
+
+    suppliers = {
+        supplier_id: {"name": "Check Supplier", "email": "c@x.io", "created_at": now}
+    }
+    supplies = {
+        generate_unique_id(): {
+            "name": "Urea",
+            "quantity": 1,
+            "supplier": supplier_id,
+            "type": "Fertilizers",
+            "created_at": now,
+        }
+    }
+    bad_suppliers = {
+        f"supplier {label}": {"name": "Bad", "email": "b@x.io", "created_at": value}
+        for label, value in BAD_CREATED_AT.items()
+    }
+    bad_supplies = {
+        f"supply {label}": dict(next(iter(supplies.values())), created_at=value)
+        for label, value in BAD_CREATED_AT.items()
+    }
+
+    failures = check_import(
+        "suppliers",
+        import_suppliers_file,
+        {**suppliers, **bad_suppliers},
+        bad_suppliers,
+    )
+    try:
+        failures += check_import(
+            "supplies",
+            import_supplies_file,
+            {**supplies, **bad_supplies},
+            bad_supplies,
+        )
+
+        # Every row can still be read back
+        try:
+            sum(1 for _ in iter_supply_items())
+            sum(1 for _ in iter_supplier_items())
+        except Exception as e:
+            failures.append(f"reading the tables fails: {e}")
+    finally:
+        delete_rows(supplies, save_supplies)
+        delete_rows(suppliers, save_suppliers)
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit("Import validation checks failed.")
+    print("All import validation checks passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Check: the queries of the app use the indexes created by migrations.py.
+# Seeds the supply table, asks the database for the plan of each query and
+# fails when the expected index is missing from it. Runs on the configured
+# backend (AGRI_DB_BACKEND=sqlite for the embedded file).
+#
+# Usage: python -m benchmarks.check_query_plans [rows]
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks.bench_save_supplies import cleanup, make_supplies
+from common import generate_unique_id, get_current_timestamp
+from database import get_backend, save_suppliers, save_supplies
+
+DEFAULT_ROWS = 20_000
+
+
+# Function to list the checks as (label, query, params, expected index)
+def query_plan_checks(storage):
+    since = datetime.now() - timedelta(days=30)
+    page_after = storage.PAGE_AFTER_CONDITION
+    return [
+        (
+            "supplies first page",
+            storage.SUPPLY_PAGE_QUERY.format(where=""),
+            {"limit": 100},
+            "supply_live_idx",
+        ),
+        (
+            "supplies next page",
+            storage.SUPPLY_PAGE_QUERY.format(where=page_after),
+            {"limit": 100, "created_at": since, "id": ""},
+            "supply_live_idx",
+        ),
+        (
+            "suppliers first page",
+            storage.SUPPLIER_PAGE_QUERY.format(where=""),
+            {"limit": 100},
+            "supplier_live_idx",
+        ),
+        (
+            "supplies created since (incremental export)",
+            storage.SUPPLY_SELECT_QUERY + storage.CREATED_SINCE_CONDITION,
+            {"since": since},
+            "supply_live_idx",
+        ),
+        (
+            "supplies of a supplier",
+            "SELECT COUNT(*) FROM supply WHERE supplier_id = :supplier_id",
+            {"supplier_id": ""},
+            "supply_supplier_idx",
+        ),
+        (
+            "usage by type and name over a window",
+            "SELECT type, name, SUM(quantity) FROM supply"
+            " WHERE created_at >= :since GROUP BY type, name",
+            {"since": since},
+            "supply_type_name_created_idx",
+        ),
+        (
+            "live supplies over a window",
+            "SELECT COUNT(*) FROM supply"
+            " WHERE deleted_at IS NULL AND created_at >= :since",
+            {"since": since},
+            "supply_live_idx",
+        ),
+    ]
+
+
+# Function to run the checks and print the plan of the failed ones.
+# Returns the number of failures.
+def check_query_plans(storage):
+    failures = 0
+    with storage.connection() as connection:
+        cursor = storage.cursor(connection)
+        try:
+            for label, query, params, index in query_plan_checks(storage):
+                plan = storage.explain(cursor, query, params)
+                if any(index.lower() in line.lower() for line in plan):
+                    print(f"ok    {label}: uses {index}")
+                else:
+                    failures += 1
+                    print(f"FAIL  {label}: does not use {index}")
+                    for line in plan:
+                        print(f"        {line}")
+        finally:
+            cursor.close()
+    return failures
+
+
+def main(rows):
+    storage = get_backend()
+    supplier_id = generate_unique_id()
+    save_suppliers(
+        {
+            supplier_id: {
+                "name": "Benchmark Supplier",
+                "email": "bench@example.com",
+                "created_at": get_current_timestamp(),
+            }
+        }
+    )
+
+    try:
+        save_supplies(make_supplies(rows, supplier_id))
+        failures = check_query_plans(storage)
+    finally:
+        cleanup(supplier_id)
+
+    if failures:
+        sys.exit(f"{failures} queries do not use their index.")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
@@ -0,0 +1,51 @@
+# Check: the modules imported at startup (main.py and the first page) stay
+# light. Each import runs in a fresh interpreter, which is timed and must not
+# load the heavy or deferred modules below (they are imported on first use).
+# Needs no display and no database.
+#
+# Usage: python -m benchmarks.check_startup
+import subprocess
+import sys
+
+# Modules imported at startup, each one timed in a fresh interpreter
+STARTUP_MODULES = ("main", "supply_page", "supplier_page")
+
+# Modules that must only be imported on first use
+DEFERRED_MODULES = (
+    "numpy",
+    "pyarrow",
+    "zstandard",
+    "oracledb",
+    "forecasting",
+    "predict_usage_modal",
+    "usage_report_modal",
+)
+
+CHECK_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(",".join(name for name in {deferred!r} if name in sys.modules))
+"""
+
+
+def main():
+    failed = False
+    for module in STARTUP_MODULES:
+        script = CHECK_SCRIPT.format(module=module, deferred=DEFERRED_MODULES)
+        output = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True
+        ).stdout.splitlines()
+        elapsed, loaded = float(output[0]), output[1] if len(output) > 1 else ""
+        status = f"imports {loaded}" if loaded else "ok"
+        print(f"import {module:<20} {elapsed:8.3f} s  {status}")
+        failed = failed or bool(loaded)
+
+    if failed:
+        sys.exit("Deferred modules are imported at startup.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# Check: the pending changes of the shared store survive its loads. A row
+# deleted or modified before its batch was read is not brought back by the
+# load, the observers are told about every deleted ID, loaded or not, and a
+# reload keeps the changes not saved yet.
+# Needs no display and no database: the rows are read from a list, and the
+# background callbacks are run by a polling loop instead of the Tk main loop.
+#
+# Usage: python -m benchmarks.check_store_changes
+import sys
+import time
+
+from data_store import StoreTable
+from records import RecordStore, SupplierRecord
+
+ROWS = [
+    (f"supplier-{i}", f"Supplier {i}", f"s{i}@example.com", None) for i in range(10)
+]
+
+
+# Stand-in for the Tk widget of the background tasks: after() callbacks are
+# queued and run by run_until_idle()
+class PollingWidget:
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, delay, callback):
+        self.callbacks.append(callback)
+
+    # Function to run the queued callbacks until the tasks are finished
+    def run_until_idle(self, timeout=5):
+        deadline = time.monotonic() + timeout
+        while self.callbacks and time.monotonic() < deadline:
+            callbacks, self.callbacks = self.callbacks, []
+            for callback in callbacks:
+                callback()
+            time.sleep(0.01)
+
+
+# Function to convert a fetched row to an (ID, details) pair
+def item_from_row(row):
+    supplier_id, name, email, created_at = row
+    return supplier_id, {"name": name, "email": email, "created_at": created_at}
+
+
+# Function to read the rows in batches of 3
+def fetch_rows(batch_size):
+    for start in range(0, len(ROWS), 3):
+        yield ROWS[start : start + 3]
+
+
+# Function to check that load_more keeps the pending changes
+def check_load_more():
+    records = RecordStore(SupplierRecord)
+    records.mark_deleted("supplier-1")
+    records["supplier-2"] = {"name": "Edited", "email": "e@x.io", "created_at": None}
+    loaded = records.load_more(item_from_row(row) for row in ROWS)
+
+    failures = []
+    if "supplier-1" in records:
+        failures.append("load_more brings back a deleted row")
+    if records["supplier-2"]["name"] != "Edited":
+        failures.append("load_more replaces a modified row")
+    if {key for key, _ in loaded} & {"supplier-1", "supplier-2"}:
+        failures.append("load_more returns rows it did not add")
+    if records.pending_changes().deleted != ["supplier-1"]:
+        failures.append("the delete of a row not loaded yet is not pending")
+    return failures
+
+
+# Function to check a delete while the rows are loading
+def check_store_table():
+    widget = PollingWidget()
+    table = StoreTable(SupplierRecord, fetch_rows, item_from_row)
+    events = []
+    table.subscribe(lambda event, data: events.append((event, data)))
+
+    table.load(widget)
+    table.delete(["supplier-4"])
+    widget.run_until_idle()
+
+    failures = []
+    removed = [data for event, data in events if event == "removed"]
+    if removed != [[("supplier-4", None)]]:
+        failures.append(f"delete of a row not loaded notifies {removed}")
+    batches = [key for event, data in events if event == "batch" for key, _ in data]
+    if "supplier-4" in batches or "supplier-4" in table.records:
+        failures.append("the load brings back a row deleted while loading")
+    if len(table.records) != len(ROWS) - 1 or not table.loaded:
+        failures.append(f"{len(table.records)} rows loaded")
+    return failures
+
+
+# Function to check that a reload keeps the changes not saved yet
+def check_reload():
+    widget = PollingWidget()
+    table = StoreTable(SupplierRecord, fetch_rows, item_from_row)
+    table.load(widget)
+    widget.run_until_idle()
+    table.delete(["supplier-5"])
+    table.put("supplier-6", {"name": "Edited", "email": "e@x.io", "created_at": None})
+    table.put("new", {"name": "New", "email": "n@x.io", "created_at": None})
+    pending = table.records.pending_changes()
+
+    events = []
+    table.subscribe(lambda event, data: events.append((event, data)))
+    table.load(widget, reload=True)
+    widget.run_until_idle()
+
+    failures = []
+    if table.records.pending_changes() != pending:
+        failures.append("the reload drops the pending changes")
+    if "supplier-5" in table.records:
+        failures.append("the reload brings back a deleted row")
+    if table.records.get("supplier-6", {}).get("name") != "Edited":
+        failures.append("the reload replaces a modified row")
+    if len(table.records) != len(ROWS):
+        failures.append(f"{len(table.records)} rows after the reload")
+    # The observers rebuilt from the batches see the same rows as the store
+    batches = {key for event, data in events if event == "batch" for key, _ in data}
+    if batches != set(table.records):
+        failures.append("the batches of the reload do not match the store")
+    return failures
+
+
+def main():
+    failures = check_load_more() + check_store_table() + check_reload()
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit("Store change checks failed.")
+    print("All store change checks passed.")
+
+
+if __name__ == "__main__":
+    main()
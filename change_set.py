@@ -0,0 +1,121 @@
+from collections import namedtuple
+
+# Snapshot of the pending changes of a tracked dictionary
+# (rows to upsert, IDs to delete and the generation of each change)
+ChangeSnapshot = namedtuple("ChangeSnapshot", ["upserts", "deleted", "generations"])
+
+
+# Dictionary that records which keys were inserted, updated or deleted since
+# the last successful save, so only the delta has to be written to the database
+class ChangeTrackingDict(dict):
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self._dirty = {}
+        self._deleted = {}
+        self._generation = 0
+        self.update(*args, **kwargs)
+
+    # Function to register a change for a key with a new generation number
+    def _mark(self, key, deleted=False):
+        self._generation += 1
+        if deleted:
+            self._dirty.pop(key, None)
+            self._deleted[key] = self._generation
+        else:
+            self._deleted.pop(key, None)
+            self._dirty[key] = self._generation
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._mark(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._mark(key, deleted=True)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return super().pop(key, *default)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._mark(key, deleted=True)
+        return key, value
+
+    def clear(self):
+        for key in list(self.keys()):
+            del self[key]
+
+    # Function to flag a row as modified after mutating its value in place
+    def mark_dirty(self, key):
+        if key in self:
+            self._mark(key)
+
+    # Function to delete a row by ID, even when it was not loaded (e.g. a row
+    # selected in a table while the rows are still loading)
+    def mark_deleted(self, key):
+        super().pop(key, None)
+        self._mark(key, deleted=True)
+
+    # Function to replace the content with rows that are already persisted
+    def load(self, items):
+        super().clear()
+        self._dirty.clear()
+        self._deleted.clear()
+        self.load_more(items)
+
+    # Function to drop the persisted rows before they are read again, keeping
+    # the pending changes: modified rows stay, deleted IDs stay deleted (the
+    # next load_more skips them). Returns the rows kept.
+    def unload(self):
+        kept = [(key, self[key]) for key in self._dirty]
+        super().clear()
+        for key, value in kept:
+            super().__setitem__(key, value)
+        return kept
+
+    # Function to add rows that are already persisted (e.g. a fetched batch).
+    # Rows with a pending change keep it: a row deleted or modified before its
+    # batch arrived is not brought back by the load. Returns the added rows.
+    def load_more(self, items):
+        loaded = []
+        for key, value in items:
+            if key in self._deleted or key in self._dirty:
+                continue
+            super().__setitem__(key, value)
+            loaded.append((key, value))
+        return loaded
+
+    # Function to check if there is anything left to save
+    def has_changes(self):
+        return bool(self._dirty or self._deleted)
+
+    # Function to get the rows that must be written on the next save
+    def pending_changes(self):
+        upserts = {key: self[key] for key in self._dirty}
+        generations = dict(self._dirty)
+        generations.update(self._deleted)
+        return ChangeSnapshot(upserts, list(self._deleted), generations)
+
+    # Function to forget the changes of a snapshot once they were saved,
+    # keeping the failed keys and any key modified again in the meantime
+    def mark_clean(self, snapshot, failed=()):
+        for key, generation in snapshot.generations.items():
+            if key in failed:
+                continue
+            if self._dirty.get(key) == generation:
+                del self._dirty[key]
+            if self._deleted.get(key) == generation:
+                del self._deleted[key]
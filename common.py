@@ -1,9 +1,26 @@
-from tkinter import filedialog
 from datetime import datetime
 import uuid
 import json
 import re
 
+# Predefined supply names for each type
+SUPPLY_TYPES = {
+    "Fertilizers": [
+        "Ammonium Nitrate",
+        "Monoammonium Phosphate (MAP)",
+        "Urea",
+        "Potassium Sulfate",
+        "Organic Fertilizers",
+    ],
+    "Seeds": [
+        "Soybean Seeds",
+        "Hybrid Corn Seeds",
+        "Cotton Seeds",
+        "Wheat Seeds",
+        "Barley Seeds",
+    ],
+}
+
 
 # Function to generate a unique ID (UUID)
 def generate_unique_id():
@@ -15,35 +32,139 @@ def get_current_timestamp():
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
+# Function to format a timestamp loaded from the database like the ones
+# generated by the app ('YYYY-MM-DD HH:MM:SS'), other values are kept as is
+def format_timestamp(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return value
+
+
 # Function to validate if an email is valid
 def is_valid_email(email):
     email_regex = r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$"
     return re.match(email_regex, email) is not None
 
 
-# Function to refresh dynamic data table in the GUI
+# Class to keep a Treeview in sync with rows keyed by ID. It maps each row
+# ID to its Treeview item, so changes only touch the affected items instead
+# of clearing and re-inserting the whole table.
+class TreeviewSync:
+    def __init__(self, tree):
+        self.tree = tree
+        self.items = {}  # Row ID -> Treeview item ID
+        self.values = {}  # Row ID -> values shown in the Treeview
+
+    def __contains__(self, row_id):
+        return row_id in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    # Function to insert a row, or update it if its values changed
+    def upsert(self, row_id, values, index="end"):
+        values = tuple(values)
+        item = self.items.get(row_id)
+        if item is None:
+            self.items[row_id] = self.tree.insert("", index, values=values)
+        elif self.values[row_id] != values:
+            self.tree.item(item, values=values)
+        self.values[row_id] = values
+
+    # Function to remove a row if it is shown
+    def delete(self, row_id):
+        item = self.items.pop(row_id, None)
+        if item is not None:
+            del self.values[row_id]
+            self.tree.delete(item)
+
+    # Function to get the row IDs of Treeview items (e.g. the selection)
+    def row_ids(self, items):
+        row_ids = {item: row_id for row_id, item in self.items.items()}
+        return [row_ids[item] for item in items if item in row_ids]
+
+    # Function to apply a change set: {row ID: values} upserts and deleted IDs
+    def apply(self, upserts, deleted=()):
+        for row_id in deleted:
+            self.delete(row_id)
+        for row_id, values in upserts.items():
+            self.upsert(row_id, values)
+
+    # Function to make the Treeview show exactly the given rows, in order,
+    # touching only the items that were added, changed or removed
+    def sync(self, rows):
+        row_ids = [row_id for row_id, _ in rows]
+        for row_id in self.items.keys() - set(row_ids):
+            self.delete(row_id)
+        for index, (row_id, values) in enumerate(rows):
+            self.upsert(row_id, values, index)
+        if [self.items[row_id] for row_id in row_ids] != list(self.tree.get_children()):
+            for index, row_id in enumerate(row_ids):
+                self.tree.move(self.items[row_id], "", index)
+
+
+# Function to refresh dynamic data table in the GUI. Only the rows that
+# changed since the previous refresh of the same tree are touched.
 def refresh_table(tree, data_dict):
-    for row in tree.get_children():
-        tree.delete(row)
-    for key, values in data_dict.items():
-        row_data = (key,) + tuple(values.values())
-        tree.insert("", "end", values=row_data)
+    if not hasattr(tree, "sync"):
+        tree.sync = TreeviewSync(tree)
+    tree.sync.sync(
+        [(key, (key,) + tuple(values.values())) for key, values in data_dict.items()]
+    )
 
 
-# Function to export data to JSON
-def export_data_to_json(data, filename):
+# Function to summarize per-row errors (row ID -> message) for a message box
+def format_row_errors(errors, limit=10):
+    lines = [f"{row_id}: {message}" for row_id, message in list(errors.items())[:limit]]
+    if len(errors) > limit:
+        lines.append(f"... and {len(errors) - limit} more")
+    return "\n".join(lines)
+
+
+# Function to serialize values json does not support (timestamps from the DB)
+def json_default(value):
+    if isinstance(value, datetime):
+        return format_timestamp(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Function to build a timestamped export file name ('<timestamp>_<name>.<ext>')
+def get_export_filename(filename, extension="json"):
     timestamp = datetime.now().isoformat()
     timestamp = timestamp.replace(":", "-").replace(".", "-")
-    json_filename = f"{timestamp}_{filename}.json"
+    return f"{timestamp}_{filename}.{extension}"
+
+
+# Function to write (key, value) pairs to an open file as one JSON object
+# (same layout as json.dump with indent=4), one entry at a time
+def write_json_items(items, json_file):
+    separator = "{"
+    for key, value in items:
+        entry = json.dumps(value, indent=4, default=json_default)
+        json_file.write(f"{separator}\n    {json.dumps(key)}: ")
+        json_file.write(entry.replace("\n", "\n    "))
+        separator = ","
+    json_file.write("{}" if separator == "{" else "\n}")
+
+
+# Function to export data to JSON. The data can be a dictionary or an iterable
+# of (key, value) pairs (e.g. streamed from the database): entries are written
+# one by one, so the whole export never has to be held in memory.
+def export_data_to_json(data, filename):
+    json_filename = get_export_filename(filename)
+    items = data.items() if hasattr(data, "items") else data
 
     with open(json_filename, "w") as json_file:
-        json.dump(data, json_file, indent=4)
+        write_json_items(items, json_file)
 
-    print(f"Exported data to {json_filename}.")
+    return json_filename
 
 
-# Function to import data from a JSON file
-def import_data_from_json():
+# Function to ask the user for a JSON file to import
+def ask_json_filename():
+    # Imported here so the modules using common run without a display
+    from tkinter import filedialog
+
     # Open file dialog to select the JSON file
     filename = filedialog.askopenfilename(
         title="Select a JSON file",
@@ -53,6 +174,13 @@ def import_data_from_json():
     if not filename:
         raise FileNotFoundError("No file was selected")
 
+    return filename
+
+
+# Function to import data from a JSON file
+def import_data_from_json():
+    filename = ask_json_filename()
+
     try:
         # Open and load the JSON file
         with open(filename, "r") as json_file:
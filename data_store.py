@@ -0,0 +1,178 @@
+from background import run_in_background
+from database import (
+    fetch_suppliers_iter,
+    fetch_supplies_iter,
+    supplier_item_from_row,
+    supply_item_from_row,
+)
+from records import RecordStore, SupplierRecord, SupplyRecord
+from supplier_index import SupplierIndex
+from usage_aggregates import UsageAggregates
+from usage_report import DAY_WINDOW, MONTH_WINDOW
+
+# Number of rows added to the store per batch while loading
+LOAD_BATCH_SIZE = 1000
+
+
+# One table of the shared store: its records, loaded once from the database
+# in the background, whatever the number of pages and modals reading them.
+# Observers are called on the Tk thread with (event, data):
+#   "reset": the records were cleared before a (re)load, except the rows
+#            with pending changes, sent right after as a "batch"
+#   "batch": rows read while loading, as a list of (ID, record) pairs (rows
+#            deleted or modified before they were read are left out)
+#   "loaded": every row was read
+#   "cancelled": the load was cancelled before every row was read (the next
+#                load() reads them again)
+#   "added": (ID, record) pairs added or replaced by the application
+#   "removed": (ID, record) pairs deleted by the application (the record is
+#              None for a row that was not loaded yet)
+#   "saved": the ChangeSnapshot of the changes written to the database
+class StoreTable:
+    def __init__(self, record_type, fetch_iter, item_from_row):
+        self.records = RecordStore(record_type)
+        self.fetch_iter = fetch_iter
+        self.item_from_row = item_from_row
+        self.observers = []
+        self.task = None  # Load in progress
+        self.loaded = False
+
+    # Function to subscribe an observer. Returns the function unsubscribing it.
+    def subscribe(self, observer):
+        self.observers.append(observer)
+        return lambda: self.observers.remove(observer)
+
+    def notify(self, event, data=None):
+        for observer in list(self.observers):
+            observer(event, data)
+
+    # Function to load the records in the background, unless they are loaded
+    # or loading already (reload=True reads them again, e.g. after an import;
+    # the changes not saved yet are kept).
+    # A cancelled or failed load is started again by the next call. Returns
+    # the load task, or None when nothing has to be read.
+    def load(self, widget, reload=False, on_error=None):
+        if self.task is not None and not self.task.finished:
+            if not reload:
+                return self.task
+            self.task.cancel()
+        elif self.loaded and not reload:
+            return None
+
+        kept = self.records.unload()
+        self.loaded = False
+        self.notify("reset")
+        if kept:
+            self.notify("batch", kept)
+
+        def work(task):
+            for rows in self.fetch_iter(LOAD_BATCH_SIZE):
+                if task.cancelled:
+                    return
+                task.report(rows)
+
+        def on_progress(rows):
+            items = self.records.load_more(self.item_from_row(row) for row in rows)
+            self.notify("batch", items)
+
+        # The callbacks of a load replaced by a reload are ignored
+        def on_done(result):
+            if self.task is task:
+                self.task = None
+                self.loaded = True
+                self.notify("loaded")
+
+        def on_cancel():
+            if self.task is task:
+                self.task = None
+                self.notify("cancelled")
+
+        def on_load_error(error):
+            if self.task is task:
+                self.task = None
+                if on_error:
+                    on_error(error)
+
+        task = self.task = run_in_background(
+            widget,
+            work,
+            on_done=on_done,
+            on_progress=on_progress,
+            on_error=on_load_error,
+            on_cancel=on_cancel,
+        )
+        return task
+
+    # Function to add (or replace) a record, saved with the pending changes
+    def put(self, record_id, details):
+        if record_id in self.records:
+            self.notify("removed", [(record_id, self.records[record_id])])
+        self.records[record_id] = details
+        self.notify("added", [(record_id, self.records[record_id])])
+
+    # Function to delete records by ID, even those not loaded yet (e.g.
+    # selected in a table while the rows are still loading)
+    def delete(self, record_ids):
+        removed = [(record_id, self.records.get(record_id)) for record_id in record_ids]
+        for record_id in record_ids:
+            self.records.mark_deleted(record_id)
+        self.notify("removed", removed)
+
+    # Function to forget the saved changes of a snapshot (the failed keys
+    # stay pending) and tell the observers
+    def saved(self, snapshot, errors=()):
+        self.records.mark_clean(snapshot, errors)
+        self.notify("saved", snapshot)
+
+
+# Shared in-process data of the pages and modals: the suppliers and supplies
+# tables, plus what is derived from them and kept up to date through their
+# notifications (the supplier index of the comboboxes and the running usage
+# totals of the reports).
+class DataStore:
+    def __init__(self):
+        self.suppliers = StoreTable(
+            SupplierRecord, fetch_suppliers_iter, supplier_item_from_row
+        )
+        self.supplies = StoreTable(
+            SupplyRecord, fetch_supplies_iter, supply_item_from_row
+        )
+        self.supplier_index = SupplierIndex()
+        self.usage = UsageAggregates(MONTH_WINDOW, DAY_WINDOW)
+        self.suppliers.subscribe(self.index_suppliers)
+        self.supplies.subscribe(self.aggregate_supplies)
+
+    # Function to keep the supplier index in sync with the suppliers (sorted
+    # once when the load is over, then updated one supplier at a time)
+    def index_suppliers(self, event, data):
+        if event == "reset":
+            self.supplier_index.load([])
+        elif event == "loaded":
+            self.supplier_index.load(
+                (supplier_id, details["name"])
+                for supplier_id, details in self.suppliers.records.items()
+            )
+        elif event == "added":
+            for supplier_id, details in data:
+                self.supplier_index.add(supplier_id, details["name"])
+        elif event == "removed":
+            for supplier_id, _ in data:
+                self.supplier_index.remove(supplier_id)
+
+    # Function to keep the running usage totals in sync with the supplies. The
+    # totals are only used once every supply was added.
+    def aggregate_supplies(self, event, data):
+        if event == "reset":
+            self.usage.clear()
+        elif event in ("batch", "added"):
+            self.usage.add_many(details for _, details in data)
+        elif event == "removed":
+            for _, details in data:
+                if details is not None:
+                    self.usage.remove(details)
+        elif event == "loaded":
+            self.usage.complete = True
+
+
+# Store shared by the pages and modals
+store = DataStore()
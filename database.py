@@ -1,139 +1,442 @@
-import oracledb
+import os
+import threading
+from datetime import datetime
+
+from change_set import ChangeSnapshot, ChangeTrackingDict
 from common import generate_unique_id, get_current_timestamp
+from migrations import migrate
+from rollups import UsageRollup, day_key
+
+# Storage backend: "oracle" (the database from docker-compose.yml) or
+# "sqlite" (embedded, for offline use and benchmarks)
+BACKEND = os.environ.get("AGRI_DB_BACKEND", "oracle")
+
+# Number of rows bound per executemany call when saving
+SAVE_BATCH_SIZE = int(os.environ.get("AGRI_SAVE_BATCH_SIZE", "1000"))
+
+# Number of rows fetched per round trip (cursor arraysize) when reading
+FETCH_BATCH_SIZE = int(os.environ.get("AGRI_FETCH_BATCH_SIZE", "1000"))
+
+# The backend is only created by the first database operation, so importing
+# this module (and starting the GUI) does not wait for the database
+backend = None
+backend_lock = threading.Lock()
+
+# Generation counter of the data, bumped by every committed save (including
+# the imports, which save through save_supplies and save_suppliers) and when
+# the backend is replaced. Cached reports are only reused for the same value.
+# The counter lives in this process: changes written by another process (the
+# command line, another GUI) are only seen after the next local save, or a
+# restart.
+data_version = 0
+data_version_lock = threading.Lock()
+
+
+# Function to get the class of a storage backend by name. The backend modules
+# are imported here, so only the driver of the selected one has to be
+# installed.
+def backend_class(name=BACKEND):
+    if name == "oracle":
+        from oracle_backend import OracleBackend
+
+        return OracleBackend
+    if name == "sqlite":
+        from sqlite_backend import SQLiteBackend
+
+        return SQLiteBackend
+    raise ValueError(f"Unknown storage backend: {name}")
+
+
+# Function to create a storage backend by name
+def create_backend(name=BACKEND):
+    return backend_class(name)()
+
+
+# Function to check if an error means that the database cannot be reached
+# (offline mode), as opposed to a rejected query or a bug, which have to be
+# reported
+def is_connection_error(error):
+    storage_type = type(backend) if backend is not None else None
+    if storage_type is None:
+        try:
+            storage_type = backend_class()
+        except (ImportError, ValueError):  # Driver missing or unknown backend
+            return False
+    return isinstance(error, storage_type.CONNECTION_ERRORS)
+
+
+# Function to get the storage backend, creating it on first use. The pending
+# schema migrations are applied before any other thread can use it.
+def get_backend():
+    global backend
+    with backend_lock:
+        if backend is None:
+            new_backend = create_backend()
+            try:
+                migrate(new_backend)
+            except Exception:
+                new_backend.close()
+                raise
+            backend = new_backend
+    return backend
+
+
+# Function to replace the storage backend (e.g. a SQLite file in benchmarks)
+def set_backend(new_backend):
+    global backend
+    close_pool()
+    with backend_lock:
+        migrate(new_backend)
+        backend = new_backend
+    bump_data_version()
+
+
+# Function to get the current data version
+def get_data_version():
+    return data_version
+
+
+# Function to signal that the data changed, invalidating cached reports
+def bump_data_version():
+    global data_version
+    with data_version_lock:
+        data_version += 1
+
+
+# Context manager to borrow a connection for one operation
+def get_connection():
+    return get_backend().connection()
+
+
+# Function to close the database connections when the application exits
+def close_pool():
+    global backend
+    with backend_lock:
+        if backend is not None:
+            backend.close()
+            backend = None
+
+
+# Function to stream the rows of a query in batches of tuples. The cursor
+# array size and prefetch are tuned to the batch size so each batch is one
+# round trip, and only one batch is held in memory at a time.
+def fetch_iter(query, params=None, batch_size=None):
+    batch_size = batch_size or FETCH_BATCH_SIZE
+    storage = get_backend()
+
+    with storage.connection() as connection:
+        cursor = storage.cursor(connection, batch_size)
+        try:
+            cursor.execute(query, params or [])
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+
+# Function to stream the rows of a select query, optionally only the rows
+# created after since (a datetime)
+def fetch_created_since_iter(query, since=None, batch_size=None):
+    if since is None:
+        return fetch_iter(query, batch_size=batch_size)
+    return fetch_iter(
+        query + get_backend().CREATED_SINCE_CONDITION,
+        {"since": since},
+        batch_size=batch_size,
+    )
+
+
+# Function to stream suppliers as batches of (id, name, email, created_at)
+def fetch_suppliers_iter(batch_size=None, since=None):
+    return fetch_created_since_iter(
+        get_backend().SUPPLIER_SELECT_QUERY, since, batch_size
+    )
+
+
+# Function to stream supplies as batches of
+# (id, name, quantity, supplier_id, type, created_at)
+def fetch_supplies_iter(batch_size=None, since=None):
+    return fetch_created_since_iter(
+        get_backend().SUPPLY_SELECT_QUERY, since, batch_size
+    )
+
+
+# Function to convert a supply row into an (id, details) pair in the format
+# used by the pages and the JSON files
+def supply_item_from_row(row):
+    supply_id, name, quantity, supplier_id, supply_type, created_at = row
+    return supply_id, {
+        "name": name,
+        "quantity": quantity,
+        "supplier": supplier_id,
+        "type": supply_type,
+        "created_at": created_at,
+    }
+
 
-# Database connection settings
-username = "dbuser"
-password = "dbpass"
-dsn = "localhost:1521/EIS"
+# Function to convert a supplier row into an (id, details) pair in the format
+# used by the pages and the JSON files
+def supplier_item_from_row(row):
+    supplier_id, name, email, created_at = row
+    return supplier_id, {"name": name, "email": email, "created_at": created_at}
 
-# Connect to the Oracle database
-connection = oracledb.connect(
-    user=username, password=password, dsn=dsn, mode=oracledb.DEFAULT_AUTH
-)
+
+# Function to stream supplies as (id, details) pairs
+def iter_supply_items(batch_size=None, since=None):
+    for rows in fetch_supplies_iter(batch_size, since):
+        for row in rows:
+            yield supply_item_from_row(row)
+
+
+# Function to stream suppliers as (id, details) pairs
+def iter_supplier_items(batch_size=None, since=None):
+    for rows in fetch_suppliers_iter(batch_size, since):
+        for row in rows:
+            yield supplier_item_from_row(row)
+
+
+# Function to fetch one page of rows with keyset pagination. after is the
+# last row of the previous page (None for the first page); its first value
+# is the ID and its last value is created_at.
+def fetch_page(query, after, limit):
+    storage = get_backend()
+    params = {"limit": limit}
+    where = ""
+    if after is not None:
+        where = storage.PAGE_AFTER_CONDITION
+        params.update({"id": after[0], "created_at": after[-1]})
+
+    with storage.connection() as connection:
+        cursor = storage.cursor(connection, limit)
+        try:
+            cursor.execute(query.format(where=where), params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+
+# Function to fetch a page of supplies as
+# (id, name, quantity, supplier name, type, created_at)
+def fetch_supplies_page(after=None, limit=100):
+    return fetch_page(get_backend().SUPPLY_PAGE_QUERY, after, limit)
+
+
+# Function to fetch a page of suppliers as (id, name, email, created_at)
+def fetch_suppliers_page(after=None, limit=100):
+    return fetch_page(get_backend().SUPPLIER_PAGE_QUERY, after, limit)
+
+
+# Function to compute the usage report totals from the rollup tables (one row
+# per group of each report section, flagged like Oracle's GROUPING). The
+# windows start on the days of month_since and day_since. Returns five
+# dictionaries (by type, name, supplier, month and day) of key -> quantity.
+def fetch_usage_report(month_since, day_since):
+    usage_by_type = {}
+    usage_by_name = {}
+    usage_by_supplier = {}
+    usage_by_month = {}
+    usage_by_day = {}
+
+    storage = get_backend()
+    with storage.connection() as connection:
+        cursor = storage.cursor(connection)
+        try:
+            cursor.execute(
+                storage.USAGE_REPORT_QUERY,
+                {"month_since": day_key(month_since), "day_since": day_key(day_since)},
+            )
+            for row in cursor:
+                by_type, by_name, by_supplier, by_month = row[:4]
+                supply_type, name, supplier, month, day, total = row[4:]
+                if not by_type:
+                    usage_by_type[supply_type] = total
+                elif not by_name:
+                    usage_by_name[name] = total
+                elif not by_supplier:
+                    usage_by_supplier[supplier] = total
+                elif not by_month:
+                    if month is not None:
+                        usage_by_month[month] = total
+                elif day is not None:
+                    usage_by_day[day] = total
+        finally:
+            cursor.close()
+
+    return usage_by_type, usage_by_name, usage_by_supplier, usage_by_month, usage_by_day
+
+
+# Function to fetch the daily usage since a day (a date or datetime) from the
+# daily rollup. Returns a list of (usage_day, type, name, supplier ID,
+# quantity) rows.
+def fetch_daily_usage(since):
+    storage = get_backend()
+    with storage.connection() as connection:
+        cursor = storage.cursor(connection)
+        try:
+            cursor.execute(storage.DAILY_USAGE_QUERY, {"since": day_key(since)})
+            return [tuple(row) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
 
 
 # Function to fetch all suppliers from the database
 def fetch_suppliers():
-    cursor = connection.cursor()
-    query = "SELECT id, name, email, created_at FROM supplier"
-    cursor.execute(query)
     suppliers = []
-    for row in cursor:
-        suppliers.append(
-            {"id": row[0], "name": row[1], "email": row[2], "created_at": row[3]}
-        )
-    cursor.close()
+    for rows in fetch_suppliers_iter():
+        for row in rows:
+            suppliers.append(
+                {"id": row[0], "name": row[1], "email": row[2], "created_at": row[3]}
+            )
     return suppliers
 
 
 # Function to fetch all supplies from the database
 def fetch_supplies():
-    cursor = connection.cursor()
-    query = "SELECT id, name, quantity, supplier_id, type, created_at FROM supply"
-    cursor.execute(query)
     supplies = []
-    for row in cursor:
-        supplies.append(
-            {
-                "id": row[0],
-                "name": row[1],
-                "quantity": row[2],
-                "supplier_id": row[3],
-                "type": row[4],
-                "created_at": row[5],
-            }
-        )
-    cursor.close()
+    for rows in fetch_supplies_iter():
+        for row in rows:
+            supplies.append(
+                {
+                    "id": row[0],
+                    "name": row[1],
+                    "quantity": row[2],
+                    "supplier_id": row[3],
+                    "type": row[4],
+                    "created_at": row[5],
+                }
+            )
     return supplies
 
 
-# Function to upsert many supplies in the database with rollback on error
-def save_supplies(supplies):
-    cursor = connection.cursor()
+# Function to split the data to save into the rows to upsert and the IDs to
+# delete. Tracked dictionaries only return what changed since the last save,
+# and a snapshot taken beforehand (e.g. on the GUI thread) is used as is.
+def get_pending_rows(data):
+    if isinstance(data, ChangeSnapshot):
+        return data.upserts, data.deleted, None
+    if isinstance(data, ChangeTrackingDict):
+        snapshot = data.pending_changes()
+        return snapshot.upserts, snapshot.deleted, snapshot
+    return data, [], None
 
-    try:
-        # For each supply in the dictionary, perform the UPSERT operation
-        for supply_id, details in supplies.items():
-            # Ensure created_at is in the correct format (assume it's already a string in 'YYYY-MM-DD HH24:MI:SS' format)
-            created_at = details.get("created_at", get_current_timestamp())
 
-            query = """
-                MERGE INTO supply s
-                USING (SELECT :1 AS id, :2 AS name, :3 AS quantity, :4 AS supplier_id, :5 AS type, TO_DATE(:6, 'YYYY-MM-DD HH24:MI:SS') AS created_at FROM dual) incoming
-                ON (s.id = incoming.id)
-                WHEN MATCHED THEN
-                    UPDATE SET s.name = incoming.name, s.quantity = incoming.quantity, s.supplier_id = incoming.supplier_id, s.type = incoming.type, s.created_at = incoming.created_at
-                WHEN NOT MATCHED THEN
-                    INSERT (s.id, s.name, s.quantity, s.supplier_id, s.type, s.created_at)
-                    VALUES (incoming.id, incoming.name, incoming.quantity, incoming.supplier_id, incoming.type, incoming.created_at)
-            """
+# Function to format created_at as 'YYYY-MM-DD HH24:MI:SS' (rows loaded from
+# Oracle carry a datetime, rows from JSON or the GUI carry a string)
+def format_created_at(details):
+    created_at = details.get("created_at") or get_current_timestamp()
+    if isinstance(created_at, datetime):
+        return created_at.strftime("%Y-%m-%d %H:%M:%S")
+    return created_at
 
-            cursor.execute(
-                query,
-                [
-                    supply_id,
-                    details["name"],
-                    details["quantity"],
-                    details["supplier"],
-                    details["type"],
-                    created_at,
-                ],
-            )
 
-        # Commit all changes to the database if no errors occur
-        connection.commit()
-
-    except Exception as e:
-        # If an error occurs, rollback the transaction
-        connection.rollback()
-        print(f"An error occurred: {e}")
-        raise  # Re-raise the exception to propagate it up the stack
-
-    finally:
-        # Close the cursor after the operation is complete
-        cursor.close()
-
-
-# Function to upsert many suppliers in the database with rollback on error
-def save_suppliers(suppliers):
-    cursor = connection.cursor()
-
-    try:
-        # For each supplier in the dictionary, perform the INSERT or UPDATE operation
-        for supplier_id, details in suppliers.items():
-            created_at = details.get("created_at", get_current_timestamp())
-
-            # UPSERT supplier (Insert if not exists, otherwise update)
-            query = """
-                MERGE INTO supplier s
-                USING (SELECT :1 AS id, :2 AS name, :3 AS email, TO_DATE(:4, 'YYYY-MM-DD HH24:MI:SS') AS created_at FROM dual) incoming
-                ON (s.id = incoming.id)
-                WHEN MATCHED THEN
-                    UPDATE SET s.name = incoming.name, s.email = incoming.email, s.created_at = incoming.created_at
-                WHEN NOT MATCHED THEN
-                    INSERT (s.id, s.name, s.email, s.created_at)
-                    VALUES (incoming.id, incoming.name, incoming.email, incoming.created_at)
-            """
+# Function to run a statement over many rows with array binding.
+# Each item of rows is a (row_id, bind_values) pair. Rows rejected by the
+# database do not abort the batch: their errors are returned by row ID.
+def execute_many_in_batches(storage, cursor, query, rows, batch_size=None):
+    batch_size = batch_size or SAVE_BATCH_SIZE
+    errors = {}
 
-            cursor.execute(
-                query,
-                [
-                    supplier_id,
-                    details["name"],
-                    details["email"],
-                    created_at,
-                ],
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start : start + batch_size]
+        values = [row_values for _, row_values in batch]
+        for offset, message in storage.execute_many(cursor, query, values):
+            errors[batch[offset][0]] = message
+
+    return errors
+
+
+# Function to write upserts and soft deletes in bulk and commit them. rollup
+# (e.g. UsageRollup) is given the saved rows to update aggregate tables in
+# the same transaction. Returns a dictionary of row ID -> error message for
+# the rejected rows.
+def save_rows(
+    data, upsert_query, delete_query, to_bind_values, batch_size, rollup=None
+):
+    rows, deleted_ids, snapshot = get_pending_rows(data)
+    if not rows and not deleted_ids:
+        return {}
+
+    storage = get_backend()
+    with storage.connection() as connection:
+        cursor = storage.cursor(connection)
+
+        try:
+            storage.begin(cursor)
+            upserts = [
+                (row_id, to_bind_values(row_id, details))
+                for row_id, details in rows.items()
+            ]
+            if rollup is not None:
+                tracker = rollup(storage, cursor)
+                tracker.load_previous(list(rows) + list(deleted_ids))
+            errors = execute_many_in_batches(
+                storage, cursor, upsert_query, upserts, batch_size
             )
 
-        # Commit all changes to the database if no errors occur
-        connection.commit()
+            deletes = [(row_id, [row_id]) for row_id in deleted_ids]
+            errors.update(
+                execute_many_in_batches(
+                    storage, cursor, delete_query, deletes, batch_size
+                )
+            )
+
+            if rollup is not None:
+                tracker.apply(dict(upserts), errors)
+
+            # Commit the accepted rows, the rejected ones are reported to the caller
+            connection.commit()
+
+        except Exception:
+            # If the whole operation fails, rollback the transaction
+            connection.rollback()
+            raise  # Re-raise the exception to propagate it up the stack
+
+        finally:
+            # Close the cursor after the operation is complete
+            cursor.close()
+
+    bump_data_version()
+
+    # Rejected rows stay pending so they are retried on the next save
+    if snapshot is not None:
+        data.mark_clean(snapshot, errors)
+
+    return errors
+
+
+# Function to upsert many supplies in the database in batches
+def save_supplies(supplies, batch_size=None):
+    return save_rows(
+        supplies,
+        get_backend().SUPPLY_UPSERT_QUERY,
+        get_backend().SUPPLY_DELETE_QUERY,
+        lambda supply_id, details: [
+            supply_id,
+            details["name"],
+            details["quantity"],
+            details["supplier"],
+            details["type"],
+            format_created_at(details),
+        ],
+        batch_size,
+        rollup=UsageRollup,
+    )
 
-    except Exception as e:
-        # Rollback if any error occurs
-        connection.rollback()
-        print(f"An error occurred while saving suppliers: {e}")
-        raise  # Re-raise the exception to propagate it
 
-    finally:
-        # Ensure the cursor is closed after operation
-        cursor.close()
+# Function to upsert many suppliers in the database in batches
+def save_suppliers(suppliers, batch_size=None):
+    return save_rows(
+        suppliers,
+        get_backend().SUPPLIER_UPSERT_QUERY,
+        get_backend().SUPPLIER_DELETE_QUERY,
+        lambda supplier_id, details: [
+            supplier_id,
+            details["name"],
+            details["email"],
+            format_created_at(details),
+        ],
+        batch_size,
+    )
@@ -0,0 +1,246 @@
+import csv
+import gzip
+import json
+import os
+from collections import namedtuple
+from datetime import datetime
+from common import format_timestamp, get_export_filename, json_default, write_json_items
+
+# Optional dependencies: zstd compression and the Parquet/Arrow formats are
+# only available when the packages are installed. They are imported by the
+# exports that use them (pyarrow alone takes longer to import than the rest
+# of the application).
+
+# Number of rows per Parquet/Arrow record batch and between progress reports
+EXPORT_BATCH_SIZE = 10000
+
+# File keeping the created_at of the newest row of the last export per table
+# and the IDs of the rows exported with that created_at, used by the
+# incremental exports
+EXPORT_STATE_FILE = "export_state.json"
+
+# Export options shown in the GUI: label -> (format, compression)
+EXPORT_OPTIONS = {
+    "JSON": ("json", None),
+    "JSON (gzip)": ("json", "gz"),
+    "NDJSON": ("ndjson", None),
+    "NDJSON (gzip)": ("ndjson", "gz"),
+    "NDJSON (zstd)": ("ndjson", "zst"),
+    "CSV": ("csv", None),
+    "CSV (gzip)": ("csv", "gz"),
+    "Parquet": ("parquet", None),
+    "Arrow": ("arrow", None),
+}
+
+# Outcome of an export: file written, number of rows and newest created_at
+ExportResult = namedtuple("ExportResult", ["filename", "rows", "last_created_at"])
+
+
+# Function to open a text file for writing, compressed or not
+def open_text_output(filename, compression=None):
+    if compression is None:
+        return open(filename, "w", newline="")
+    if compression == "gz":
+        return gzip.open(filename, "wt", newline="")
+    if compression == "zst":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd compression requires the zstandard package.")
+        return zstandard.open(filename, "wt", newline="")
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+# Function to convert an (id, details) pair into a flat row dict
+def flat_row(key, details, fields):
+    row = {"id": key}
+    for field in fields:
+        row[field] = details[field]
+    return row
+
+
+# Function to write the pairs as one JSON object (same layout as the JSON
+# export and import)
+def write_json(items, fields, text_file):
+    write_json_items(
+        ((key, {field: details[field] for field in fields}) for key, details in items),
+        text_file,
+    )
+
+
+# Function to write the pairs as newline-delimited JSON, one row per line
+def write_ndjson(items, fields, text_file):
+    for key, details in items:
+        text_file.write(
+            json.dumps(flat_row(key, details, fields), default=json_default)
+        )
+        text_file.write("\n")
+
+
+# Function to write the pairs as CSV with an id column and one per field
+def write_csv(items, fields, text_file):
+    writer = csv.writer(text_file)
+    writer.writerow(("id",) + tuple(fields))
+    for key, details in items:
+        writer.writerow([key] + [format_timestamp(details[field]) for field in fields])
+
+
+# Function to group the pairs in lists of flat rows of EXPORT_BATCH_SIZE
+def iter_row_batches(items, fields):
+    batch = []
+    for key, details in items:
+        batch.append(flat_row(key, details, fields))
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Function to write the pairs in a columnar file, one record batch at a time.
+# The schema is inferred from the first batch (timestamps stay timestamps).
+def write_columnar(items, fields, filename, export_format):
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet and Arrow exports require the pyarrow package.")
+
+    writer = None
+    try:
+        for batch in iter_row_batches(items, fields):
+            if writer is None:
+                record_batch = pyarrow.RecordBatch.from_pylist(batch)
+                schema = record_batch.schema
+                if export_format == "parquet":
+                    writer = pyarrow.parquet.ParquetWriter(
+                        filename, schema, compression="zstd"
+                    )
+                else:
+                    writer = pyarrow.ipc.new_file(
+                        filename,
+                        schema,
+                        options=pyarrow.ipc.IpcWriteOptions(compression="zstd"),
+                    )
+            else:
+                record_batch = pyarrow.RecordBatch.from_pylist(batch, schema=schema)
+            if export_format == "parquet":
+                writer.write_batch(record_batch)
+            else:
+                writer.write(record_batch)
+
+        if writer is None:
+            # Nothing to export: write an empty file with the column names
+            schema = pyarrow.schema(
+                [(name, pyarrow.null()) for name in ("id",) + tuple(fields)]
+            )
+            if export_format == "parquet":
+                writer = pyarrow.parquet.ParquetWriter(filename, schema)
+            else:
+                writer = pyarrow.ipc.new_file(filename, schema)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+TEXT_WRITERS = {"json": write_json, "ndjson": write_ndjson, "csv": write_csv}
+
+
+# Function to write (id, details) pairs to a file in one of the export formats.
+# Rows are written as they are read, so memory use does not grow with the
+# number of rows.
+def write_export(items, fields, filename, export_format="json", compression=None):
+    if export_format in ("parquet", "arrow"):
+        write_columnar(items, fields, filename, export_format)
+    elif export_format in TEXT_WRITERS:
+        with open_text_output(filename, compression) as text_file:
+            TEXT_WRITERS[export_format](items, fields, text_file)
+    else:
+        raise ValueError(f"Unknown export format: {export_format}")
+
+
+# Function to read the export state of each table: {"created_at": newest
+# exported created_at, "ids": IDs of the rows exported with it}. A state
+# written before the IDs were kept holds the created_at alone.
+def load_export_state(state_file=EXPORT_STATE_FILE):
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file, "r") as json_file:
+        state = json.load(json_file)
+    return {
+        name: table if isinstance(table, dict) else {"created_at": table, "ids": []}
+        for name, table in state.items()
+    }
+
+
+# Function to remember the created_at of the newest exported row of a table
+# and the IDs of the rows exported with that created_at
+def save_export_state(name, last_created_at, ids, state_file=EXPORT_STATE_FILE):
+    state = load_export_state(state_file)
+    state[name] = {"created_at": format_timestamp(last_created_at), "ids": list(ids)}
+    with open(state_file, "w") as json_file:
+        json.dump(state, json_file, indent=4)
+
+
+# Function to export a table streamed from the database. iter_items(since=...)
+# yields (id, details) pairs, only those created at or after since when it is
+# given. With incremental=True only the rows created since the last export are
+# written: timestamps have a one second precision, so rows created in the
+# same second as the newest exported row are read again and skipped by ID.
+# progress(rows) is called every EXPORT_BATCH_SIZE rows.
+def export_table(
+    name,
+    iter_items,
+    fields,
+    export_format="json",
+    compression=None,
+    incremental=False,
+    progress=None,
+    state_file=EXPORT_STATE_FILE,
+):
+    since = None
+    exported_ids = set()  # Rows of the since second already exported
+    if incremental:
+        last_export = load_export_state(state_file).get(name)
+        if last_export:
+            since = datetime.strptime(last_export["created_at"], "%Y-%m-%d %H:%M:%S")
+            exported_ids = set(last_export["ids"])
+
+    extension = export_format + (f".{compression}" if compression else "")
+    filename = get_export_filename(
+        f"{name}_since_last_export" if since else name, extension
+    )
+    rows = 0
+    last_created_at = None
+    last_ids = []  # IDs of the written rows created at last_created_at
+
+    # Count the rows and keep the newest created_at (with the IDs of its rows)
+    # while they are written, skipping the rows of the last export
+    def tracked_items():
+        nonlocal rows, last_created_at, last_ids
+        since_key = format_timestamp(since)
+        for key, details in iter_items(since=since):
+            created_at = format_timestamp(details.get("created_at"))
+            if created_at == since_key and key in exported_ids:
+                continue
+            if created_at is not None:
+                if last_created_at is None or created_at > last_created_at:
+                    last_created_at = created_at
+                    last_ids = [key]
+                elif created_at == last_created_at:
+                    last_ids.append(key)
+            rows += 1
+            if progress and rows % EXPORT_BATCH_SIZE == 0:
+                progress(rows)
+            yield key, details
+
+    write_export(tracked_items(), fields, filename, export_format, compression)
+
+    if last_created_at is not None:
+        # New rows in the second of the last export: its rows stay exported
+        if last_created_at == format_timestamp(since):
+            last_ids += exported_ids
+        save_export_state(name, last_created_at, last_ids, state_file)
+
+    return ExportResult(filename, rows, last_created_at)
@@ -0,0 +1,318 @@
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import shared_memory
+
+import numpy as np
+from supply_snapshot import factorize
+
+# Days of history the series are built from and days summed as "used"
+HISTORY_DAYS = 90
+USED_WINDOW = 30
+
+# Smoothing factors of the level and the trend
+DEFAULT_ALPHA = 0.3
+DEFAULT_BETA = 0.1
+
+# Damping of the Holt trend: each day ahead only keeps this share of the trend
+# of the previous day, so the forecast levels off instead of extrapolating a
+# spike of a sparse series over the whole horizon
+DEFAULT_PHI = 0.9
+
+# Worker processes of the parallel forecasts (each one forecasts a shard of
+# the series)
+FORECAST_WORKERS = int(os.environ.get("AGRI_FORECAST_WORKERS", os.cpu_count() or 1))
+
+# Smaller histories (series x days) are forecast serially unless a number of
+# workers is asked for: starting the worker processes (spawned, each one
+# importing NumPy) costs more than it saves. With 20,000 series of 365 days
+# (7.3M values), `python -m benchmarks.bench_forecast_parallel 20000` runs
+# 4 to 20 times slower with 2 and 4 workers than serially, depending on the
+# machine; the workers only pay off with a few times more series than that.
+PARALLEL_FORECAST_MIN_VALUES = 20_000_000
+
+# Daily usage series: keys holds the (type, name, supplier ID) of each series
+# and history a (series, days) array of the quantity used each day, from
+# start (a date) to today
+DailySeries = namedtuple("DailySeries", ["keys", "history", "start"])
+
+
+# Function to get the first day of the history window
+def history_start(history_days=HISTORY_DAYS, today=None):
+    today = today or datetime.now().date()
+    return today - timedelta(days=history_days - 1)
+
+
+# Function to sum quantities into a (series, days) array, in one pass
+def build_history(series_codes, series_count, day_offsets, quantities, days):
+    flat = series_codes * days + day_offsets
+    history = np.bincount(
+        flat, weights=quantities.astype(np.float64), minlength=series_count * days
+    )
+    return history.reshape(series_count, days)
+
+
+# Function to build the daily series from the rows of the daily rollup
+# (usage_day, type, name, supplier ID, quantity)
+def series_from_daily_rows(rows, history_days=HISTORY_DAYS, today=None):
+    start = history_start(history_days, today)
+    rows = [row for row in rows if row[0] >= start.isoformat()]
+    codes, keys = factorize([tuple(row[1:4]) for row in rows])
+    day_offsets = (
+        np.array([row[0] for row in rows], dtype="datetime64[D]")
+        - np.datetime64(start, "D")
+    ).astype(np.int64)
+    quantities = np.array([row[4] for row in rows], dtype=np.float64)
+    history = build_history(codes, len(keys), day_offsets, quantities, history_days)
+    return DailySeries(keys, history, start)
+
+
+# Function to build the daily series from a SupplySnapshot (offline mode)
+def series_from_snapshot(snapshot, history_days=HISTORY_DAYS, today=None):
+    start = history_start(history_days, today)
+    day_offsets = (
+        snapshot.created_at.astype("datetime64[D]") - np.datetime64(start, "D")
+    ).astype(np.int64)
+    mask = (day_offsets >= 0) & (day_offsets < history_days)
+
+    # One code per (type, name, supplier) combination
+    combined = (
+        snapshot.type_codes[mask] * len(snapshot.names) + snapshot.name_codes[mask]
+    ) * len(snapshot.supplier_ids) + snapshot.supplier_codes[mask]
+    unique, codes = np.unique(combined, return_inverse=True)
+    type_codes, rest = np.divmod(
+        unique, len(snapshot.names) * len(snapshot.supplier_ids)
+    )
+    name_codes, supplier_codes = np.divmod(rest, len(snapshot.supplier_ids))
+    keys = [
+        (snapshot.types[t], snapshot.names[n], snapshot.supplier_ids[s])
+        for t, n, s in zip(
+            type_codes.tolist(), name_codes.tolist(), supplier_codes.tolist()
+        )
+    ]
+
+    history = build_history(
+        codes.ravel(),
+        len(keys),
+        day_offsets[mask],
+        snapshot.quantity[mask],
+        history_days,
+    )
+    return DailySeries(keys, history, start)
+
+
+# Function to get the additive seasonal component of each series (mean of
+# each position of the season minus the series mean), or None when the
+# history is shorter than two seasons
+def seasonal_indices(history, season_length):
+    if not season_length or history.shape[1] < 2 * season_length:
+        return None
+    positions = np.arange(history.shape[1]) % season_length
+    means = np.stack(
+        [history[:, positions == k].mean(axis=1) for k in range(season_length)],
+        axis=1,
+    )
+    return means - means.mean(axis=1, keepdims=True)
+
+
+# Function to forecast with simple exponential smoothing: a flat forecast at
+# the last smoothed level
+def smoothing_forecast(history, horizon, alpha=DEFAULT_ALPHA, beta=DEFAULT_BETA):
+    level = history[:, 0].copy()
+    for t in range(1, history.shape[1]):
+        level = alpha * history[:, t] + (1 - alpha) * level
+    return np.repeat(level[:, None], horizon, axis=1)
+
+
+# Function to forecast with Holt's damped trend method (double exponential
+# smoothing): the last level plus the smoothed trend, damped by phi each day.
+# The trend starts at 0 (most daily usage series are intermittent, the
+# difference of the first two days is no trend).
+def holt_forecast(
+    history, horizon, alpha=DEFAULT_ALPHA, beta=DEFAULT_BETA, phi=DEFAULT_PHI
+):
+    level = history[:, 0].copy()
+    trend = np.zeros_like(level)
+    for t in range(1, history.shape[1]):
+        previous = level
+        level = alpha * history[:, t] + (1 - alpha) * (level + phi * trend)
+        trend = beta * (level - previous) + (1 - beta) * phi * trend
+    steps = np.cumsum(phi ** np.arange(1, horizon + 1))
+    return level[:, None] + trend[:, None] * steps
+
+
+# Function to forecast with a least squares line fitted to each series
+def linear_forecast(history, horizon, alpha=DEFAULT_ALPHA, beta=DEFAULT_BETA):
+    days = history.shape[1]
+    t = np.arange(days, dtype=np.float64)
+    centered = t - t.mean()
+    variance = (centered**2).sum()
+    means = history.mean(axis=1)
+
+    # Row by row sum (not a matrix product), so a series gets the same slope
+    # whatever the other series forecast with it
+    slope = np.zeros_like(means)
+    if variance:
+        slope = (history * centered).sum(axis=1) / variance
+    future = np.arange(days, days + horizon, dtype=np.float64) - t.mean()
+    return means[:, None] + slope[:, None] * future
+
+
+# Forecasting methods: name -> function(history, horizon, alpha, beta)
+FORECAST_METHODS = {
+    "holt": holt_forecast,
+    "smoothing": smoothing_forecast,
+    "linear": linear_forecast,
+}
+
+
+# Function to forecast the daily usage of every series at once, for the
+# horizon days after the history. With season_length (e.g. 7 for a weekly
+# pattern), the seasonal component is removed before fitting and added back
+# to the forecast. The daily forecasts are not clipped (clipping each day at
+# 0 would bias the totals upward), predict_usage clips the totals.
+def forecast_series(
+    history,
+    horizon=30,
+    method="smoothing",
+    season_length=None,
+    alpha=DEFAULT_ALPHA,
+    beta=DEFAULT_BETA,
+):
+    if not len(history):
+        return np.zeros((0, horizon))
+
+    seasonal = seasonal_indices(history, season_length)
+    if seasonal is not None:
+        positions = np.arange(history.shape[1]) % season_length
+        history = history - seasonal[:, positions]
+
+    forecast = FORECAST_METHODS[method](history, horizon, alpha, beta)
+
+    if seasonal is not None:
+        positions = np.arange(history.shape[1], history.shape[1] + horizon)
+        forecast = forecast + seasonal[:, positions % season_length]
+    return forecast
+
+
+# Function to forecast the rows start:stop of the series held in shared
+# memory, writing the result to the shared forecast array (run by the worker
+# processes)
+def forecast_shard(history_name, forecast_name, shape, start, stop, options):
+    history_memory = shared_memory.SharedMemory(name=history_name)
+    forecast_memory = shared_memory.SharedMemory(name=forecast_name)
+    try:
+        history = np.ndarray(shape, dtype=np.float64, buffer=history_memory.buf)
+        forecast = np.ndarray(
+            (shape[0], options["horizon"]), dtype=np.float64, buffer=forecast_memory.buf
+        )
+        forecast[start:stop] = forecast_series(history[start:stop], **options)
+        del history, forecast  # The buffers cannot close while viewed
+    finally:
+        history_memory.close()
+        forecast_memory.close()
+    return stop - start
+
+
+# Function to forecast the series like forecast_series, sharded across worker
+# processes. The history and the forecasts are passed through shared memory
+# instead of being pickled. Each series is forecast on its own, so the result
+# is the same for any number of workers.
+def forecast_series_parallel(
+    history,
+    horizon=30,
+    method="smoothing",
+    season_length=None,
+    alpha=DEFAULT_ALPHA,
+    beta=DEFAULT_BETA,
+    workers=None,
+):
+    workers = min(workers or FORECAST_WORKERS, len(history))
+    options = {
+        "horizon": horizon,
+        "method": method,
+        "season_length": season_length,
+        "alpha": alpha,
+        "beta": beta,
+    }
+    if workers <= 1:
+        return forecast_series(history, **options)
+
+    history = np.ascontiguousarray(history, dtype=np.float64)
+    forecast_bytes = len(history) * horizon * np.dtype(np.float64).itemsize
+    history_memory = shared_memory.SharedMemory(create=True, size=history.nbytes)
+    forecast_memory = shared_memory.SharedMemory(create=True, size=forecast_bytes)
+    try:
+        np.ndarray(history.shape, dtype=np.float64, buffer=history_memory.buf)[:] = (
+            history
+        )
+
+        # One contiguous shard of series per worker
+        bounds = np.linspace(0, len(history), workers + 1).astype(int).tolist()
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=context) as executor:
+            shards = [
+                executor.submit(
+                    forecast_shard,
+                    history_memory.name,
+                    forecast_memory.name,
+                    history.shape,
+                    start,
+                    stop,
+                    options,
+                )
+                for start, stop in zip(bounds, bounds[1:])
+            ]
+            for shard in shards:
+                shard.result()
+
+        return np.ndarray(
+            (len(history), horizon), dtype=np.float64, buffer=forecast_memory.buf
+        ).copy()
+    finally:
+        history_memory.close()
+        history_memory.unlink()
+        forecast_memory.close()
+        forecast_memory.unlink()
+
+
+# Function to predict the usage of each series: the total used over the last
+# USED_WINDOW days, its daily average and the total forecast for the horizon
+# (at least 0), adjusted by the growth and waste rates (in %). Many series are
+# forecast in parallel by worker processes; a number of workers given
+# explicitly is used whatever the size of the history (1 forecasts serially).
+# Returns a list of (key, total used, daily usage, predicted usage), most
+# used first.
+def predict_usage(
+    series,
+    horizon=30,
+    method="smoothing",
+    season_length=None,
+    growth_rate=0,
+    waste_rate=0,
+    workers=None,
+):
+    history = series.history
+    if workers is not None or history.size >= PARALLEL_FORECAST_MIN_VALUES:
+        forecast = forecast_series_parallel(
+            history, horizon, method, season_length, workers=workers
+        )
+    else:
+        forecast = forecast_series(history, horizon, method, season_length)
+    predicted = np.clip(forecast.sum(axis=1), 0, None)
+    predicted *= (1 + growth_rate / 100) * (1 + waste_rate / 100)
+
+    used = history[:, -USED_WINDOW:].sum(axis=1)
+    daily = used / min(USED_WINDOW, history.shape[1]) if history.shape[1] else used
+    order = np.argsort(-used, kind="stable")
+    return [
+        (series.keys[index], total, round(average, 2), round(prediction, 2))
+        for index, total, average, prediction in zip(
+            order.tolist(),
+            used[order].tolist(),
+            daily[order].tolist(),
+            predicted[order].tolist(),
+        )
+    ]
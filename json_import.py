@@ -0,0 +1,548 @@
+import json
+import multiprocessing
+import os
+import queue
+import re
+import threading
+from collections import namedtuple
+from datetime import datetime
+from functools import partial
+from common import SUPPLY_TYPES, get_current_timestamp, is_valid_email
+from database import fetch_suppliers_iter, save_suppliers, save_supplies
+
+# Number of characters read from the file at a time
+READ_CHUNK_SIZE = 1 << 16
+
+# Number of valid records written to the database per batch
+IMPORT_BATCH_SIZE = 1000
+
+# Parallelism of the import pipeline: validator processes (one core is left
+# to the parser) and database writer threads (writers use pooled
+# connections, keep them <= AGRI_DB_POOL_MAX)
+IMPORT_VALIDATORS = int(
+    os.environ.get("AGRI_IMPORT_VALIDATORS", min((os.cpu_count() or 1) - 1, 4))
+)
+IMPORT_WRITERS = int(os.environ.get("AGRI_IMPORT_WRITERS", "2"))
+
+# Maximum number of batches waiting between two stages (backpressure)
+IMPORT_QUEUE_SIZE = int(os.environ.get("AGRI_IMPORT_QUEUE_SIZE", "4"))
+
+# Smaller files are imported serially, starting the workers costs more
+PARALLEL_IMPORT_MIN_BYTES = 8 * 2**20
+
+# Seconds between two checks for cancellation while waiting on a queue
+QUEUE_TIMEOUT = 0.1
+
+WHITESPACE = re.compile(r"\s*")
+NUMBER_CHARACTERS = "0123456789.eE+-"
+
+# Outcome of an import: records read and saved, and errors by record ID
+ImportResult = namedtuple("ImportResult", ["read", "saved", "errors"])
+
+
+# Function to stream the (key, value) pairs of the top-level JSON object of a
+# file ({id: {...}, ...}) without loading the whole file: the file is read in
+# chunks and each entry is decoded as soon as it is complete
+def iter_json_object_items(json_file, chunk_size=READ_CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    # Function to read the next chunk, dropping the already parsed text
+    def read_more():
+        nonlocal buffer, position, eof
+        chunk = json_file.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    # Function to get the next non-whitespace character (None at the end)
+    def peek():
+        nonlocal position
+        while True:
+            position = WHITESPACE.match(buffer, position).end()
+            if position < len(buffer) or eof:
+                return buffer[position] if position < len(buffer) else None
+            read_more()
+
+    # Function to decode the next JSON value, reading more text while it is
+    # incomplete (a value must be followed by a character that cannot continue
+    # a number, to be sure a number is not cut at the end of the buffer)
+    def decode():
+        nonlocal position
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+                if eof or (end < len(buffer) and buffer[end] not in NUMBER_CHARACTERS):
+                    position = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError("The selected file is not a valid JSON.")
+            read_more()
+
+    # Function to consume an expected character
+    def expect(characters):
+        nonlocal position
+        character = peek()
+        if character is None or character not in characters:
+            raise ValueError("The selected file is not a valid JSON.")
+        position += 1
+        return character
+
+    # Function to check that only whitespace follows the object
+    def expect_end():
+        if peek() is not None:
+            raise ValueError("The selected file is not a valid JSON.")
+
+    expect("{")
+    if peek() == "}":
+        position += 1
+        expect_end()
+        return
+
+    while True:
+        if peek() != '"':
+            raise ValueError("The selected file is not a valid JSON.")
+        key = decode()
+        expect(":")
+        peek()
+        yield key, decode()
+
+        if expect(",}") == "}":
+            expect_end()
+            return
+
+        # Keep the buffer small once the parsed text is large enough
+        if position > chunk_size:
+            buffer = buffer[position:]
+            position = 0
+
+
+# Function to validate the optional created_at of a record, which must be a
+# 'YYYY-MM-DD HH:MM:SS' string, returning an error message or None
+def validate_created_at(details):
+    created_at = details.get("created_at")
+    if created_at is None:
+        return None
+    try:
+        datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return f"Invalid created_at '{created_at}'"
+    return None
+
+
+# Function to validate a supply record, returning an error message or None
+def validate_supply(details, supplier_ids):
+    if not isinstance(details, dict):
+        return "Record is not an object"
+    for field in ("name", "quantity", "supplier", "type"):
+        if field not in details or details[field] in (None, ""):
+            return f"Missing field '{field}'"
+    if details["type"] not in SUPPLY_TYPES:
+        return f"Unknown supply type '{details['type']}'"
+    if not isinstance(details["quantity"], int) or isinstance(
+        details["quantity"], bool
+    ):
+        return "Quantity must be an integer"
+    if details["supplier"] not in supplier_ids:
+        return f"Unknown supplier '{details['supplier']}'"
+    return validate_created_at(details)
+
+
+# Function to validate a supplier record, returning an error message or None
+def validate_supplier(details):
+    if not isinstance(details, dict):
+        return "Record is not an object"
+    if not details.get("name"):
+        return "Missing field 'name'"
+    if not isinstance(details.get("email"), str) or not is_valid_email(
+        details["email"]
+    ):
+        return "Invalid email address"
+    return validate_created_at(details)
+
+
+# Function to convert a valid supply record to the format saved in the DB
+def supply_from_record(details):
+    return {
+        "name": details["name"],
+        "quantity": details["quantity"],
+        "supplier": details["supplier"],
+        "type": details["type"],
+        "created_at": details.get("created_at") or get_current_timestamp(),
+    }
+
+
+# Function to convert a valid supplier record to the format saved in the DB
+def supplier_from_record(details):
+    return {
+        "name": details["name"],
+        "email": details["email"],
+        "created_at": details.get("created_at") or get_current_timestamp(),
+    }
+
+
+# Function to order the (position, record ID, message) errors of an import
+# as they appear in the file, so the report does not depend on timing
+def ordered_errors(errors):
+    return {record_id: message for _, record_id, message in sorted(errors)}
+
+
+# Function to validate the streamed records and write the valid ones in
+# fixed-size batches with the bulk writer. Only one batch is held in memory.
+# progress(read, saved, error_count) is called after each batch, and
+# cancelled() is checked between batches (saved batches stay committed).
+def import_records(
+    items, validate, convert, save, batch_size, progress=None, cancelled=None
+):
+    read = saved = 0
+    errors = []
+    batch = {}
+    positions = {}
+
+    def flush():
+        nonlocal saved
+        batch_errors = save(batch, batch_size)
+        saved += len(batch) - len(batch_errors)
+        errors.extend(
+            (positions[record_id], record_id, message)
+            for record_id, message in batch_errors.items()
+        )
+        batch.clear()
+        positions.clear()
+        if progress:
+            progress(read, saved, len(errors))
+
+    for position, (record_id, details) in enumerate(items):
+        read += 1
+        error = validate(details)
+        if error:
+            errors.append((position, record_id, error))
+        else:
+            batch[record_id] = convert(details)
+            positions[record_id] = position
+
+        if len(batch) >= batch_size:
+            flush()
+            if cancelled and cancelled():
+                break
+    else:
+        if batch:
+            flush()
+
+    return ImportResult(read, saved, ordered_errors(errors))
+
+
+# Function run by the parser process: streams the file and sends batches of
+# (position, record ID, details) to the validators, then one end marker
+# (None) per validator. A parse error is sent as its message.
+def parse_stage(filename, batch_size, parsed, validators):
+    try:
+        with open(filename, "r") as json_file:
+            batch = []
+            items = iter_json_object_items(json_file)
+            for position, (record_id, details) in enumerate(items):
+                batch.append((position, record_id, details))
+                if len(batch) >= batch_size:
+                    parsed.put(batch)
+                    batch = []
+            if batch:
+                parsed.put(batch)
+    except (OSError, ValueError) as e:
+        parsed.put(str(e))
+
+    for _ in range(validators):
+        parsed.put(None)
+
+
+# Function to split a batch of (position, record ID, details) into the valid
+# records, converted, and the (position, record ID, message) errors
+def validate_batch(batch, validate, convert):
+    valid = []
+    errors = []
+    for position, record_id, details in batch:
+        error = validate(details)
+        if error:
+            errors.append((position, record_id, error))
+        else:
+            valid.append((position, record_id, convert(details)))
+    return valid, errors
+
+
+# Function run by the validator processes: validates and converts the parsed
+# batches until the end marker, sending (record count, valid records, errors)
+def validate_stage(validate, convert, parsed, validated):
+    while True:
+        batch = parsed.get()
+        if batch is None or isinstance(batch, str):
+            validated.put(batch)
+            if batch is None:
+                return
+            continue
+
+        validated.put((len(batch),) + validate_batch(batch, validate, convert))
+
+
+# Staged import: a parser process streams the file, a pool of validator
+# processes checks and converts the records and writer threads save them with
+# the pooled database connections. The stages are connected by bounded
+# queues, so a slow stage makes the previous ones wait instead of piling up
+# records in memory. With no validators, parsing and validation run in the
+# calling thread and only the writes are parallel (single-core machines).
+class ImportPipeline:
+    def __init__(
+        self,
+        save,
+        batch_size=IMPORT_BATCH_SIZE,
+        progress=None,
+        cancelled=None,
+        validators=IMPORT_VALIDATORS,
+        writers=IMPORT_WRITERS,
+        queue_size=IMPORT_QUEUE_SIZE,
+    ):
+        self.save = save
+        self.batch_size = batch_size
+        self.progress = progress
+        self.cancelled = cancelled or (lambda: False)
+        self.validators = validators
+        self.writers = max(writers, 1)
+        self.queue_size = queue_size
+
+        self.lock = threading.Lock()
+        self.read = 0
+        self.saved = 0
+        self.errors = []  # (position, record ID, message)
+        self.failure = None  # First exception raised by a writer
+        self.to_write = queue.Queue(queue_size)
+
+    # Function to check if the pipeline has to stop early
+    def stopped(self):
+        return self.failure is not None or self.cancelled()
+
+    # Function run by the writer threads: saves the validated batches until
+    # the end marker (batches left after a failure are only drained)
+    def write_stage(self):
+        while True:
+            batch = self.to_write.get()
+            if batch is None:
+                return
+            if self.failure is not None:
+                continue
+
+            positions = {record_id: position for position, record_id, _ in batch}
+            try:
+                batch_errors = self.save(
+                    {record_id: details for _, record_id, details in batch},
+                    self.batch_size,
+                )
+            except Exception as e:
+                with self.lock:
+                    self.failure = self.failure or e
+                continue
+
+            with self.lock:
+                self.saved += len(batch) - len(batch_errors)
+                self.errors.extend(
+                    (positions[record_id], record_id, message)
+                    for record_id, message in batch_errors.items()
+                )
+                if self.progress:
+                    self.progress(self.read, self.saved, len(self.errors))
+
+    # Function to hand a batch to the writers, waiting while they are busy
+    def put_for_writers(self, batch):
+        while not self.stopped():
+            try:
+                self.to_write.put(batch, timeout=QUEUE_TIMEOUT)
+                return
+            except queue.Full:
+                continue
+
+    # Function to count a validated batch and hand its valid records over
+    def accept(self, count, valid, errors):
+        with self.lock:
+            self.read += count
+            self.errors.extend(errors)
+        if valid:
+            self.put_for_writers(valid)
+
+    # Function to import a JSON file, validating each record with validate
+    # and converting the valid ones with convert (both must be picklable)
+    def run(self, filename, validate, convert):
+        threads = [
+            threading.Thread(target=self.write_stage, daemon=True)
+            for _ in range(self.writers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            if self.validators:
+                self.run_stages(filename, validate, convert)
+            else:
+                self.run_in_thread(filename, validate, convert)
+        finally:
+            # Let the writers finish the batches already handed to them
+            for _ in threads:
+                self.to_write.put(None)
+            for thread in threads:
+                thread.join()
+
+        if self.failure is not None:
+            raise self.failure
+        return ImportResult(self.read, self.saved, ordered_errors(self.errors))
+
+    # Function to parse and validate the file in the calling thread
+    def run_in_thread(self, filename, validate, convert):
+        with open(filename, "r") as json_file:
+            batch = []
+            items = iter_json_object_items(json_file)
+            for position, (record_id, details) in enumerate(items):
+                batch.append((position, record_id, details))
+                if len(batch) >= self.batch_size:
+                    self.accept(len(batch), *validate_batch(batch, validate, convert))
+                    batch = []
+                    if self.stopped():
+                        return
+            if batch:
+                self.accept(len(batch), *validate_batch(batch, validate, convert))
+
+    # Function to run the parser and validator processes, handing the
+    # validated batches to the writers
+    def run_stages(self, filename, validate, convert):
+        context = multiprocessing.get_context("spawn")
+        parsed = context.Queue(self.queue_size)
+        validated = context.Queue(self.queue_size)
+        processes = [
+            context.Process(
+                target=parse_stage,
+                args=(filename, self.batch_size, parsed, self.validators),
+                daemon=True,
+            )
+        ] + [
+            context.Process(
+                target=validate_stage,
+                args=(validate, convert, parsed, validated),
+                daemon=True,
+            )
+            for _ in range(self.validators)
+        ]
+        for process in processes:
+            process.start()
+
+        parse_error = None
+        finished = 0
+        try:
+            while finished < self.validators and not self.stopped():
+                try:
+                    message = validated.get(timeout=QUEUE_TIMEOUT)
+                except queue.Empty:
+                    if any(process.exitcode for process in processes):
+                        raise RuntimeError("An import worker stopped unexpectedly.")
+                    continue
+
+                if message is None:
+                    finished += 1
+                elif isinstance(message, str):
+                    parse_error = message
+                else:
+                    self.accept(*message)
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+
+        if parse_error is not None:
+            raise ValueError(parse_error)
+
+
+# Function to import a JSON file with the staged pipeline. By default small
+# files are parsed in the calling thread (starting the processes costs more
+# than it saves) and large ones by IMPORT_VALIDATORS processes. With no
+# writers the whole import runs serially in the calling thread.
+def import_file(
+    filename,
+    validate,
+    convert,
+    save,
+    batch_size=IMPORT_BATCH_SIZE,
+    progress=None,
+    cancelled=None,
+    validators=None,
+    writers=IMPORT_WRITERS,
+):
+    if validators is None:
+        large = os.path.getsize(filename) >= PARALLEL_IMPORT_MIN_BYTES
+        validators = IMPORT_VALIDATORS if large else 0
+
+    if writers > 0:
+        pipeline = ImportPipeline(
+            save, batch_size, progress, cancelled, validators, writers
+        )
+        return pipeline.run(filename, validate, convert)
+
+    with open(filename, "r") as json_file:
+        return import_records(
+            iter_json_object_items(json_file),
+            validate,
+            convert,
+            save,
+            batch_size,
+            progress,
+            cancelled,
+        )
+
+
+# Function to import a supplies JSON file in a streaming fashion. Suppliers
+# must exist, either in supplier_ids or, if not given, in the database.
+def import_supplies_file(
+    filename,
+    supplier_ids=None,
+    batch_size=IMPORT_BATCH_SIZE,
+    progress=None,
+    cancelled=None,
+    validators=None,
+    writers=IMPORT_WRITERS,
+    save=save_supplies,
+):
+    if supplier_ids is None:
+        supplier_ids = {row[0] for rows in fetch_suppliers_iter() for row in rows}
+
+    return import_file(
+        filename,
+        partial(validate_supply, supplier_ids=supplier_ids),
+        supply_from_record,
+        save,
+        batch_size,
+        progress,
+        cancelled,
+        validators,
+        writers,
+    )
+
+
+# Function to import a suppliers JSON file in a streaming fashion
+def import_suppliers_file(
+    filename,
+    batch_size=IMPORT_BATCH_SIZE,
+    progress=None,
+    cancelled=None,
+    validators=None,
+    writers=IMPORT_WRITERS,
+    save=save_suppliers,
+):
+    return import_file(
+        filename,
+        validate_supplier,
+        supplier_from_record,
+        save,
+        batch_size,
+        progress,
+        cancelled,
+        validators,
+        writers,
+    )
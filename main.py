@@ -1,30 +1,104 @@
+import time
+
+# Start of the startup measurements, taken before the other imports to time them
+STARTUP_START = time.perf_counter()
+
+import importlib
 import tkinter as tk
-from supply_page import create_supply_page
-from supplier_page import create_supplier_page
+from database import close_pool
+
+# Pages of the dashboard: menu label -> (module, function creating the frame).
+# A page module is only imported, and its frame built, the first time the page
+# is shown, so the hidden pages cost nothing at startup.
+PAGES = {
+    "Supply": ("supply_page", "create_supply_page"),
+    "Supplier": ("supplier_page", "create_supplier_page"),
+}
+
+
+# Startup timings, in seconds since STARTUP_START: imports, window, first
+# paint and data of the first page loaded
+class StartupReport:
+    def __init__(self):
+        self.marks = []  # (step, seconds)
+
+    def mark(self, step):
+        self.marks.append((step, time.perf_counter() - STARTUP_START))
+
+    # Function to print the steps marked since the last report
+    def print_report(self):
+        steps = ", ".join(f"{step} {seconds:.3f} s" for step, seconds in self.marks)
+        print(f"Startup: {steps}")
+        self.marks = []
+
+
+# Function to show a page, importing its module and building its frame on
+# first use. options are passed to the function creating the frame. A page
+# shown again gets a <<PageShown>> event (e.g. to load data whose load was
+# cancelled).
+def show_page(root, frames, label, **options):
+    frame = frames.get(label)
+    if frame is None:
+        module_name, function_name = PAGES[label]
+        create_page = getattr(importlib.import_module(module_name), function_name)
+        frame = frames[label] = create_page(root, **options)
+        frame.grid(row=0, column=0, sticky="nsew")
+    else:
+        frame.event_generate("<<PageShown>>")
+    frame.tkraise()
+
+
+# Function to build the dashboard and run the GUI
+def main():
+    startup = StartupReport()
+    startup.mark("imports")
+
+    # GUI Setup
+    root = tk.Tk()
+    root.title("Management Dashboard")
+    startup.mark("window")
+
+    # Menu to switch between pages
+    menu = tk.Menu(root)
+    root.config(menu=menu)
+    main_menu = tk.Menu(menu, tearoff=0)
+    menu.add_cascade(label="Menu", menu=main_menu)
+
+    # Frames of the pages shown so far
+    frames = {}
+
+    # Add menu commands to switch pages
+    for label in PAGES:
+        main_menu.add_command(
+            label=label, command=lambda label=label: show_page(root, frames, label)
+        )
+
+    # Report the first paint of the window, then the supplies loaded (the
+    # pages load their data in the background)
+    def on_map(event):
+        if event.widget is root:
+            root.unbind("<Map>")
+            startup.mark("first paint")
+            startup.print_report()
 
-# GUI Setup
-root = tk.Tk()
-root.title("Management Dashboard")
+    def on_data_ready():
+        startup.mark("data ready")
+        startup.print_report()
 
-# Menu to switch between pages
-menu = tk.Menu(root)
-root.config(menu=menu)
-main_menu = tk.Menu(menu, tearoff=0)
-menu.add_cascade(label="Menu", menu=main_menu)
+    root.bind("<Map>", on_map)
 
-# Create frames for pages
-frame_supplies = create_supply_page(root)
-frame_suppliers = create_supplier_page(root)
+    # Show supplies page by default
+    show_page(root, frames, "Supply", on_loaded=on_data_ready)
+    startup.mark("page built")
 
-frame_supplies.grid(row=0, column=0, sticky="nsew")
-frame_suppliers.grid(row=0, column=0, sticky="nsew")
+    # Start the GUI
+    root.mainloop()
 
-# Add menu commands to switch pages
-main_menu.add_command(label="Supply", command=lambda: frame_supplies.tkraise())
-main_menu.add_command(label="Supplier", command=lambda: frame_suppliers.tkraise())
+    # Release the pooled database connections
+    close_pool()
 
-# Show supplies page by default
-frame_supplies.tkraise()
 
-# Start the GUI
-root.mainloop()
+# Worker processes (e.g. of the import pipeline) import this module again, so
+# the GUI only starts when the file is run directly
+if __name__ == "__main__":
+    main()
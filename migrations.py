@@ -0,0 +1,204 @@
+from collections import namedtuple
+from rollups import rebuild_rollups_in
+
+# Versioned schema changes applied on top of oracle-db/initdb.sql. Each
+# migration runs once per database, in version order, and is recorded in the
+# schema_migrations table. statements maps a backend name to its DDL, with
+# "default" used by the backends without their own version. A statement can
+# also be a function(storage, cursor), for data migrations.
+Migration = namedtuple("Migration", ["version", "name", "statements"])
+
+MIGRATIONS_TABLE_QUERY = """
+    CREATE TABLE schema_migrations (
+        version NUMBER PRIMARY KEY,
+        name VARCHAR2(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Tables receiving the soft deleted rows moved out of the hot tables by
+# archive.py (no primary key: an ID can be archived again if it is re-imported
+# and deleted once more)
+ARCHIVE_TABLES = [
+    """
+    CREATE TABLE supplier_archive (
+        id VARCHAR2(36) NOT NULL,
+        name VARCHAR2(255) NOT NULL,
+        email VARCHAR2(255) NOT NULL,
+        created_at TIMESTAMP,
+        deleted_at TIMESTAMP,
+        archived_at TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE supply_archive (
+        id VARCHAR2(36) NOT NULL,
+        name VARCHAR2(255) NOT NULL,
+        quantity NUMBER NOT NULL,
+        type VARCHAR2(255) NOT NULL,
+        supplier_id VARCHAR2(36),
+        created_at TIMESTAMP,
+        deleted_at TIMESTAMP,
+        archived_at TIMESTAMP
+    )
+    """,
+]
+
+# Daily and monthly usage rollups maintained by rollups.py
+ROLLUP_TABLES = [
+    """
+    CREATE TABLE supply_usage_daily (
+        usage_day VARCHAR2(10) NOT NULL,
+        type VARCHAR2(255) NOT NULL,
+        name VARCHAR2(255) NOT NULL,
+        supplier_id VARCHAR2(36) NOT NULL,
+        quantity NUMBER NOT NULL,
+        row_count NUMBER NOT NULL,
+        PRIMARY KEY (usage_day, type, name, supplier_id)
+    )
+    """,
+    """
+    CREATE TABLE supply_usage_monthly (
+        usage_month VARCHAR2(7) NOT NULL,
+        type VARCHAR2(255) NOT NULL,
+        name VARCHAR2(255) NOT NULL,
+        supplier_id VARCHAR2(36) NOT NULL,
+        quantity NUMBER NOT NULL,
+        row_count NUMBER NOT NULL,
+        PRIMARY KEY (usage_month, type, name, supplier_id)
+    )
+    """,
+]
+
+MIGRATIONS = [
+    Migration(
+        1,
+        "supply access path indexes",
+        {
+            "default": [
+                # Joins to supplier and the foreign key checks when a supplier
+                # is changed or deleted
+                "CREATE INDEX supply_supplier_idx ON supply (supplier_id)",
+                # Keyset pages (created_at DESC, id DESC) and the created_at
+                # windows of the reports, exports and predictions
+                "CREATE INDEX supply_created_idx ON supply (created_at, id)",
+                "CREATE INDEX supplier_created_idx ON supplier (created_at, id)",
+                # Usage by type and name over a window, answered from the
+                # index alone (quantity is carried so the rows are not read)
+                "CREATE INDEX supply_type_name_created_idx"
+                " ON supply (type, name, created_at, quantity)",
+            ],
+        },
+    ),
+    Migration(
+        2,
+        "live supply index",
+        {
+            # Partial index: only the rows that are not soft deleted
+            "sqlite": [
+                "CREATE INDEX supply_live_idx ON supply (created_at, id)"
+                " WHERE deleted_at IS NULL",
+            ],
+            # Oracle has no partial indexes, but indexes the NULL deleted_at
+            # when it is followed by a NOT NULL column, so
+            # "deleted_at IS NULL AND created_at ..." is one range scan
+            "oracle": [
+                "CREATE INDEX supply_live_idx ON supply (deleted_at, created_at, id)",
+            ],
+        },
+    ),
+    Migration(
+        3,
+        "soft delete archive",
+        {
+            # Live suppliers for the pages, and the few soft deleted rows for
+            # the archive job
+            "sqlite": ARCHIVE_TABLES
+            + [
+                "CREATE INDEX supplier_live_idx ON supplier (created_at, id)"
+                " WHERE deleted_at IS NULL",
+                "CREATE INDEX supply_deleted_idx ON supply (deleted_at)"
+                " WHERE deleted_at IS NOT NULL",
+                "CREATE INDEX supplier_deleted_idx ON supplier (deleted_at)"
+                " WHERE deleted_at IS NOT NULL",
+            ],
+            # deleted_at leads the live indexes, so they serve both
+            "oracle": ARCHIVE_TABLES
+            + [
+                "CREATE INDEX supplier_live_idx"
+                " ON supplier (deleted_at, created_at, id)",
+            ],
+        },
+    ),
+    Migration(
+        4,
+        "usage rollups",
+        {"default": ROLLUP_TABLES + [rebuild_rollups_in]},
+    ),
+]
+
+
+# Function to get the statements of a migration for a backend
+def migration_statements(migration, storage):
+    if storage.name in migration.statements:
+        return migration.statements[storage.name]
+    return migration.statements["default"]
+
+
+# Function to read the versions already applied to the database, creating
+# the schema_migrations table on the first run
+def applied_versions(storage, cursor):
+    if not storage.table_exists(cursor, "schema_migrations"):
+        cursor.execute(MIGRATIONS_TABLE_QUERY)
+        return set()
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {int(row[0]) for row in cursor.fetchall()}
+
+
+# Function to apply the pending migrations to a backend's database.
+# Returns the versions applied (nothing is printed: it runs on the first
+# connection of every entry point, whose stdout may be data).
+def migrate(storage, migrations=MIGRATIONS):
+    applied = []
+    with storage.connection() as connection:
+        cursor = storage.cursor(connection)
+        try:
+            done = applied_versions(storage, cursor)
+            for migration in sorted(migrations, key=lambda m: m.version):
+                if migration.version in done:
+                    continue
+                storage.begin(cursor)
+                for statement in migration_statements(migration, storage):
+                    if callable(statement):
+                        statement(storage, cursor)
+                    else:
+                        cursor.execute(statement)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name)"
+                    " VALUES (:version, :name)",
+                    {"version": migration.version, "name": migration.name},
+                )
+                connection.commit()
+                applied.append(migration.version)
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+    return applied
+
+
+if __name__ == "__main__":
+    from database import create_backend
+
+    storage = create_backend()
+    try:
+        applied = migrate(storage)
+    finally:
+        storage.close()
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            print(f"Applied migration {migration.version}: {migration.name}")
+    print(
+        f"Schema is at version {max(m.version for m in MIGRATIONS)} ({storage.name})."
+    )
@@ -0,0 +1,164 @@
+import os
+import threading
+from contextlib import contextmanager
+
+import oracledb
+from storage_backend import StorageBackend
+
+# Database connection settings (overridable through environment variables)
+username = os.environ.get("AGRI_DB_USER", "dbuser")
+password = os.environ.get("AGRI_DB_PASSWORD", "dbpass")
+dsn = os.environ.get("AGRI_DB_DSN", "localhost:1521/EIS")
+
+# Connection pool sizing
+POOL_MIN = int(os.environ.get("AGRI_DB_POOL_MIN", "1"))
+POOL_MAX = int(os.environ.get("AGRI_DB_POOL_MAX", "4"))
+POOL_INCREMENT = int(os.environ.get("AGRI_DB_POOL_INCREMENT", "1"))
+
+
+# Oracle backend (the database from docker-compose.yml), using a pool of
+# connections created on the first database operation
+class OracleBackend(StorageBackend):
+    name = "oracle"
+    CONNECTION_ERRORS = (oracledb.OperationalError, oracledb.InterfaceError)
+
+    # Keyset pages of the newest rows (see PAGE_AFTER_CONDITION)
+    SUPPLY_PAGE_QUERY = """
+        SELECT s.id, s.name, s.quantity, NVL(p.name, 'Unknown'), s.type, s.created_at
+        FROM supply s
+        LEFT JOIN supplier p ON p.id = s.supplier_id
+        WHERE s.deleted_at IS NULL {where}
+        ORDER BY s.created_at DESC, s.id DESC
+        FETCH FIRST :limit ROWS ONLY
+    """
+    SUPPLIER_PAGE_QUERY = """
+        SELECT s.id, s.name, s.email, s.created_at
+        FROM supplier s
+        WHERE s.deleted_at IS NULL {where}
+        ORDER BY s.created_at DESC, s.id DESC
+        FETCH FIRST :limit ROWS ONLY
+    """
+
+    # UPSERT supply (Insert if not exists, otherwise update; saving a soft
+    # deleted row again restores it)
+    SUPPLY_UPSERT_QUERY = """
+        MERGE INTO supply s
+        USING (SELECT :1 AS id, :2 AS name, :3 AS quantity, :4 AS supplier_id, :5 AS type, TO_DATE(:6, 'YYYY-MM-DD HH24:MI:SS') AS created_at FROM dual) incoming
+        ON (s.id = incoming.id)
+        WHEN MATCHED THEN
+            UPDATE SET s.name = incoming.name, s.quantity = incoming.quantity, s.supplier_id = incoming.supplier_id, s.type = incoming.type, s.created_at = incoming.created_at, s.deleted_at = NULL
+        WHEN NOT MATCHED THEN
+            INSERT (s.id, s.name, s.quantity, s.supplier_id, s.type, s.created_at)
+            VALUES (incoming.id, incoming.name, incoming.quantity, incoming.supplier_id, incoming.type, incoming.created_at)
+    """
+
+    # UPSERT supplier (Insert if not exists, otherwise update; saving a soft
+    # deleted row again restores it)
+    SUPPLIER_UPSERT_QUERY = """
+        MERGE INTO supplier s
+        USING (SELECT :1 AS id, :2 AS name, :3 AS email, TO_DATE(:4, 'YYYY-MM-DD HH24:MI:SS') AS created_at FROM dual) incoming
+        ON (s.id = incoming.id)
+        WHEN MATCHED THEN
+            UPDATE SET s.name = incoming.name, s.email = incoming.email, s.created_at = incoming.created_at, s.deleted_at = NULL
+        WHEN NOT MATCHED THEN
+            INSERT (s.id, s.name, s.email, s.created_at)
+            VALUES (incoming.id, incoming.name, incoming.email, incoming.created_at)
+    """
+
+    SUPPLY_DELETE_QUERY = (
+        "UPDATE supply SET deleted_at = CURRENT_TIMESTAMP WHERE id = :1"
+    )
+    SUPPLIER_DELETE_QUERY = (
+        "UPDATE supplier SET deleted_at = CURRENT_TIMESTAMP WHERE id = :1"
+    )
+
+    # Rollup rows: the delta of a save is added to the existing row
+    DAILY_ROLLUP_UPSERT_QUERY = """
+        MERGE INTO supply_usage_daily u
+        USING (SELECT :period AS usage_day, :type AS type, :name AS name, :supplier_id AS supplier_id, :quantity AS quantity, :row_count AS row_count FROM dual) delta
+        ON (u.usage_day = delta.usage_day AND u.type = delta.type AND u.name = delta.name AND u.supplier_id = delta.supplier_id)
+        WHEN MATCHED THEN
+            UPDATE SET u.quantity = u.quantity + delta.quantity, u.row_count = u.row_count + delta.row_count
+        WHEN NOT MATCHED THEN
+            INSERT (u.usage_day, u.type, u.name, u.supplier_id, u.quantity, u.row_count)
+            VALUES (delta.usage_day, delta.type, delta.name, delta.supplier_id, delta.quantity, delta.row_count)
+    """
+    MONTHLY_ROLLUP_UPSERT_QUERY = """
+        MERGE INTO supply_usage_monthly u
+        USING (SELECT :period AS usage_month, :type AS type, :name AS name, :supplier_id AS supplier_id, :quantity AS quantity, :row_count AS row_count FROM dual) delta
+        ON (u.usage_month = delta.usage_month AND u.type = delta.type AND u.name = delta.name AND u.supplier_id = delta.supplier_id)
+        WHEN MATCHED THEN
+            UPDATE SET u.quantity = u.quantity + delta.quantity, u.row_count = u.row_count + delta.row_count
+        WHEN NOT MATCHED THEN
+            INSERT (u.usage_month, u.type, u.name, u.supplier_id, u.quantity, u.row_count)
+            VALUES (delta.usage_month, delta.type, delta.name, delta.supplier_id, delta.quantity, delta.row_count)
+    """
+    DAY_KEY_EXPRESSION = "TO_CHAR(created_at, 'YYYY-MM-DD')"
+
+    # The rows read before a save stay locked until its commit, so concurrent
+    # saves of the same supply apply their rollup deltas one after the other
+    ROW_LOCK_CLAUSE = " FOR UPDATE"
+    ROLLUP_REBUILD_LOCK_QUERY = "LOCK TABLE supply IN SHARE MODE"
+
+    def __init__(self, user=username, password=password, dsn=dsn):
+        self.user = user
+        self.password = password
+        self.dsn = dsn
+        self.pool = None
+        self.pool_lock = threading.Lock()
+
+    # Function to get the connection pool, creating it on first use
+    def get_pool(self):
+        with self.pool_lock:
+            if self.pool is None:
+                self.pool = oracledb.create_pool(
+                    user=self.user,
+                    password=self.password,
+                    dsn=self.dsn,
+                    min=POOL_MIN,
+                    max=POOL_MAX,
+                    increment=POOL_INCREMENT,
+                )
+        return self.pool
+
+    @contextmanager
+    def connection(self):
+        connection = self.get_pool().acquire()
+        try:
+            yield connection
+        finally:
+            connection.close()  # Returns the connection to the pool
+
+    # The array size and prefetch are tuned to the batch size so each batch
+    # is one round trip
+    def cursor(self, connection, batch_size=None):
+        cursor = connection.cursor()
+        if batch_size:
+            cursor.arraysize = batch_size
+            cursor.prefetchrows = batch_size + 1
+        return cursor
+
+    def table_exists(self, cursor, table_name):
+        cursor.execute(
+            "SELECT COUNT(*) FROM user_tables WHERE table_name = :table_name",
+            {"table_name": table_name.upper()},
+        )
+        return cursor.fetchone()[0] > 0
+
+    # The plan is explained without binding values (Oracle peeks at none), and
+    # read back from the plan table as formatted by DBMS_XPLAN
+    def explain(self, cursor, query, params=None):
+        cursor.execute("EXPLAIN PLAN FOR " + query)
+        cursor.execute("SELECT plan_table_output FROM TABLE(DBMS_XPLAN.DISPLAY())")
+        return [row[0] for row in cursor.fetchall()]
+
+    # Array binding with batch errors: one round trip for the whole batch
+    def execute_many(self, cursor, query, rows):
+        cursor.executemany(query, rows, batcherrors=True)
+        return [(error.offset, error.message) for error in cursor.getbatcherrors()]
+
+    def close(self):
+        with self.pool_lock:
+            if self.pool is not None:
+                self.pool.close(force=True)
+                self.pool = None
@@ -0,0 +1,159 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+from background import run_in_background
+from common import TreeviewSync, format_timestamp
+
+# Number of rows shown per page
+PAGE_SIZE = 100
+
+
+# Table that only keeps the visible page of rows in the Treeview. Pages are
+# read from the database with keyset pagination: fetch_page(after, limit)
+# returns the rows that follow the row after (None for the first page), so
+# loading, scrolling and refreshing cost O(page) instead of O(table).
+class PagedTable:
+    def __init__(self, parent, columns, fetch_page, page_size=PAGE_SIZE):
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.page_starts = [None]  # Row preceding each visited page
+        self.rows = []
+        self.has_next = False
+        self.request = 0  # Ignores the results of superseded page loads
+
+        self.frame = tk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings")
+        self.tree.pack()
+        self.sync = TreeviewSync(self.tree)
+        for col in columns:
+            self.tree.heading(col, text=col)
+
+        frame_navigation = tk.Frame(self.frame)
+        frame_navigation.pack(pady=5)
+        self.btn_previous = tk.Button(
+            frame_navigation, text="< Previous", command=self.previous_page
+        )
+        self.btn_previous.grid(row=0, column=0)
+        self.label_page = tk.Label(frame_navigation, width=12)
+        self.label_page.grid(row=0, column=1)
+        self.btn_next = tk.Button(
+            frame_navigation, text="Next >", command=self.next_page
+        )
+        self.btn_next.grid(row=0, column=2)
+
+        # Scrolling past the first/last visible row moves to another page
+        self.tree.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.tree.bind("<Button-4>", lambda event: self.on_scroll(-1))
+        self.tree.bind("<Button-5>", lambda event: self.on_scroll(1))
+
+        self.update_navigation()
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    @property
+    def page_index(self):
+        return len(self.page_starts) - 1
+
+    # Function to (re)load the current page in the background
+    def refresh(self):
+        self.request += 1
+        request = self.request
+        after = self.page_starts[-1]
+
+        def on_done(rows):
+            if request == self.request:
+                self.show_rows(rows)
+
+        def on_error(error):
+            if request == self.request:
+                messagebox.showerror("Database Error", f"Could not load rows: {error}")
+
+        # One extra row tells whether there is a next page
+        run_in_background(
+            self.tree,
+            lambda task: self.fetch_page(after, self.page_size + 1),
+            on_done=on_done,
+            on_error=on_error,
+        )
+
+    # Function to replace the visible rows with the rows of a page
+    # (rows holds one extra row when there is a next page)
+    def show_rows(self, rows):
+        self.set_rows(rows[: self.page_size], len(rows) > self.page_size)
+
+    # Function to show the rows of the page, only touching the changed items
+    def set_rows(self, rows, has_next):
+        self.rows = list(rows)
+        self.has_next = has_next
+        self.sync.sync([(row[0], self.format_row(row)) for row in self.rows])
+        self.update_navigation()
+
+    # Function to format the values of a row before showing them
+    def format_row(self, row):
+        return tuple(format_timestamp(value) for value in row)
+
+    # Function to get the sort key of a row (pages are sorted by descending
+    # created_at then ID, so a greater key comes first)
+    def row_key(self, row):
+        return (format_timestamp(row[-1]), row[0])
+
+    # Function to check if a row not shown yet belongs to the current page
+    def belongs_to_page(self, row):
+        start = self.page_starts[-1]
+        if start is not None and self.row_key(row) >= self.row_key(start):
+            return False
+        if self.has_next and self.rows:
+            return self.row_key(row) > self.row_key(self.rows[-1])
+        return True
+
+    # Function to apply saved changes to the visible page without reading it
+    # again: upserts is {row ID: row} and deleted the removed row IDs. Only the
+    # Treeview items of the affected rows are touched.
+    def apply_changes(self, upserts, deleted=()):
+        deleted = set(deleted)
+        rows = [row for row in self.rows if row[0] not in deleted]
+        positions = {row[0]: index for index, row in enumerate(rows)}
+
+        for row_id, row in upserts.items():
+            if row_id in positions:
+                rows[positions[row_id]] = row
+            elif self.belongs_to_page(row):
+                rows.append(row)
+
+        rows.sort(key=self.row_key, reverse=True)
+        has_next = self.has_next or len(rows) > self.page_size
+        self.set_rows(rows[: self.page_size], has_next)
+
+    # Function to get the IDs of the selected rows
+    def selected_row_ids(self):
+        return self.sync.row_ids(self.tree.selection())
+
+    def next_page(self):
+        if self.has_next and self.rows:
+            self.page_starts.append(self.rows[-1])
+            self.refresh()
+
+    def previous_page(self):
+        if len(self.page_starts) > 1:
+            self.page_starts.pop()
+            self.refresh()
+
+    # Function to go back to the first page (e.g. after new rows were added)
+    def first_page(self):
+        self.page_starts = [None]
+        self.refresh()
+
+    def update_navigation(self):
+        self.label_page.config(text=f"Page {self.page_index + 1}")
+        self.btn_previous.config(state="normal" if self.page_index else "disabled")
+        self.btn_next.config(state="normal" if self.has_next else "disabled")
+
+    def on_mouse_wheel(self, event):
+        self.on_scroll(-1 if event.delta > 0 else 1)
+
+    def on_scroll(self, direction):
+        first, last = self.tree.yview()
+        if direction > 0 and last >= 1.0:
+            self.next_page()
+        elif direction < 0 and first <= 0.0:
+            self.previous_page()
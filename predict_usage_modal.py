@@ -1,9 +1,22 @@
 import tkinter as tk
-from tkinter import ttk
-from datetime import datetime, timedelta
-
-# Default growth rate
-DEFAULT_GROWTH_RATE = 10
+from tkinter import ttk, messagebox
+from background import run_in_background
+from database import is_connection_error
+from forecasting import (
+    HISTORY_DAYS,
+    USED_WINDOW,
+    predict_usage,
+    series_from_snapshot,
+)
+from supply_snapshot import SupplySnapshot
+from usage_prediction import (
+    DEFAULT_GROWTH_RATE,
+    DEFAULT_HORIZON,
+    FORECAST_METHOD_LABELS,
+    SEASON_LENGTH,
+    fetch_usage_series,
+    supplier_label,
+)
 
 
 # Function to allow only numbers (integers or floats) in Entry fields
@@ -17,50 +30,17 @@ def validate_float_input(new_value):
         return False  # If conversion fails, disallow the input
 
 
-# Function to filter supplies within the last 30 days and calculate daily usage
-def filter_recent_supplies(supplies):
-    filtered_supplies = {}
-    today = datetime.now()
-    thirty_days_ago = today - timedelta(days=30)
-
-    for supply_id, details in supplies.items():
-        # Convert the 'created_at' field to a datetime object
-        supply_date = datetime.strptime(details["created_at"], "%Y-%m-%d %H:%M:%S")
-
-        # If the supply was created within the last 30 days, include it
-        if supply_date >= thirty_days_ago:
-            filtered_supplies[supply_id] = details
-
-    return filtered_supplies
-
-
-# Function to calculate predicted usage based on actual usage over the past 30 days
-def calculate_predicted_usage(supplies, growth_rate, waste_rate):
-    predictions = {}
-    for supply_id, details in supplies.items():
-        # Assuming 'quantity' is the total amount used in the last 30 days
-        total_used = details["quantity"]
-
-        # Calculate daily usage as the total used divided by 30 days
-        daily_usage = total_used / 30 if total_used else 0
+# Function to create and show the modal for supply usage prediction, reading
+# the supplies and supplier names of the shared store
+def show_predict_usage_modal(store):
+    supplies = store.supplies.records
+    suppliers = store.supplier_index
 
-        # Apply growth rate to future usage
-        future_usage = (daily_usage * 30) * (1 + growth_rate / 100)
+    # Daily usage series of each (type, name, supplier), read from the rollups
+    # in the background, or built from the loaded supplies when the database
+    # is unavailable (offline mode). None until they are read.
+    series = None
 
-        # Add waste rate to future usage
-        future_usage = future_usage * (1 + waste_rate / 100)
-
-        predictions[details["name"]] = {
-            "Total Used (last 30 days)": total_used,
-            "Daily Usage (avg)": round(daily_usage, 2),
-            "Predicted Usage (next 30 days)": round(future_usage, 2),
-        }
-
-    return predictions
-
-
-# Function to create and show the modal for supply usage prediction
-def show_predict_usage_modal(supplies):
     # Create a modal window to show predictions
     modal = tk.Toplevel()
     modal.title("Predicted Supply Usage")
@@ -70,8 +50,10 @@ def show_predict_usage_modal(supplies):
 
     # Add description
     description = (
-        "This modal shows the predicted usage of supplies based on the last 30 days.\n"
-        "You can adjust the growth rate and waste rate to predict the usage for the next 30 days."
+        f"This modal forecasts the usage of each supply (type, name and supplier) "
+        f"from its daily usage over the last {HISTORY_DAYS} days.\n"
+        "You can choose the forecasting method, the horizon and a weekly "
+        "seasonality, and adjust the growth rate and waste rate."
     )
     tk.Label(modal, text=description, wraplength=400, justify="left").pack(pady=10)
 
@@ -91,54 +73,88 @@ def show_predict_usage_modal(supplies):
     entry_waste_rate.insert(0, "0")  # Default waste rate of 0%
     entry_waste_rate.pack()
 
+    # Forecast options: horizon, method and weekly seasonality
+    tk.Label(modal, text="Horizon (days)").pack()
+    entry_horizon = tk.Entry(
+        modal, validate="key", validatecommand=(validate_float, "%P")
+    )
+    entry_horizon.insert(0, str(DEFAULT_HORIZON))
+    entry_horizon.pack()
+
+    tk.Label(modal, text="Method").pack()
+    combobox_method = ttk.Combobox(
+        modal, values=list(FORECAST_METHOD_LABELS), state="readonly"
+    )
+    combobox_method.current(0)
+    combobox_method.pack()
+
+    seasonal = tk.BooleanVar(value=False)
+    tk.Checkbutton(modal, text="Weekly seasonality", variable=seasonal).pack()
+
+    status_label = tk.Label(modal, text="Loading the usage history...")
+    status_label.pack()
+
     # Create a table inside the modal
     tree = ttk.Treeview(
         modal,
-        columns=("Name", "Total Used", "Daily Usage", "Predicted Usage"),
+        columns=(
+            "Type",
+            "Name",
+            "Supplier",
+            "Total Used",
+            "Daily Usage",
+            "Predicted Usage",
+        ),
         show="headings",
     )
+    tree.heading("Type", text="Type")
     tree.heading("Name", text="Supply Name")
-    tree.heading("Total Used", text="Total Used (last 30 days)")
+    tree.heading("Supplier", text="Supplier")
+    tree.heading("Total Used", text=f"Total Used (last {USED_WINDOW} days)")
     tree.heading("Daily Usage", text="Daily Usage (avg)")
-    tree.heading("Predicted Usage", text="Predicted Usage (next 30 days)")
+    tree.heading("Predicted Usage", text="Predicted Usage")
 
     tree.pack(pady=10)
 
     # Function to update predictions when button is clicked
     def update_predictions():
+        if series is None:
+            return
         try:
-            # Get growth and waste rates from inputs
+            # Get growth and waste rates and the horizon from inputs
             growth_rate = float(entry_growth_rate.get())
             waste_rate = float(entry_waste_rate.get())
-
-            # Filter supplies to consider only those within the last 30 days
-            recent_supplies = filter_recent_supplies(supplies)
-
-            # Calculate predicted usage for filtered supplies
-            predictions = calculate_predicted_usage(
-                recent_supplies, growth_rate, waste_rate
-            )
-
-            # Clear previous rows in the table
-            for row in tree.get_children():
-                tree.delete(row)
-
-            # Insert new predictions into the table
-            for supply_name, data in predictions.items():
-                tree.insert(
-                    "",
-                    tk.END,
-                    values=(
-                        supply_name,
-                        data["Total Used (last 30 days)"],
-                        data["Daily Usage (avg)"],
-                        data["Predicted Usage (next 30 days)"],
-                    ),
-                )
-
+            horizon = int(float(entry_horizon.get()))
+            if horizon < 1:
+                raise ValueError("horizon")
         except ValueError:
             tk.messagebox.showerror(
-                "Error", "Please enter valid numbers for the rates."
+                "Error", "Please enter valid numbers for the rates and horizon."
+            )
+            return
+
+        # Forecast every series at once
+        predictions = predict_usage(
+            series,
+            horizon,
+            FORECAST_METHOD_LABELS[combobox_method.get()],
+            SEASON_LENGTH if seasonal.get() else None,
+            growth_rate,
+            waste_rate,
+        )
+        tree.heading("Predicted Usage", text=f"Predicted Usage (next {horizon} days)")
+
+        # Clear previous rows in the table
+        for row in tree.get_children():
+            tree.delete(row)
+
+        # Insert new predictions into the table
+        for (supply_type, name, supplier_id), total, daily, predicted in predictions:
+            supplier = supplier_label(supplier_id, suppliers)
+            tree.insert(
+                "",
+                tk.END,
+                values=(supply_type, name, supplier, total, daily, predicted),
             )
 
     # Button to update predictions
@@ -148,5 +164,32 @@ def show_predict_usage_modal(supplies):
 
     tk.Button(modal, text="Close", command=modal.destroy).pack(pady=10)
 
-    # Call update_predictions initially to populate the table with default values
-    update_predictions()
+    # Function to show the predictions once the series are available
+    def show_series(usage_series, source):
+        nonlocal series
+        series = usage_series
+        if modal.winfo_exists():
+            status_label.config(text=f"{len(series.keys)} supply series ({source})")
+            update_predictions()
+
+    # When the database cannot be reached (offline mode), the series are built
+    # from the loaded supplies. Other errors are reported.
+    def on_series_error(error):
+        if not modal.winfo_exists():
+            return
+        if not is_connection_error(error):
+            status_label.config(text="The usage history could not be read.")
+            messagebox.showerror(
+                "Database Error",
+                f"Could not read the usage history: {error}",
+                parent=modal,
+            )
+            return
+        show_series(series_from_snapshot(SupplySnapshot(supplies)), "offline")
+
+    run_in_background(
+        modal,
+        lambda task: fetch_usage_series(),
+        on_done=lambda usage_series: show_series(usage_series, "database"),
+        on_error=on_series_error,
+    )
@@ -0,0 +1,101 @@
+import sys
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+from change_set import ChangeTrackingDict
+
+# Timestamps are stored as whole seconds since this (naive) epoch
+EPOCH = datetime(1970, 1, 1)
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+# Function to convert a created_at value (string or datetime) to seconds.
+# A missing value (NULL column) stays None.
+def to_timestamp(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.strptime(value, TIMESTAMP_FORMAT)
+    return (value - EPOCH) // timedelta(seconds=1)
+
+
+# Function to convert seconds back to the 'YYYY-MM-DD HH:MM:SS' format
+def from_timestamp(seconds):
+    if seconds is None:
+        return None
+    return (EPOCH + timedelta(seconds=seconds)).strftime(TIMESTAMP_FORMAT)
+
+
+# Base class of the compact records. Fields live in __slots__ (no per-row
+# dict), repeated strings are interned and created_at is kept as an integer
+# timestamp. Records behave as read-only mappings with the same keys as the
+# dicts they replace, and created_at always reads as a
+# 'YYYY-MM-DD HH:MM:SS' string, whatever the source of the row was. NULL
+# columns (e.g. a supply without supplier) read as None.
+class Record(Mapping):
+    __slots__ = ()
+    FIELDS = ()
+    INTERNED = ()
+
+    def __init__(self, **details):
+        for field in self.FIELDS:
+            value = details[field]
+            if field == "created_at":
+                self.created_ts = to_timestamp(value)
+            elif field in self.INTERNED and value is not None:
+                setattr(self, field, sys.intern(value))
+            else:
+                setattr(self, field, value)
+
+    # Function to build a record from a details dict, records are kept as is
+    @classmethod
+    def from_details(cls, details):
+        if isinstance(details, cls):
+            return details
+        return cls(**{field: details[field] for field in cls.FIELDS})
+
+    def __getitem__(self, key):
+        if key == "created_at":
+            return from_timestamp(self.created_ts)
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+# Supply record (same keys as the supply dicts used by the pages and modals)
+class SupplyRecord(Record):
+    __slots__ = ("name", "quantity", "supplier", "type", "created_ts")
+    FIELDS = ("name", "quantity", "supplier", "type", "created_at")
+    INTERNED = ("name", "supplier", "type")
+
+
+# Supplier record (same keys as the supplier dicts used by the pages)
+class SupplierRecord(Record):
+    __slots__ = ("name", "email", "created_ts")
+    FIELDS = ("name", "email", "created_at")
+    INTERNED = ("name",)
+
+
+# Change-tracking store of records keyed by ID. Values assigned or loaded as
+# dicts are converted to records, so the store is a drop-in replacement for
+# the page dictionaries.
+class RecordStore(ChangeTrackingDict):
+    def __init__(self, record_type, *args, **kwargs):
+        self.record_type = record_type
+        super().__init__(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, self.record_type.from_details(value))
+
+    def load_more(self, items):
+        return super().load_more(
+            (key, self.record_type.from_details(value)) for key, value in items
+        )
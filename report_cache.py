@@ -0,0 +1,75 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Number of reports kept (one per kind of report and parameters, e.g. time
+# windows), overridable through an environment variable
+REPORT_CACHE_SIZE = int(os.environ.get("AGRI_REPORT_CACHE_SIZE", "16"))
+
+
+# Least recently used cache of computed reports. Entries are only valid for
+# the data version they were computed at (see database.get_data_version):
+# when the version changes, every entry is dropped. Safe to use from the
+# background threads.
+class ReportCache:
+    def __init__(self, maxsize=REPORT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # Function to drop the entries of another data version
+    def check_version(self, version):
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.version = version
+
+    # Function to get a cached report, or None when it must be computed
+    def peek(self, version, key):
+        with self.lock:
+            self.check_version(version)
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+    # Function to get a report, computing it with compute() on a miss. The
+    # computation runs outside the lock, so a slow report does not block the
+    # other ones.
+    def get(self, version, key, compute):
+        report = self.peek(version, key)
+        if report is not None:
+            return report
+
+        report = compute()
+        with self.lock:
+            self.misses += 1
+            self.check_version(version)
+            self.entries[key] = report
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return report
+
+    # Function to get the cache counters
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self.entries),
+            }
+
+
+# Cache shared by the report modals
+report_cache = ReportCache()
@@ -0,0 +1,173 @@
+# Daily and monthly usage rollups: supply quantities summed per day (and per
+# month) for each type, name and supplier. They are updated in the same
+# transaction as each save_supplies batch, so the usage report and the
+# predictions read a few aggregated rows instead of the whole supply history.
+#
+# Usage: python rollups.py (rebuilds the rollups from the supply table)
+from collections import defaultdict
+from datetime import date
+
+# supplier_id stored for supplies without a supplier (part of the primary key)
+NO_SUPPLIER = "-"
+
+# Number of IDs per "id IN (...)" lookup (Oracle accepts up to 1000)
+LOOKUP_CHUNK_SIZE = 500
+
+
+# Function to get the 'YYYY-MM-DD' day of a created_at (date, datetime or
+# string), None when it is missing
+def day_key(created_at):
+    if created_at is None:
+        return None
+    if isinstance(created_at, date):
+        return created_at.strftime("%Y-%m-%d")
+    return created_at[:10]
+
+
+# Rollup changes of one save: the contributions of the rows before the save
+# are subtracted and those of the saved rows are added, then only the
+# affected rollup rows are written
+class UsageRollup:
+    def __init__(self, storage, cursor):
+        self.storage = storage
+        self.cursor = cursor
+        self.previous = {}  # Row ID -> (day, type, name, supplier_id, quantity)
+
+    # Function to read the current contributions of the rows about to be
+    # saved or deleted (locked until the commit where the backend can)
+    def load_previous(self, row_ids):
+        row_ids = list(row_ids)
+        for start in range(0, len(row_ids), LOOKUP_CHUNK_SIZE):
+            chunk = row_ids[start : start + LOOKUP_CHUNK_SIZE]
+            params = {f"id{index}": row_id for index, row_id in enumerate(chunk)}
+            self.cursor.execute(
+                self.storage.ROLLUP_PREVIOUS_QUERY.format(
+                    ids=", ".join(f":{name}" for name in params)
+                )
+                + self.storage.ROW_LOCK_CLAUSE,
+                params,
+            )
+            for (
+                row_id,
+                supply_type,
+                name,
+                supplier_id,
+                quantity,
+                created_at,
+            ) in self.cursor.fetchall():
+                self.previous[row_id] = (
+                    day_key(created_at),
+                    supply_type,
+                    name,
+                    supplier_id or NO_SUPPLIER,
+                    quantity,
+                )
+
+    # Function to write the rollup changes of the save. upserts is
+    # {row ID: supply bind values} and errors the rejected row IDs, which
+    # keep their previous contribution.
+    def apply(self, upserts, errors=()):
+        daily = defaultdict(lambda: [0, 0])  # Key -> [quantity, row count]
+
+        for row_id, (
+            day,
+            supply_type,
+            name,
+            supplier_id,
+            quantity,
+        ) in self.previous.items():
+            if row_id not in errors:
+                delta = daily[(day, supply_type, name, supplier_id)]
+                delta[0] -= quantity
+                delta[1] -= 1
+
+        for row_id, values in upserts.items():
+            if row_id not in errors:
+                _, name, quantity, supplier_id, supply_type, created_at = values
+                delta = daily[
+                    (day_key(created_at), supply_type, name, supplier_id or NO_SUPPLIER)
+                ]
+                delta[0] += quantity
+                delta[1] += 1
+
+        monthly = defaultdict(lambda: [0, 0])
+        for (day, supply_type, name, supplier_id), (quantity, count) in daily.items():
+            delta = monthly[(day[:7], supply_type, name, supplier_id)]
+            delta[0] += quantity
+            delta[1] += count
+
+        self.write(
+            daily,
+            self.storage.DAILY_ROLLUP_UPSERT_QUERY,
+            self.storage.DAILY_ROLLUP_CLEANUP_QUERY,
+        )
+        self.write(
+            monthly,
+            self.storage.MONTHLY_ROLLUP_UPSERT_QUERY,
+            self.storage.MONTHLY_ROLLUP_CLEANUP_QUERY,
+        )
+
+    # Function to add the deltas to the rollup rows, in key order so
+    # concurrent saves lock them in the same order, and to remove the rows
+    # left without supplies
+    def write(self, deltas, upsert_query, cleanup_query):
+        rows = [
+            {
+                "period": key[0],
+                "type": key[1],
+                "name": key[2],
+                "supplier_id": key[3],
+                "quantity": quantity,
+                "row_count": count,
+            }
+            for key, (quantity, count) in sorted(deltas.items())
+            if quantity or count
+        ]
+        if rows:
+            self.cursor.executemany(upsert_query, rows)
+
+        emptied = [
+            {key: row[key] for key in ("period", "type", "name", "supplier_id")}
+            for row in rows
+            if row["row_count"] < 0
+        ]
+        if emptied:
+            self.cursor.executemany(cleanup_query, emptied)
+
+
+# Function to recompute the rollups from the live supplies, in the caller's
+# transaction (used by the schema migration that creates the rollup tables)
+def rebuild_rollups_in(storage, cursor):
+    if storage.ROLLUP_REBUILD_LOCK_QUERY:
+        cursor.execute(storage.ROLLUP_REBUILD_LOCK_QUERY)
+    cursor.execute("DELETE FROM supply_usage_monthly")
+    cursor.execute("DELETE FROM supply_usage_daily")
+    cursor.execute(
+        storage.DAILY_ROLLUP_REBUILD_QUERY.format(
+            day_key=storage.DAY_KEY_EXPRESSION, no_supplier=f"'{NO_SUPPLIER}'"
+        )
+    )
+    cursor.execute(storage.MONTHLY_ROLLUP_REBUILD_QUERY)
+
+
+# Function to recompute the rollups from the live supplies (e.g. after rows
+# were changed outside the app)
+def rebuild_rollups(storage):
+    with storage.connection() as connection:
+        cursor = storage.cursor(connection)
+        try:
+            storage.begin(cursor)
+            rebuild_rollups_in(storage, cursor)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+if __name__ == "__main__":
+    from database import get_backend
+
+    rebuild_rollups(get_backend())
+    print("Usage rollups rebuilt.")
@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from storage_backend import StorageBackend
+
+# Database file of the embedded backend (overridable through an environment
+# variable)
+SQLITE_PATH = os.environ.get("AGRI_SQLITE_PATH", "agri.db")
+
+# Same schema as the Oracle database: SQLite accepts the Oracle column types
+SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "oracle-db", "initdb.sql")
+
+# Seconds a writer waits for another writer's transaction before failing
+BUSY_TIMEOUT = 30
+
+# Number of prepared statements kept per connection
+STATEMENT_CACHE_SIZE = 256
+
+# created_at is stored as 'YYYY-MM-DD HH:MM:SS' text and read as a datetime,
+# like the TIMESTAMP columns of Oracle
+sqlite3.register_converter(
+    "TIMESTAMP", lambda value: datetime.fromisoformat(value.decode())
+)
+sqlite3.register_adapter(datetime, lambda value: value.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+# Embedded SQLite backend, so the app and the benchmarks can run without the
+# Oracle container. Each thread gets its own connection (in WAL mode, readers
+# never wait for the writer) and statements stay prepared in the connection's
+# statement cache. Saves run in explicit transactions.
+class SQLiteBackend(StorageBackend):
+    name = "sqlite"
+    CONNECTION_ERRORS = (sqlite3.OperationalError,)
+
+    SUPPLY_PAGE_QUERY = """
+        SELECT s.id, s.name, s.quantity, IFNULL(p.name, 'Unknown'), s.type, s.created_at
+        FROM supply s
+        LEFT JOIN supplier p ON p.id = s.supplier_id
+        WHERE s.deleted_at IS NULL {where}
+        ORDER BY s.created_at DESC, s.id DESC
+        LIMIT :limit
+    """
+    SUPPLIER_PAGE_QUERY = """
+        SELECT s.id, s.name, s.email, s.created_at
+        FROM supplier s
+        WHERE s.deleted_at IS NULL {where}
+        ORDER BY s.created_at DESC, s.id DESC
+        LIMIT :limit
+    """
+
+    SUPPLY_UPSERT_QUERY = """
+        INSERT INTO supply (id, name, quantity, supplier_id, type, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (id) DO UPDATE SET
+            name = excluded.name, quantity = excluded.quantity,
+            supplier_id = excluded.supplier_id, type = excluded.type,
+            created_at = excluded.created_at, deleted_at = NULL
+    """
+    SUPPLIER_UPSERT_QUERY = """
+        INSERT INTO supplier (id, name, email, created_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (id) DO UPDATE SET
+            name = excluded.name, email = excluded.email,
+            created_at = excluded.created_at, deleted_at = NULL
+    """
+
+    # Soft deletes, stamped in local time like created_at (CURRENT_TIMESTAMP
+    # is UTC in SQLite)
+    SUPPLY_DELETE_QUERY = (
+        "UPDATE supply SET deleted_at = datetime('now', 'localtime') WHERE id = ?"
+    )
+    SUPPLIER_DELETE_QUERY = (
+        "UPDATE supplier SET deleted_at = datetime('now', 'localtime') WHERE id = ?"
+    )
+
+    # Rollup rows: the delta of a save is added to the existing row (saves
+    # run in BEGIN IMMEDIATE transactions, so no row locks are needed)
+    DAILY_ROLLUP_UPSERT_QUERY = """
+        INSERT INTO supply_usage_daily
+            (usage_day, type, name, supplier_id, quantity, row_count)
+        VALUES (:period, :type, :name, :supplier_id, :quantity, :row_count)
+        ON CONFLICT (usage_day, type, name, supplier_id) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            row_count = row_count + excluded.row_count
+    """
+    MONTHLY_ROLLUP_UPSERT_QUERY = """
+        INSERT INTO supply_usage_monthly
+            (usage_month, type, name, supplier_id, quantity, row_count)
+        VALUES (:period, :type, :name, :supplier_id, :quantity, :row_count)
+        ON CONFLICT (usage_month, type, name, supplier_id) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            row_count = row_count + excluded.row_count
+    """
+    DAY_KEY_EXPRESSION = "strftime('%Y-%m-%d', created_at)"
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    # Function to open a connection, creating the schema on the first one
+    def connect(self):
+        connection = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            isolation_level=None,  # Transactions are started by begin()
+            check_same_thread=False,  # Only closed by another thread
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute("PRAGMA foreign_keys = ON")
+
+        with self.lock:
+            if not self.table_exists(connection, "supplier"):
+                with open(SCHEMA_FILE, "r") as schema_file:
+                    connection.executescript(schema_file.read())
+            self.connections.append(connection)
+        return connection
+
+    # Each thread reuses its own connection
+    @contextmanager
+    def connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.local.connection = self.connect()
+        yield connection
+
+    def table_exists(self, cursor, table_name):
+        row = cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?",
+            [table_name],
+        ).fetchone()
+        return row[0] > 0
+
+    # One line per step of EXPLAIN QUERY PLAN (e.g. "SEARCH s USING INDEX ...")
+    def explain(self, cursor, query, params=None):
+        cursor.execute("EXPLAIN QUERY PLAN " + query, params or [])
+        return [row[3] for row in cursor.fetchall()]
+
+    # Writers take the write lock up front so concurrent saves queue on the
+    # busy timeout instead of failing when upgrading a read transaction
+    def begin(self, cursor):
+        cursor.execute("BEGIN IMMEDIATE")
+
+    # The batch is first tried as a whole; when a row is rejected it is rolled
+    # back and replayed row by row to report the rejected rows, like the
+    # batch errors of Oracle. Only constraint violations are row errors: any
+    # other error (locked or full database, I/O error) aborts the transaction.
+    def execute_many(self, cursor, query, rows):
+        cursor.execute("SAVEPOINT batch")
+        try:
+            cursor.executemany(query, rows)
+            cursor.execute("RELEASE batch")
+            return []
+        except sqlite3.IntegrityError:
+            cursor.execute("ROLLBACK TO batch")
+            cursor.execute("RELEASE batch")
+
+        errors = []
+        for offset, values in enumerate(rows):
+            try:
+                cursor.execute(query, values)
+            except sqlite3.IntegrityError as e:
+                errors.append((offset, str(e)))
+        return errors
+
+    def close(self):
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+        self.local = threading.local()
@@ -0,0 +1,178 @@
+# Base class of the storage backends. A backend owns the connections and the
+# SQL dialect of one database engine, while database.py runs the shared logic
+# (streaming, keyset pages, usage report and bulk saves) on top of it, so
+# fetch_suppliers, fetch_supplies, save_supplies and save_suppliers work the
+# same with any backend. Rows are returned as tuples with created_at as a
+# datetime, whatever the engine.
+class StorageBackend:
+    name = None
+
+    # Driver errors raised when the database cannot be reached (the app then
+    # works offline from the loaded rows), set by each backend
+    CONNECTION_ERRORS = ()
+
+    # Statements in standard SQL, shared by the backends. Soft deleted rows
+    # (deleted_at set) are filtered out by every query that reads the tables.
+    SUPPLIER_SELECT_QUERY = (
+        "SELECT id, name, email, created_at FROM supplier WHERE deleted_at IS NULL"
+    )
+    SUPPLY_SELECT_QUERY = (
+        "SELECT id, name, quantity, supplier_id, type, created_at FROM supply"
+        " WHERE deleted_at IS NULL"
+    )
+
+    # Filter of the incremental exports: only the rows created at or after a
+    # timestamp (the rows of its second already exported are skipped by ID)
+    CREATED_SINCE_CONDITION = " AND created_at >= :since"
+
+    # Keyset pagination: rows are ordered from the newest to the oldest and a
+    # page starts right after the (created_at, id) of the last row of the
+    # previous one, so reading any page only touches that page's rows
+    PAGE_AFTER_CONDITION = (
+        "AND (s.created_at < :created_at "
+        "OR (s.created_at = :created_at AND s.id < :id))"
+    )
+
+    # Soft deleted rows older than a cutoff, moved to the archive tables by
+    # archive.py. Suppliers still referenced by a supply stay until the
+    # supplies are archived.
+    SUPPLY_ARCHIVE_CANDIDATES_QUERY = "SELECT id FROM supply WHERE deleted_at < :cutoff"
+    SUPPLIER_ARCHIVE_CANDIDATES_QUERY = (
+        "SELECT id FROM supplier WHERE deleted_at < :cutoff AND NOT EXISTS "
+        "(SELECT 1 FROM supply WHERE supply.supplier_id = supplier.id)"
+    )
+    SUPPLY_ARCHIVE_QUERY = (
+        "INSERT INTO supply_archive "
+        "(id, name, quantity, type, supplier_id, created_at, deleted_at, archived_at) "
+        "SELECT id, name, quantity, type, supplier_id, created_at, deleted_at, "
+        ":archived_at FROM supply WHERE id = :id"
+    )
+    SUPPLIER_ARCHIVE_QUERY = (
+        "INSERT INTO supplier_archive "
+        "(id, name, email, created_at, deleted_at, archived_at) "
+        "SELECT id, name, email, created_at, deleted_at, :archived_at "
+        "FROM supplier WHERE id = :id"
+    )
+    SUPPLY_PURGE_QUERY = "DELETE FROM supply WHERE id = :id"
+    SUPPLIER_PURGE_QUERY = "DELETE FROM supplier WHERE id = :id"
+
+    # Usage report read from the rollup tables (see rollups.py): one row per
+    # group of each section, flagged like Oracle's GROUPING. Totals by type,
+    # name and supplier come from the monthly rollup, months and days of the
+    # recent windows from the daily one ('YYYY-MM-DD' bounds).
+    USAGE_REPORT_QUERY = """
+        SELECT 0, 1, 1, 1, type, NULL, NULL, NULL, NULL, SUM(quantity)
+        FROM supply_usage_monthly GROUP BY type
+        UNION ALL
+        SELECT 1, 0, 1, 1, NULL, name, NULL, NULL, NULL, SUM(quantity)
+        FROM supply_usage_monthly GROUP BY name
+        UNION ALL
+        SELECT 1, 1, 0, 1, NULL, NULL, COALESCE(p.name, 'Unknown'), NULL, NULL,
+            SUM(u.quantity)
+        FROM supply_usage_monthly u
+        LEFT JOIN supplier p ON p.id = u.supplier_id
+        GROUP BY COALESCE(p.name, 'Unknown')
+        UNION ALL
+        SELECT 1, 1, 1, 0, NULL, NULL, NULL, SUBSTR(usage_day, 1, 7), NULL,
+            SUM(quantity)
+        FROM supply_usage_daily WHERE usage_day >= :month_since
+        GROUP BY SUBSTR(usage_day, 1, 7)
+        UNION ALL
+        SELECT 1, 1, 1, 1, NULL, NULL, NULL, NULL, usage_day, SUM(quantity)
+        FROM supply_usage_daily WHERE usage_day >= :day_since
+        GROUP BY usage_day
+    """
+
+    # Daily usage of each (type, name, supplier) since a day, for the
+    # forecasts
+    DAILY_USAGE_QUERY = """
+        SELECT usage_day, type, name, supplier_id, quantity
+        FROM supply_usage_daily WHERE usage_day >= :since
+    """
+
+    # Contributions of saved rows to the rollups before the save ({ids} is a
+    # list of bind variables), and removal of the emptied rollup rows
+    ROLLUP_PREVIOUS_QUERY = (
+        "SELECT id, type, name, supplier_id, quantity, created_at FROM supply"
+        " WHERE deleted_at IS NULL AND id IN ({ids})"
+    )
+    DAILY_ROLLUP_CLEANUP_QUERY = (
+        "DELETE FROM supply_usage_daily WHERE usage_day = :period AND type = :type"
+        " AND name = :name AND supplier_id = :supplier_id AND row_count = 0"
+    )
+    MONTHLY_ROLLUP_CLEANUP_QUERY = (
+        "DELETE FROM supply_usage_monthly WHERE usage_month = :period"
+        " AND type = :type AND name = :name AND supplier_id = :supplier_id"
+        " AND row_count = 0"
+    )
+
+    # Rollups recomputed from the live supplies ({day_key} is the backend's
+    # DAY_KEY_EXPRESSION and {no_supplier} the quoted rollups.NO_SUPPLIER),
+    # the monthly rollup from the daily one
+    DAILY_ROLLUP_REBUILD_QUERY = """
+        INSERT INTO supply_usage_daily
+            (usage_day, type, name, supplier_id, quantity, row_count)
+        SELECT {day_key}, type, name, COALESCE(supplier_id, {no_supplier}),
+            SUM(quantity), COUNT(*)
+        FROM supply
+        WHERE deleted_at IS NULL
+        GROUP BY {day_key}, type, name, COALESCE(supplier_id, {no_supplier})
+    """
+    MONTHLY_ROLLUP_REBUILD_QUERY = """
+        INSERT INTO supply_usage_monthly
+            (usage_month, type, name, supplier_id, quantity, row_count)
+        SELECT SUBSTR(usage_day, 1, 7), type, name, supplier_id,
+            SUM(quantity), SUM(row_count)
+        FROM supply_usage_daily
+        GROUP BY SUBSTR(usage_day, 1, 7), type, name, supplier_id
+    """
+
+    # Appended to ROLLUP_PREVIOUS_QUERY to lock the rows until the commit, and
+    # statement run before a rebuild to keep saves out meanwhile
+    ROW_LOCK_CLAUSE = ""
+    ROLLUP_REBUILD_LOCK_QUERY = None
+
+    # Statements of the backend's SQL dialect (see OracleBackend for the
+    # columns and bind variables each one uses)
+    SUPPLY_PAGE_QUERY = None
+    SUPPLIER_PAGE_QUERY = None
+    SUPPLY_UPSERT_QUERY = None
+    SUPPLIER_UPSERT_QUERY = None
+    SUPPLY_DELETE_QUERY = None
+    SUPPLIER_DELETE_QUERY = None
+    DAY_KEY_EXPRESSION = None  # 'YYYY-MM-DD' of created_at
+    DAILY_ROLLUP_UPSERT_QUERY = None  # Adds a delta to a daily rollup row
+    MONTHLY_ROLLUP_UPSERT_QUERY = None  # Adds a delta to a monthly rollup row
+
+    # Context manager to borrow a connection for one operation
+    def connection(self):
+        raise NotImplementedError
+
+    # Function to open a cursor that fetches batch_size rows per round trip
+    def cursor(self, connection, batch_size=None):
+        cursor = connection.cursor()
+        if batch_size:
+            cursor.arraysize = batch_size
+        return cursor
+
+    # Function to check whether a table exists in the database
+    def table_exists(self, cursor, table_name):
+        raise NotImplementedError
+
+    # Function to get the execution plan the database chooses for a query,
+    # as lines of text (used to check which indexes a query uses)
+    def explain(self, cursor, query, params=None):
+        raise NotImplementedError
+
+    # Function to start the transaction of a save
+    def begin(self, cursor):
+        pass
+
+    # Function to run a statement over many rows of bind values. Rejected rows
+    # do not abort the others: they are returned as (offset, message) pairs.
+    def execute_many(self, cursor, query, rows):
+        raise NotImplementedError
+
+    # Function to release the connections when the application exits
+    def close(self):
+        pass
@@ -0,0 +1,102 @@
+from bisect import bisect_left, insort
+from collections.abc import Mapping
+
+# Maximum number of suggestions returned by a prefix search
+SEARCH_LIMIT = 50
+
+# Number of ID characters shown to tell apart suppliers with the same name
+ID_SUFFIX_LENGTH = 8
+
+
+# Bidirectional supplier index: ID -> name (it can be used as the read-only
+# ID -> name mapping the modals expect) and case-folded name -> IDs, plus a
+# sorted list of (case-folded name, ID) for O(log n) prefix lookups. It is
+# updated incrementally as suppliers are loaded, added or removed.
+class SupplierIndex(Mapping):
+    def __init__(self, items=()):
+        self.names = {}  # ID -> name
+        self.ids_by_name = {}  # Case-folded name -> set of IDs
+        self.sorted_keys = []  # Sorted (case-folded name, ID) pairs
+        self.load(items)
+
+    def __getitem__(self, supplier_id):
+        return self.names[supplier_id]
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    # Function to replace the content with (ID, name) pairs, sorting once
+    def load(self, items):
+        self.names = dict(items)
+        self.ids_by_name = {}
+        for supplier_id, name in self.names.items():
+            self.ids_by_name.setdefault(name.casefold(), set()).add(supplier_id)
+        self.sorted_keys = sorted(
+            (name.casefold(), supplier_id) for supplier_id, name in self.names.items()
+        )
+
+    # Function to add a supplier, or rename it if it is already indexed
+    def add(self, supplier_id, name):
+        if supplier_id in self.names:
+            self.remove(supplier_id)
+        self.names[supplier_id] = name
+        self.ids_by_name.setdefault(name.casefold(), set()).add(supplier_id)
+        insort(self.sorted_keys, (name.casefold(), supplier_id))
+
+    # Function to remove a supplier from the index
+    def remove(self, supplier_id):
+        name = self.names.pop(supplier_id, None)
+        if name is None:
+            return
+        key = name.casefold()
+        self.ids_by_name[key].discard(supplier_id)
+        if not self.ids_by_name[key]:
+            del self.ids_by_name[key]
+        position = bisect_left(self.sorted_keys, (key, supplier_id))
+        del self.sorted_keys[position]
+
+    # Function to get the IDs of the suppliers with a name (case-insensitive)
+    def ids_for_name(self, name):
+        return sorted(self.ids_by_name.get(name.casefold(), ()))
+
+    # Function to get the label shown in the combobox for a supplier. Names
+    # shared by several suppliers get a short ID suffix to stay unambiguous.
+    def label_of(self, supplier_id):
+        name = self.names[supplier_id]
+        if len(self.ids_by_name[name.casefold()]) > 1:
+            return f"{name} ({supplier_id[:ID_SUFFIX_LENGTH]})"
+        return name
+
+    # Function to resolve a combobox label (or a unique name) to a supplier ID
+    def id_for_label(self, label):
+        ids = self.ids_for_name(label)
+        if len(ids) == 1:
+            return ids[0]
+
+        name, _, suffix = label.rpartition(" (")
+        if suffix.endswith(")"):
+            matches = [
+                supplier_id
+                for supplier_id in self.ids_for_name(name)
+                if supplier_id.startswith(suffix[:-1])
+            ]
+            if len(matches) == 1:
+                return matches[0]
+        return None
+
+    # Function to get the labels of the suppliers whose name starts with a
+    # prefix (case-insensitive), in alphabetical order
+    def search(self, prefix, limit=SEARCH_LIMIT):
+        prefix = prefix.casefold()
+        labels = []
+        position = bisect_left(self.sorted_keys, (prefix,))
+        while position < len(self.sorted_keys) and len(labels) < limit:
+            key, supplier_id = self.sorted_keys[position]
+            if not key.startswith(prefix):
+                break
+            labels.append(self.label_of(supplier_id))
+            position += 1
+        return labels
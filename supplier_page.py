@@ -1,91 +1,225 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from common import (
+    ask_json_filename,
     get_current_timestamp,
-    import_data_from_json,
-    export_data_to_json,
+    format_row_errors,
     generate_unique_id,
     is_valid_email,
-    refresh_table,
 )
-from database import fetch_suppliers, save_suppliers
+from background import ProgressIndicator, run_in_background
+from data_store import store
+from paged_table import PagedTable
+from exporters import EXPORT_OPTIONS, export_table
+from json_import import import_suppliers_file
+from records import SupplierRecord
+from database import (
+    fetch_suppliers_page,
+    iter_supplier_items,
+    save_suppliers,
+)
 
-# Initial data for suppliers
-suppliers = {}
+# Suppliers of the shared store, also read by the supply page and the modals
+suppliers = store.suppliers.records
+
+# Status bar of the page, created by create_supplier_page
+progress_indicator = None
+
+
+# Function to load the suppliers of the shared store in the background, batch
+# by batch as the rows arrive (the table reads its visible page on its own),
+# unless they are loaded already. reload=True reads them again (e.g. after an
+# import).
+def load_suppliers_from_db(widget, reload=False):
+    def on_error(error):
+        messagebox.showerror("Database Error", f"Could not load suppliers: {error}")
+
+    task = store.suppliers.load(widget, reload, on_error=on_error)
+    if task is not None:
+        progress_indicator.track(task, "Loading suppliers...")
+
+
+# Function to refresh the supplier table in the GUI with the saved changes of
+# a snapshot, touching only the affected rows of the visible page
+def refresh_supplier_table(table_suppliers, snapshot, errors=()):
+    table_suppliers.apply_changes(
+        {
+            supplier_id: (
+                supplier_id,
+                details["name"],
+                details["email"],
+                details["created_at"],
+            )
+            for supplier_id, details in snapshot.upserts.items()
+            if supplier_id not in errors
+        },
+        [supplier_id for supplier_id in snapshot.deleted if supplier_id not in errors],
+    )
 
 
-# Function to load suppliers from DB
-def load_suppliers_from_db(tree_suppliers):
-    supplier_rows = fetch_suppliers()
-    suppliers.clear()
-    for row in supplier_rows:
-        supplier_id = row["id"]
-        suppliers[supplier_id] = {
-            "name": row["name"],
-            "email": row["email"],
-            "created_at": row["created_at"],
-        }
-    refresh_table(tree_suppliers, suppliers)
+# Function to save suppliers to the database in the background with error
+# handling. The pending changes are captured here, on the Tk thread.
+def save_suppliers_to_db(table_suppliers, success_message=None):
+    snapshot = suppliers.pending_changes()
 
+    def on_done(errors):
+        store.suppliers.saved(snapshot, errors)
+        refresh_supplier_table(table_suppliers, snapshot, errors)
 
-# Function to save suppliers to the database with error handling
-def save_suppliers_to_db(tree_suppliers):
-    try:
-        # Call the function to save suppliers to the database
-        save_suppliers(suppliers)
-        refresh_table(tree_suppliers, suppliers)
-    except Exception:
+        # Rows rejected by the database are kept pending and reported
+        if errors:
+            messagebox.showwarning(
+                "Partially Saved",
+                f"{len(errors)} suppliers could not be saved:\n"
+                f"{format_row_errors(errors)}",
+            )
+        elif success_message:
+            messagebox.showinfo("Success", success_message)
+
+    def on_error(error):
         # If an error occurs, show an error message with the exception
         messagebox.showerror(
             "Error", "An error occurred while saving suppliers, please restart the app."
         )
 
+    task = run_in_background(
+        table_suppliers.frame,
+        lambda task: save_suppliers(snapshot),
+        on_done=on_done,
+        on_error=on_error,
+    )
+    progress_indicator.track(task, "Saving suppliers...", cancellable=False)
+
 
 # Function to register a new supplier
-def add_supplier(supplier_name, email, tree_suppliers):
-    suppliers[generate_unique_id()] = {
-        "name": supplier_name,
-        "email": email,
-        "created_at": get_current_timestamp(),
-    }
-    save_suppliers_to_db(tree_suppliers)
+def add_supplier(supplier_name, email, table_suppliers):
+    store.suppliers.put(
+        generate_unique_id(),
+        {
+            "name": supplier_name,
+            "email": email,
+            "created_at": get_current_timestamp(),
+        },
+    )
+    save_suppliers_to_db(table_suppliers)
 
 
-# Function to export data when the button is clicked
-def export_data():
-    export_data_to_json(suppliers, "suppliers")
-    messagebox.showinfo("Success", "Data exported successfully!")
+# Function to soft delete the suppliers selected in the table. The deletes are
+# saved as one batch of UPDATEs setting deleted_at.
+def delete_selected_suppliers(table_suppliers):
+    supplier_ids = table_suppliers.selected_row_ids()
+    if not supplier_ids:
+        messagebox.showwarning("No Selection", "Please select the suppliers to delete.")
+        return
+    if not messagebox.askyesno(
+        "Delete Suppliers", f"Delete the {len(supplier_ids)} selected suppliers?"
+    ):
+        return
 
+    store.suppliers.delete(supplier_ids)
+    save_suppliers_to_db(table_suppliers, f"{len(supplier_ids)} suppliers deleted.")
+
+
+# Function to export data when the button is clicked, streaming the rows
+# from the database straight into the file in the background, in the format
+# picked in the GUI (optionally only the rows created since the last export)
+def export_data(widget, export_option="JSON", incremental=False):
+    export_format, compression = EXPORT_OPTIONS[export_option]
+
+    def work(task):
+        return export_table(
+            "suppliers",
+            lambda since=None: iter_supplier_items(since=since),
+            SupplierRecord.FIELDS,
+            export_format,
+            compression,
+            incremental,
+            progress=task.report,
+        )
 
-# Function to handle the import action
-def import_data(tree_suppliers):
-    try:
-        data = import_data_from_json()
+    def on_progress(rows):
+        progress_indicator.set_text(f"Exporting suppliers... {rows} rows")
+
+    def on_done(result):
+        messagebox.showinfo(
+            "Success",
+            f"Data exported successfully! ({result.rows} suppliers in "
+            f"{result.filename})",
+        )
 
-        if data:
-            for supplier_id, details in data.items():
-                suppliers[supplier_id] = {
-                    "name": details["name"],
-                    "email": details["email"],
-                    "created_at": details.get("created_at", get_current_timestamp()),
-                }
+    def on_error(error):
+        messagebox.showerror("Error", f"An error occurred while exporting: {error}")
+
+    task = run_in_background(
+        widget, work, on_done=on_done, on_progress=on_progress, on_error=on_error
+    )
+    progress_indicator.track(task, "Exporting suppliers...", cancellable=False)
 
-            # Update the DB with the new data
-            save_suppliers_to_db(tree_suppliers)
 
-            messagebox.showinfo("Success", "Data imported successfully!")
+# Function to handle the import action. The file is streamed in the
+# background: records are validated and written in batches, so files larger
+# than memory can be imported. Invalid records are skipped and reported.
+def import_data(table_suppliers):
+    try:
+        filename = ask_json_filename()
     except FileNotFoundError:
         messagebox.showwarning("No File Selected", "Please select a JSON file.")
-    except ValueError as ve:
-        messagebox.showerror("Invalid JSON", str(ve))
-    except RuntimeError as re:
-        messagebox.showerror("Error", str(re))
-    except Exception as e:
-        messagebox.showerror("Unexpected Error", f"An unexpected error occurred: {e}")
+        return
+
+    def work(task):
+        return import_suppliers_file(
+            filename,
+            progress=lambda read, saved, failed: task.report((read, saved, failed)),
+            cancelled=lambda: task.cancelled,
+        )
+
+    def on_progress(counts):
+        progress_indicator.set_text(
+            "Importing suppliers... {} read, {} saved, {} skipped".format(*counts)
+        )
+
+    # Show the new rows and reload the suppliers (batches saved before a
+    # cancellation stay imported)
+    def show_imported():
+        table_suppliers.first_page()
+        load_suppliers_from_db(table_suppliers.frame, reload=True)
+
+    def on_done(result):
+        show_imported()
+
+        if result.errors:
+            messagebox.showwarning(
+                "Partially Imported",
+                f"{result.saved} of {result.read} suppliers were imported, "
+                f"{len(result.errors)} were skipped:\n"
+                f"{format_row_errors(result.errors)}",
+            )
+        else:
+            messagebox.showinfo(
+                "Success", f"Data imported successfully! ({result.saved} suppliers)"
+            )
+
+    def on_error(error):
+        if isinstance(error, ValueError):
+            messagebox.showerror("Invalid JSON", str(error))
+        else:
+            messagebox.showerror(
+                "Error", f"An error occurred while importing data: {error}"
+            )
+
+    task = run_in_background(
+        table_suppliers.frame,
+        work,
+        on_done=on_done,
+        on_progress=on_progress,
+        on_error=on_error,
+        on_cancel=show_imported,
+    )
+    progress_indicator.track(task, "Importing suppliers...")
 
 
 # Function to add a new supplier via GUI
-def add_supplier_gui(entry_supplier_name, entry_supplier_email, tree_suppliers):
+def add_supplier_gui(entry_supplier_name, entry_supplier_email, table_suppliers):
     supplier_name = entry_supplier_name.get()
     supplier_email = entry_supplier_email.get()
 
@@ -98,7 +232,7 @@ def add_supplier_gui(entry_supplier_name, entry_supplier_email, tree_suppliers):
         messagebox.showerror("Error", "All fields must be filled!")
         return
 
-    add_supplier(supplier_name, supplier_email, tree_suppliers)
+    add_supplier(supplier_name, supplier_email, table_suppliers)
     clear_supplier_fields(entry_supplier_name, entry_supplier_email)
 
 
@@ -110,6 +244,7 @@ def clear_supplier_fields(entry_supplier_name, entry_supplier_email):
 
 # Function to create the supplier page
 def create_supplier_page(root):
+    global progress_indicator
     frame_suppliers = tk.Frame(root)
 
     # Title and Description
@@ -138,7 +273,7 @@ def create_supplier_page(root):
         frame_add_suppliers,
         text="Add Supplier",
         command=lambda: add_supplier_gui(
-            entry_supplier_name, entry_supplier_email, tree_suppliers
+            entry_supplier_name, entry_supplier_email, table_suppliers
         ),
     )
     btn_add_supplier.grid(row=2, columnspan=2, pady=10)
@@ -148,23 +283,35 @@ def create_supplier_page(root):
     frame_table_suppliers.pack(pady=10)
 
     columns_suppliers = ("ID", "Name", "Email", "Created At")
-    tree_suppliers = ttk.Treeview(
-        frame_table_suppliers, columns=columns_suppliers, show="headings"
+    table_suppliers = PagedTable(
+        frame_table_suppliers, columns_suppliers, fetch_suppliers_page
     )
-    tree_suppliers.pack()
-
-    for col in columns_suppliers:
-        tree_suppliers.heading(col, text=col)
+    table_suppliers.pack()
 
     # Frame for adding new supplies
     frame_footer_buttons = tk.Frame(frame_table_suppliers)
     frame_footer_buttons.pack(pady=10)
 
+    # Export format and incremental export option
+    combobox_export_format = ttk.Combobox(
+        frame_footer_buttons, values=list(EXPORT_OPTIONS), state="readonly"
+    )
+    combobox_export_format.set("JSON")
+    combobox_export_format.grid(row=0, column=1, sticky="ew")
+    only_new_rows = tk.BooleanVar()
+    tk.Checkbutton(
+        frame_footer_buttons,
+        text="Only rows since last export",
+        variable=only_new_rows,
+    ).grid(row=0, column=2, sticky="w")
+
     # Button to export data
     btn_export_data = tk.Button(
         frame_footer_buttons,
-        text="Export Data (JSON)",
-        command=export_data,
+        text="Export Data",
+        command=lambda: export_data(
+            frame_suppliers, combobox_export_format.get(), only_new_rows.get()
+        ),
     )
     btn_export_data.grid(row=1, column=1, sticky="ew")
 
@@ -172,11 +319,43 @@ def create_supplier_page(root):
     btn_import_data = tk.Button(
         frame_footer_buttons,
         text="Import Data (JSON)",
-        command=lambda: import_data(tree_suppliers),
+        command=lambda: import_data(table_suppliers),
     )
     btn_import_data.grid(row=1, column=2, sticky="ew")
 
-    # Load existing suppliers from DB
-    load_suppliers_from_db(tree_suppliers)
+    # Button to delete the selected suppliers
+    btn_delete_suppliers = tk.Button(
+        frame_footer_buttons,
+        text="Delete Selected",
+        command=lambda: delete_selected_suppliers(table_suppliers),
+    )
+    btn_delete_suppliers.grid(row=1, column=3, sticky="ew")
+
+    # Progress of the background loads and saves
+    progress_indicator = ProgressIndicator(frame_suppliers)
+
+    # Show the loading progress of the shared suppliers
+    def on_suppliers_changed(event, data):
+        if event == "batch":
+            progress_indicator.set_text(f"Loading suppliers... {len(suppliers)} rows")
+
+    unsubscribe = store.suppliers.subscribe(on_suppliers_changed)
+
+    def on_destroy(event):
+        if event.widget is frame_suppliers:
+            unsubscribe()
+
+    frame_suppliers.bind("<Destroy>", on_destroy)
+
+    # Load existing suppliers from DB in the background (nothing is read when
+    # the supply page loaded them already). Showing the page again loads them
+    # if their load was cancelled.
+    load_suppliers_from_db(frame_suppliers)
+    frame_suppliers.bind(
+        "<<PageShown>>", lambda event: load_suppliers_from_db(frame_suppliers)
+    )
+
+    # Show the first page of the table
+    table_suppliers.refresh()
 
     return frame_suppliers
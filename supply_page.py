@@ -1,84 +1,93 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from common import (
+    SUPPLY_TYPES,
+    ask_json_filename,
     get_current_timestamp,
-    import_data_from_json,
-    export_data_to_json,
+    format_row_errors,
     generate_unique_id,
-    refresh_table,
 )
-from predict_usage_modal import show_predict_usage_modal
-from usage_report_modal import show_usage_report_modal
-from database import fetch_suppliers, fetch_supplies, save_supplies
+from background import ProgressIndicator, run_in_background
+from data_store import store
+from paged_table import PagedTable
+from exporters import EXPORT_OPTIONS, export_table
+from json_import import import_supplies_file
+from records import SupplyRecord
+from database import (
+    fetch_supplies_page,
+    iter_supply_items,
+    save_supplies,
+)
 
+# Supplies and suppliers (ID -> name index) of the shared store, also read by
+# the supplier page and the modals. The running usage totals of the supplies
+# are kept in the store too.
+supplies = store.supplies.records
+suppliers = store.supplier_index
 
-# Initial data for supplies and suppliers
-supplies = {}
-suppliers = {}
+# Status bar of the page, created by create_supply_page
+progress_indicator = None
 
 # CSV file for supplies and suppliers
 SUPPLY_CSV_FILE = "supplies.csv"
 SUPPLIER_CSV_FILE = "suppliers.csv"
 
-# Predefined supply names for each type
-SUPPLY_TYPES = {
-    "Fertilizers": [
-        "Ammonium Nitrate",
-        "Monoammonium Phosphate (MAP)",
-        "Urea",
-        "Potassium Sulfate",
-        "Organic Fertilizers",
-    ],
-    "Seeds": [
-        "Soybean Seeds",
-        "Hybrid Corn Seeds",
-        "Cotton Seeds",
-        "Wheat Seeds",
-        "Barley Seeds",
-    ],
-}
-
-
-# Function to load suppliers from the database
-def load_suppliers_from_db():
-    global suppliers
-    supplier_rows = fetch_suppliers()
-    suppliers = {row["id"]: row["name"] for row in supplier_rows}
-
-
-# Function to load supplies from the database
-def load_supplies_from_db(tree_supplies):
-    supply_rows = fetch_supplies()
-    supplies.clear()
-    for row in supply_rows:
-        supply_id = row["id"]
-        supplies[supply_id] = {
-            "name": row["name"],
-            "quantity": row["quantity"],
-            "supplier": row["supplier_id"],
-            "type": row["type"],
-            "created_at": row["created_at"],
-        }
-    refresh_supply_table(tree_supplies)
-
-
-# Function to refresh suppliers in the combobox and show success message
-def refresh_suppliers_combobox(combobox_supplier, show_message=False):
-    load_suppliers_from_db()
-    combobox_supplier["values"] = [
-        supplier_name for supplier_name in suppliers.values()
-    ]
 
-    if show_message:
-        messagebox.showinfo("Success", "Suppliers list refreshed successfully!")
+# Function to show a database error raised by a background load
+def show_load_error(error):
+    messagebox.showerror("Database Error", f"Could not load data: {error}")
+
+
+# Function to load the supplies of the shared store in the background (used
+# by the usage report and prediction), unless they are loaded already.
+# reload=True reads them again (e.g. after an import).
+def load_supplies_from_db(widget, reload=False):
+    task = store.supplies.load(widget, reload, on_error=show_load_error)
+    if task is not None:
+        progress_indicator.track(task, "Loading supplies...")
+
+
+# Function to load the suppliers of the shared store (the supplier combobox
+# follows them through its observer), unless they are loaded already
+def load_suppliers_from_db(widget):
+    task = store.suppliers.load(widget, on_error=show_load_error)
+    if task is not None:
+        progress_indicator.track(task, "Loading suppliers...")
+
+
+# Function to show the suppliers matching the typed text in the combobox
+def update_supplier_suggestions(combobox_supplier):
+    combobox_supplier["values"] = suppliers.search(combobox_supplier.get())
+
+
+# Function to load the suppliers and supplies of the shared store when they
+# are not loaded yet (e.g. their first load was cancelled)
+def load_store(widget):
+    load_suppliers_from_db(widget)
+    load_supplies_from_db(widget)
+
+
+# Function to open the usage prediction modal. The modal modules (and NumPy)
+# are imported on first use, so they do not slow down the startup.
+def open_predict_usage_modal(widget):
+    from predict_usage_modal import show_predict_usage_modal
+
+    load_store(widget)
+    show_predict_usage_modal(store)
+
 
+# Function to open the usage report modal (imported on first use)
+def open_usage_report_modal(widget):
+    from usage_report_modal import show_usage_report_modal
 
-# Function to get supplier ID by name
+    load_store(widget)
+    show_usage_report_modal(store)
+
+
+# Function to get supplier ID by name (or by the label of a supplier whose
+# name is shared by other suppliers)
 def get_supplier_id_by_name(supplier_name):
-    for supplier_id, name in suppliers.items():
-        if name == supplier_name:
-            return supplier_id
-    return None
+    return suppliers.id_for_label(supplier_name)
 
 
 # Function to get supplier name by ID
@@ -86,80 +95,197 @@ def get_supplier_name_by_id(supplier_id):
     return suppliers.get(supplier_id, "Unknown")
 
 
-# Function to save supplies to the database with error handling
-def save_supplies_to_db(tree_supplies):
-    try:
-        # Call the function to save supplies to the database
-        save_supplies(supplies)
-        refresh_supply_table(tree_supplies)
-    except Exception:
+# Function to save supplies to the database in the background with error
+# handling. The pending changes are captured here, on the Tk thread.
+def save_supplies_to_db(table_supplies, success_message=None):
+    snapshot = supplies.pending_changes()
+
+    def on_done(errors):
+        store.supplies.saved(snapshot, errors)
+        refresh_supply_table(table_supplies, snapshot, errors)
+
+        # Rows rejected by the database are kept pending and reported
+        if errors:
+            messagebox.showwarning(
+                "Partially Saved",
+                f"{len(errors)} supplies could not be saved:\n"
+                f"{format_row_errors(errors)}",
+            )
+        elif success_message:
+            messagebox.showinfo("Success", success_message)
+
+    def on_error(error):
         # If an error occurs, show an error message with the exception
         messagebox.showerror(
             "Error", "An error occurred while saving supplies, please restart the app."
         )
 
+    task = run_in_background(
+        table_supplies.frame,
+        lambda task: save_supplies(snapshot),
+        on_done=on_done,
+        on_error=on_error,
+    )
+    progress_indicator.track(task, "Saving supplies...", cancellable=False)
+
 
 # Function to register a new supply
-def add_supply(supply_name, quantity, supplier_id, supply_type, tree_supplies):
-    supplies[generate_unique_id()] = {
-        "name": supply_name,
-        "quantity": quantity,
-        "supplier": supplier_id,
-        "type": supply_type,
-        "created_at": get_current_timestamp(),
-    }
-    save_supplies_to_db(tree_supplies)
+def add_supply(supply_name, quantity, supplier_id, supply_type, table_supplies):
+    store.supplies.put(
+        generate_unique_id(),
+        {
+            "name": supply_name,
+            "quantity": quantity,
+            "supplier": supplier_id,
+            "type": supply_type,
+            "created_at": get_current_timestamp(),
+        },
+    )
+    save_supplies_to_db(table_supplies)
+
+
+# Function to soft delete the supplies selected in the table. The deletes are
+# saved as one batch of UPDATEs setting deleted_at.
+def delete_selected_supplies(table_supplies):
+    supply_ids = table_supplies.selected_row_ids()
+    if not supply_ids:
+        messagebox.showwarning("No Selection", "Please select the supplies to delete.")
+        return
+    if not messagebox.askyesno(
+        "Delete Supplies", f"Delete the {len(supply_ids)} selected supplies?"
+    ):
+        return
 
+    store.supplies.delete(supply_ids)
+    save_supplies_to_db(table_supplies, f"{len(supply_ids)} supplies deleted.")
+
+
+# Function to export data when the button is clicked, streaming the rows
+# from the database straight into the file in the background, in the format
+# picked in the GUI (optionally only the rows created since the last export)
+def export_data(widget, export_option="JSON", incremental=False):
+    export_format, compression = EXPORT_OPTIONS[export_option]
+
+    def work(task):
+        return export_table(
+            "supplies",
+            lambda since=None: iter_supply_items(since=since),
+            SupplyRecord.FIELDS,
+            export_format,
+            compression,
+            incremental,
+            progress=task.report,
+        )
+
+    def on_progress(rows):
+        progress_indicator.set_text(f"Exporting supplies... {rows} rows")
 
-# Function to export data when the button is clicked
-def export_data():
-    export_data_to_json(supplies, "supplies")
-    messagebox.showinfo("Success", "Data exported successfully!")
+    def on_done(result):
+        messagebox.showinfo(
+            "Success",
+            f"Data exported successfully! ({result.rows} supplies in "
+            f"{result.filename})",
+        )
 
+    def on_error(error):
+        messagebox.showerror("Error", f"An error occurred while exporting: {error}")
 
-# Function to handle the import action
-def import_data(tree_supplies):
+    task = run_in_background(
+        widget, work, on_done=on_done, on_progress=on_progress, on_error=on_error
+    )
+    progress_indicator.track(task, "Exporting supplies...", cancellable=False)
+
+
+# Function to handle the import action. The file is streamed in the
+# background: records are validated and written in batches, so files larger
+# than memory can be imported. Invalid records are skipped and reported.
+def import_data(table_supplies):
     try:
-        data = import_data_from_json()
-
-        if data:
-            for supply_id, details in data.items():
-                supplies[supply_id] = {
-                    "name": details["name"],
-                    "quantity": details["quantity"],
-                    "supplier": details["supplier"],
-                    "type": details["type"],
-                    "created_at": details.get("created_at", get_current_timestamp()),
-                }
-
-            # Update the CSV file with the new data
-            save_supplies_to_db(tree_supplies)
-
-            messagebox.showinfo("Success", "Data imported successfully!")
+        filename = ask_json_filename()
     except FileNotFoundError:
         messagebox.showwarning("No File Selected", "Please select a JSON file.")
-    except ValueError as ve:
-        messagebox.showerror("Invalid JSON", str(ve))
-    except RuntimeError as re:
-        messagebox.showerror("Error", str(re))
-    except Exception as e:
-        messagebox.showerror("Unexpected Error", f"An unexpected error occurred: {e}")
+        return
 
+    # Suppliers the records may reference, known without another query once
+    # the store has loaded them
+    supplier_ids = set(suppliers) if store.suppliers.loaded else None
 
-# Function to refresh the supply table in the GUI (show supplier name and type)
-def refresh_supply_table(tree_supplies):
-    table_dict = {}
+    def work(task):
+        return import_supplies_file(
+            filename,
+            supplier_ids,
+            progress=lambda read, saved, failed: task.report((read, saved, failed)),
+            cancelled=lambda: task.cancelled,
+        )
 
-    for supply_id, details in supplies.items():
-        table_dict[supply_id] = {
-            "name": details["name"],
-            "quantity": details["quantity"],
-            "supplier": get_supplier_name_by_id(details["supplier"]),
-            "type": details["type"],
-            "created_at": details.get("created_at", get_current_timestamp()),
-        }
+    def on_progress(counts):
+        progress_indicator.set_text(
+            "Importing supplies... {} read, {} saved, {} skipped".format(*counts)
+        )
 
-    refresh_table(tree_supplies, table_dict)
+    # Show the new rows and reload the supplies used by the modals (batches
+    # saved before a cancellation stay imported)
+    def show_imported():
+        table_supplies.first_page()
+        load_supplies_from_db(table_supplies.frame, reload=True)
+
+    def on_done(result):
+        show_imported()
+
+        if result.errors:
+            messagebox.showwarning(
+                "Partially Imported",
+                f"{result.saved} of {result.read} supplies were imported, "
+                f"{len(result.errors)} were skipped:\n"
+                f"{format_row_errors(result.errors)}",
+            )
+        else:
+            messagebox.showinfo(
+                "Success", f"Data imported successfully! ({result.saved} supplies)"
+            )
+
+    def on_error(error):
+        if isinstance(error, ValueError):
+            messagebox.showerror("Invalid JSON", str(error))
+        else:
+            messagebox.showerror(
+                "Error", f"An error occurred while importing data: {error}"
+            )
+
+    task = run_in_background(
+        table_supplies.frame,
+        work,
+        on_done=on_done,
+        on_progress=on_progress,
+        on_error=on_error,
+        on_cancel=show_imported,
+    )
+    progress_indicator.track(task, "Importing supplies...")
+
+
+# Function to build the values of a supply table row (show supplier name)
+def supply_table_row(supply_id, details):
+    return (
+        supply_id,
+        details["name"],
+        details["quantity"],
+        get_supplier_name_by_id(details["supplier"]),
+        details["type"],
+        details.get("created_at", get_current_timestamp()),
+    )
+
+
+# Function to refresh the supply table in the GUI with the saved changes of a
+# snapshot, touching only the affected rows of the visible page
+def refresh_supply_table(table_supplies, snapshot, errors=()):
+    table_supplies.apply_changes(
+        {
+            supply_id: supply_table_row(supply_id, details)
+            for supply_id, details in snapshot.upserts.items()
+            if supply_id not in errors
+        },
+        [supply_id for supply_id in snapshot.deleted if supply_id not in errors],
+    )
 
 
 # Function to update supply names based on the selected type
@@ -173,7 +299,7 @@ def update_supply_names_by_type(combobox_name, combobox_type):
 
 # Function to add a new supply via GUI
 def add_supply_gui(
-    entry_supply_name, entry_quantity, combobox_supplier, combobox_type, tree_supplies
+    entry_supply_name, entry_quantity, combobox_supplier, combobox_type, table_supplies
 ):
     supply_name = entry_supply_name.get()
     quantity = entry_quantity.get()
@@ -187,7 +313,7 @@ def add_supply_gui(
         messagebox.showerror("Error", "All fields must be filled!")
         return
 
-    add_supply(supply_name, int(quantity), supplier_id, supply_type, tree_supplies)
+    add_supply(supply_name, int(quantity), supplier_id, supply_type, table_supplies)
     clear_supply_fields(
         entry_supply_name, entry_quantity, combobox_supplier, combobox_type
     )
@@ -211,13 +337,12 @@ def validate_quantity_input(new_value):
         return False
 
 
-# Function to create the supply page
-def create_supply_page(root):
+# Function to create the supply page. on_loaded() is called the first time
+# the supplies are loaded.
+def create_supply_page(root, on_loaded=None):
+    global progress_indicator
     frame_supplies = tk.Frame(root)
 
-    # Load suppliers whenever entering the supply page
-    load_suppliers_from_db()
-
     # Title and description
     tk.Label(frame_supplies, text="Supply Management", font=("Arial", 18)).pack(pady=10)
     tk.Label(
@@ -251,16 +376,13 @@ def create_supply_page(root):
     entry_quantity.grid(row=2, column=1)
 
     tk.Label(frame_add_supplies, text="Supplier:").grid(row=3, column=0)
-    combobox_supplier = ttk.Combobox(frame_add_supplies, state="readonly")
+    combobox_supplier = ttk.Combobox(frame_add_supplies)
     combobox_supplier.grid(row=3, column=1)
 
-    # Button to refresh the supplier combobox
-    btn_refresh_suppliers = tk.Button(
-        frame_add_supplies,
-        text="Refresh Suppliers",
-        command=lambda: refresh_suppliers_combobox(combobox_supplier, True),
+    # Type-ahead: typing filters the suppliers by name prefix
+    combobox_supplier.bind(
+        "<KeyRelease>", lambda event: update_supplier_suggestions(combobox_supplier)
     )
-    btn_refresh_suppliers.grid(row=3, column=2)
 
     # Button to add supply
     btn_add_supply = tk.Button(
@@ -271,7 +393,7 @@ def create_supply_page(root):
             entry_quantity,
             combobox_supplier,
             combobox_type,
-            tree_supplies,
+            table_supplies,
         ),
     )
     btn_add_supply.grid(row=4, columnspan=2, pady=10)
@@ -281,23 +403,35 @@ def create_supply_page(root):
     frame_table_supplies.pack(pady=10)
 
     columns_supplies = ("ID", "Name", "Quantity", "Supplier", "Type", "Created At")
-    tree_supplies = ttk.Treeview(
-        frame_table_supplies, columns=columns_supplies, show="headings"
+    table_supplies = PagedTable(
+        frame_table_supplies, columns_supplies, fetch_supplies_page
     )
-    tree_supplies.pack()
-
-    for col in columns_supplies:
-        tree_supplies.heading(col, text=col)
+    table_supplies.pack()
 
     # Frame for adding new supplies
     frame_footer_buttons = tk.Frame(frame_table_supplies)
     frame_footer_buttons.pack(pady=10)
 
+    # Export format and incremental export option
+    combobox_export_format = ttk.Combobox(
+        frame_footer_buttons, values=list(EXPORT_OPTIONS), state="readonly"
+    )
+    combobox_export_format.set("JSON")
+    combobox_export_format.grid(row=0, column=1, sticky="ew")
+    only_new_rows = tk.BooleanVar()
+    tk.Checkbutton(
+        frame_footer_buttons,
+        text="Only rows since last export",
+        variable=only_new_rows,
+    ).grid(row=0, column=2, sticky="w")
+
     # Button to export data
     btn_export_data = tk.Button(
         frame_footer_buttons,
-        text="Export Data (JSON)",
-        command=export_data,
+        text="Export Data",
+        command=lambda: export_data(
+            frame_supplies, combobox_export_format.get(), only_new_rows.get()
+        ),
     )
     btn_export_data.grid(row=1, column=1, sticky="ew")
 
@@ -305,7 +439,7 @@ def create_supply_page(root):
     btn_import_data = tk.Button(
         frame_footer_buttons,
         text="Import Data (JSON)",
-        command=lambda: import_data(tree_supplies),
+        command=lambda: import_data(table_supplies),
     )
     btn_import_data.grid(row=1, column=2, sticky="ew")
 
@@ -313,7 +447,7 @@ def create_supply_page(root):
     btn_predict_usage = tk.Button(
         frame_footer_buttons,
         text="Predict Supply Usage",
-        command=lambda: show_predict_usage_modal(supplies),
+        command=lambda: open_predict_usage_modal(frame_supplies),
     )
     btn_predict_usage.grid(row=1, column=3, sticky="ew")
 
@@ -321,14 +455,55 @@ def create_supply_page(root):
     btn_generate_report = tk.Button(
         frame_footer_buttons,
         text="Generate Usage Report",
-        command=lambda: show_usage_report_modal(supplies, suppliers),
+        command=lambda: open_usage_report_modal(frame_supplies),
     )
     btn_generate_report.grid(row=2, column=1, sticky="ew")
 
-    # Load existing supplies from DB
-    load_supplies_from_db(tree_supplies)
+    # Button to delete the selected supplies
+    btn_delete_supplies = tk.Button(
+        frame_footer_buttons,
+        text="Delete Selected",
+        command=lambda: delete_selected_supplies(table_supplies),
+    )
+    btn_delete_supplies.grid(row=2, column=2, sticky="ew")
+
+    # Progress of the background loads and saves
+    progress_indicator = ProgressIndicator(frame_supplies)
+
+    # Follow the shared store: the supplier combobox is updated whenever the
+    # suppliers change, on this page or on the supplier page
+    def on_suppliers_changed(event, data):
+        if event != "batch":
+            update_supplier_suggestions(combobox_supplier)
+
+    def on_supplies_changed(event, data):
+        nonlocal on_loaded
+        if event == "batch":
+            progress_indicator.set_text(f"Loading supplies... {len(supplies)} rows")
+        elif event == "loaded" and on_loaded:
+            on_loaded()
+            on_loaded = None
+
+    unsubscribe = [
+        store.suppliers.subscribe(on_suppliers_changed),
+        store.supplies.subscribe(on_supplies_changed),
+    ]
+
+    def on_destroy(event):
+        if event.widget is frame_supplies:
+            for unsubscribe_observer in unsubscribe:
+                unsubscribe_observer()
+
+    frame_supplies.bind("<Destroy>", on_destroy)
+
+    # Load the suppliers and the existing supplies into the store. Both run in
+    # the background, so the page opens right away, even when the database is
+    # unavailable. Showing the page again loads what is still missing (e.g.
+    # after a cancelled load).
+    load_store(frame_supplies)
+    frame_supplies.bind("<<PageShown>>", lambda event: load_store(frame_supplies))
 
-    # Load the suppliers into the combobox
-    refresh_suppliers_combobox(combobox_supplier)
+    # Show the first page of the table
+    table_supplies.refresh()
 
     return frame_supplies
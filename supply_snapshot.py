@@ -0,0 +1,102 @@
+import numpy as np
+from records import SupplyRecord
+
+
+# Function to encode values as integer codes, in order of first appearance.
+# Returns the codes array and the list of distinct values (code -> value).
+def factorize(values):
+    codes_by_value = {}
+    codes = np.fromiter(
+        (codes_by_value.setdefault(value, len(codes_by_value)) for value in values),
+        dtype=np.int64,
+        count=len(values),
+    )
+    return codes, list(codes_by_value)
+
+
+# Function to sum values per group code (integer sums stay exact integers)
+def group_sum(codes, values, size):
+    if np.issubdtype(values.dtype, np.integer):
+        totals = np.zeros(size, dtype=np.int64)
+        np.add.at(totals, codes, values)
+        return totals
+    return np.bincount(codes, weights=values, minlength=size)
+
+
+# Columnar snapshot of the supplies: one NumPy array per field, with type,
+# name and supplier stored as categorical codes. The analytics run as
+# vectorized group-bys over it instead of row-at-a-time loops over dicts.
+class SupplySnapshot:
+    def __init__(self, supplies):
+        items = supplies.items() if hasattr(supplies, "items") else supplies
+        details = [row for _, row in items]
+
+        self.quantity = np.asarray([row["quantity"] for row in details])
+        if self.quantity.dtype == object or not len(details):
+            self.quantity = self.quantity.astype(np.float64)
+        if details and all(isinstance(row, SupplyRecord) for row in details):
+            # Records already hold integer timestamps, no parsing needed (a
+            # missing one becomes NaT, outside every date window)
+            self.created_at = np.array(
+                [row.created_ts for row in details], dtype="datetime64[s]"
+            ).astype("datetime64[us]")
+        else:
+            self.created_at = np.array(
+                [row["created_at"] for row in details], dtype="datetime64[us]"
+            )
+        self.type_codes, self.types = factorize(
+            [row.get("type", "Unknown") for row in details]
+        )
+        self.name_codes, self.names = factorize([row["name"] for row in details])
+        self.supplier_codes, self.supplier_ids = factorize(
+            [row["supplier"] for row in details]
+        )
+
+    def __len__(self):
+        return len(self.quantity)
+
+    # Function to get the rows created since a datetime, as a boolean mask
+    def created_since(self, since):
+        return self.created_at >= np.datetime64(since, "us")
+
+    # Function to sum the quantities per categorical field, keeping the groups
+    # in order of first appearance
+    def totals_by(self, codes, labels):
+        totals = group_sum(codes, self.quantity, len(labels))
+        return dict(zip(labels, totals.tolist()))
+
+    # Function to sum the quantities of the masked rows per calendar unit
+    # ('D' for days, 'M' for months), keyed by 'YYYY-MM-DD' / 'YYYY-MM'
+    def totals_by_period(self, mask, unit):
+        periods = self.created_at[mask].astype(f"datetime64[{unit}]")
+        keys, codes = np.unique(periods, return_inverse=True)
+        totals = group_sum(codes.ravel(), self.quantity[mask], len(keys))
+        return dict(zip(np.datetime_as_string(keys).tolist(), totals.tolist()))
+
+    # Function to sum the quantities per supplier name. Supplier IDs sharing a
+    # name (or unknown IDs) are merged, like in the row-at-a-time report.
+    def totals_by_supplier_name(self, suppliers):
+        names = [
+            suppliers.get(supplier_id, "Unknown") for supplier_id in self.supplier_ids
+        ]
+        name_codes, labels = factorize(names)
+        per_supplier = group_sum(self.supplier_codes, self.quantity, len(names))
+        return dict(
+            zip(labels, group_sum(name_codes, per_supplier, len(labels)).tolist())
+        )
+
+    # Function to get, for each supply name among the masked rows, the position
+    # of its last row. Names are returned in order of first appearance.
+    def last_row_by_name(self, mask):
+        positions = np.flatnonzero(mask)
+        codes = self.name_codes[positions]
+        unique_codes, first = np.unique(codes, return_index=True)
+        _, first_reversed = np.unique(codes[::-1], return_index=True)
+        last = positions[len(codes) - 1 - first_reversed]
+        order = np.argsort(first, kind="stable")
+        return [
+            (self.names[code], position)
+            for code, position in zip(
+                unique_codes[order].tolist(), last[order].tolist()
+            )
+        ]
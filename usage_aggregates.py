@@ -0,0 +1,144 @@
+import heapq
+from datetime import datetime, timedelta
+from rollups import day_key
+from usage_report import calculate_usage
+
+
+# Running totals of quantity by key, with the number of rows of each key so a
+# key disappears with its last row (like a group of calculate_usage)
+class Totals:
+    def __init__(self):
+        self.values = {}  # Key -> [quantity, rows]
+
+    def add(self, key, quantity, rows=1):
+        total = self.values.get(key)
+        if total is None:
+            total = self.values[key] = [0, 0]
+        total[0] += quantity
+        total[1] += rows
+        if total[1] <= 0:
+            del self.values[key]
+
+    def as_dict(self):
+        return {key: quantity for key, (quantity, _) in self.values.items()}
+
+
+# In-process usage totals of the loaded supplies, updated in O(1) when a
+# supply is added or removed instead of recomputing the report from every
+# row. The month and day sections only count the last month_days/day_days:
+# their rows are kept in day buckets, expired in time order through a heap of
+# days. clock returns the current datetime.
+class UsageAggregates:
+    def __init__(self, month_days=90, day_days=30, clock=datetime.now):
+        self.month_days = month_days
+        self.day_days = day_days
+        self.clock = clock
+        self.clear()
+
+    # Function to forget every supply (e.g. before the supplies are reloaded)
+    def clear(self):
+        self.by_type = Totals()
+        self.by_name = Totals()
+        self.by_supplier = Totals()  # By supplier ID, named when read
+        self.by_month = Totals()
+        self.by_day = Totals()
+        self.month_buckets = Totals()  # By day, month window
+        self.month_days_heap = []
+        self.day_buckets = Totals()  # By day, day window
+        self.day_days_heap = []
+        self.today = None
+        self.month_cutoff = None
+        self.day_cutoff = None
+        self.complete = False  # True once all the supplies were added
+        self.expire()
+
+    # Function to add (sign=1) or remove (sign=-1) the usage of one supply
+    def update(self, details, sign=1):
+        self.expire()
+        name = details["name"]
+        quantity = details["quantity"] * sign
+        day = day_key(details["created_at"])
+
+        self.by_type.add(details.get("type", "Unknown"), quantity, sign)
+        self.by_name.add(name, quantity, sign)
+        self.by_supplier.add(details["supplier"], quantity, sign)
+
+        # Supplies without created_at are in no month or day
+        if day is None:
+            return
+
+        if day >= self.month_cutoff:
+            if day not in self.month_buckets.values:
+                heapq.heappush(self.month_days_heap, day)
+            self.month_buckets.add(day, quantity, sign)
+            self.by_month.add(day[:7], quantity, sign)
+
+        if day >= self.day_cutoff:
+            if day not in self.day_buckets.values:
+                heapq.heappush(self.day_days_heap, day)
+            self.day_buckets.add(day, quantity, sign)
+            self.by_day.add(day, quantity, sign)
+
+    def add(self, details):
+        self.update(details, 1)
+
+    def remove(self, details):
+        self.update(details, -1)
+
+    # Function to add many supplies, e.g. a batch loaded from the database
+    def add_many(self, details_list):
+        for details in details_list:
+            self.update(details, 1)
+
+    # Function to move the windows to today, subtracting the usage of the days
+    # that left them (only the oldest days are looked at)
+    def expire(self):
+        today = self.clock().date()
+        if today == self.today:
+            return
+        self.today = today
+        self.month_cutoff = day_key(today - timedelta(days=self.month_days))
+        self.day_cutoff = day_key(today - timedelta(days=self.day_days))
+
+        while self.month_days_heap and self.month_days_heap[0] < self.month_cutoff:
+            day = heapq.heappop(self.month_days_heap)
+            quantity, rows = self.month_buckets.values.pop(day, (0, 0))
+            if rows:
+                self.by_month.add(day[:7], -quantity, -rows)
+
+        while self.day_days_heap and self.day_days_heap[0] < self.day_cutoff:
+            day = heapq.heappop(self.day_days_heap)
+            quantity, rows = self.day_buckets.values.pop(day, (0, 0))
+            if rows:
+                self.by_day.add(day, -quantity, -rows)
+
+    # Function to get the usage report totals: five dictionaries (by type,
+    # name, supplier name, month and day) of key -> quantity, like
+    # fetch_usage_report. suppliers maps supplier IDs to names.
+    def report(self, suppliers):
+        self.expire()
+        by_supplier_name = Totals()
+        for supplier_id, (quantity, rows) in self.by_supplier.values.items():
+            by_supplier_name.add(suppliers.get(supplier_id, "Unknown"), quantity, rows)
+        return (
+            self.by_type.as_dict(),
+            self.by_name.as_dict(),
+            by_supplier_name.as_dict(),
+            self.by_month.as_dict(),
+            self.by_day.as_dict(),
+        )
+
+
+# Function to compare the running totals with a full recompute of the report
+# (calculate_usage) over the same supplies. Returns the (section, key,
+# running total, recomputed total) of each difference.
+def check_consistency(aggregates, supplies, suppliers):
+    sections = ("type", "name", "supplier", "month", "day")
+    differences = []
+    running = aggregates.report(suppliers)
+    recomputed = [dict(items) for items in calculate_usage(supplies, suppliers)]
+    for section, totals, expected in zip(sections, running, recomputed):
+        for key in totals.keys() | expected.keys():
+            if totals.get(key) != expected.get(key):
+                differences.append((section, key, totals.get(key), expected.get(key)))
+    return differences
@@ -0,0 +1,41 @@
+from database import fetch_daily_usage, get_data_version
+from forecasting import history_start, series_from_daily_rows
+from report_cache import report_cache
+from rollups import NO_SUPPLIER, day_key
+
+# Default growth rate
+DEFAULT_GROWTH_RATE = 10
+
+# Default forecast horizon (days) and the forecasting methods offered, as
+# label -> forecasting method. The first one is the default: most daily usage
+# series are intermittent, and a flat smoothed level suits them best.
+DEFAULT_HORIZON = 30
+FORECAST_METHOD_LABELS = {
+    "Exponential smoothing": "smoothing",
+    "Holt (damped trend)": "holt",
+    "Linear trend": "linear",
+}
+
+# Length of the seasonal pattern when seasonality is enabled (weekly)
+SEASON_LENGTH = 7
+
+
+# Function to read the daily usage series of the history window from the
+# daily rollup (cached until the next save, like the usage report)
+def fetch_usage_series():
+    since = history_start()
+
+    def compute():
+        return series_from_daily_rows(fetch_daily_usage(since))
+
+    return report_cache.get(
+        get_data_version(), ("usage_series", day_key(since)), compute
+    )
+
+
+# Function to get the supplier name shown for a series ("-" for the supplies
+# without supplier). suppliers maps supplier IDs to names.
+def supplier_label(supplier_id, suppliers):
+    if supplier_id in (None, NO_SUPPLIER):
+        return "-"
+    return suppliers.get(supplier_id, "Unknown")
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+from collections import defaultdict
+from database import fetch_usage_report, get_data_version, is_connection_error
+from report_cache import report_cache
+from rollups import day_key
+
+# Time windows (in days) of the usage by day and usage by month sections
+DAY_WINDOW = 30
+MONTH_WINDOW = 90
+
+
+# Helper function to get the start of the month and day windows (whole days,
+# like the rollup tables)
+def get_report_windows():
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=MONTH_WINDOW), today - timedelta(days=DAY_WINDOW)
+
+
+# Helper function to sort the usage totals: categories from most to least
+# used, months and days from the most recent ('YYYY-MM' and 'YYYY-MM-DD' keys
+# sort chronologically as strings)
+def sort_usage(
+    usage_by_type, usage_by_name, usage_by_supplier, usage_by_month, usage_by_day
+):
+    return (
+        sorted(usage_by_type.items(), key=lambda x: x[1], reverse=True),
+        sorted(usage_by_name.items(), key=lambda x: x[1], reverse=True),
+        sorted(usage_by_supplier.items(), key=lambda x: x[1], reverse=True),
+        sorted(usage_by_month.items(), reverse=True),
+        sorted(usage_by_day.items(), reverse=True),
+    )
+
+
+# Helper function to calculate usage statistics. supplies can be a dictionary
+# or an iterable of (id, details) pairs, e.g. streamed from the database.
+def calculate_usage(supplies, suppliers):
+    usage_by_type = defaultdict(int)
+    usage_by_name = defaultdict(int)
+    usage_by_supplier = defaultdict(int)
+    usage_by_month = defaultdict(int)
+    usage_by_day = defaultdict(int)
+
+    last_3_months, last_month = get_report_windows()
+
+    items = supplies.items() if hasattr(supplies, "items") else supplies
+
+    for supply_id, details in items:
+        supply_name = details["name"]
+        supply_type = details.get("type", "Unknown")
+        supplier_id = details["supplier"]
+        supplier_name = suppliers.get(supplier_id, "Unknown")
+        quantity = details["quantity"]
+
+        # Convert the 'created_at' field to a datetime object if it's a string
+        if isinstance(details["created_at"], str):
+            supply_date = datetime.strptime(details["created_at"], "%Y-%m-%d %H:%M:%S")
+        else:
+            supply_date = details["created_at"]
+
+        # Usage by type
+        usage_by_type[supply_type] += quantity
+
+        # Usage by name
+        usage_by_name[supply_name] += quantity
+
+        # Usage by supplier
+        usage_by_supplier[supplier_name] += quantity
+
+        # Supplies without created_at are in no month or day
+        if supply_date is None:
+            continue
+
+        # Usage by day (last month)
+        if supply_date >= last_month:
+            day_key = supply_date.strftime("%Y-%m-%d")
+            usage_by_day[day_key] += quantity
+
+        # Usage by month (last 3 months)
+        if supply_date >= last_3_months:
+            month_key = supply_date.strftime("%Y-%m")
+            usage_by_month[month_key] += quantity
+
+    return sort_usage(
+        usage_by_type, usage_by_name, usage_by_supplier, usage_by_month, usage_by_day
+    )
+
+
+# Helper function to calculate the same usage statistics as calculate_usage
+# with vectorized group-bys over a columnar SupplySnapshot
+def calculate_usage_columnar(snapshot, suppliers):
+    last_3_months, last_month = get_report_windows()
+
+    return sort_usage(
+        snapshot.totals_by(snapshot.type_codes, snapshot.types),
+        snapshot.totals_by(snapshot.name_codes, snapshot.names),
+        snapshot.totals_by_supplier_name(suppliers),
+        snapshot.totals_by_period(snapshot.created_since(last_3_months), "M"),
+        snapshot.totals_by_period(snapshot.created_since(last_month), "D"),
+    )
+
+
+# Function to get the cache key of the usage report of the current windows
+# (the report only depends on the days the windows start on)
+def usage_report_key():
+    month_since, day_since = get_report_windows()
+    return ("usage_report", day_key(month_since), day_key(day_since))
+
+
+# Function to get the usage report computed for the current data, if cached
+def cached_usage_report():
+    return report_cache.peek(get_data_version(), usage_report_key())
+
+
+# Function to read the usage report from the daily and monthly rollup tables,
+# so its cost does not depend on the number of supplies. The report is cached
+# until the next save.
+def fetch_sorted_usage():
+    return report_cache.get(
+        get_data_version(),
+        usage_report_key(),
+        lambda: sort_usage(*fetch_usage_report(*get_report_windows())),
+    )
+
+
+# Function to generate the usage report, falling back to the Python
+# computation over the loaded supplies when the database cannot be reached
+# (offline mode). Other errors are raised.
+def generate_usage_report(supplies, suppliers):
+    try:
+        return fetch_sorted_usage()
+    except Exception as e:
+        if not is_connection_error(e):
+            raise
+        from supply_snapshot import SupplySnapshot
+
+        return calculate_usage_columnar(SupplySnapshot(supplies), suppliers)
@@ -1,80 +1,22 @@
 import tkinter as tk
-from tkinter import ttk
-from datetime import datetime, timedelta
-from collections import defaultdict
-
-
-# Helper function to calculate usage statistics
-def calculate_usage(supplies, suppliers):
-    usage_by_type = defaultdict(int)
-    usage_by_name = defaultdict(int)
-    usage_by_supplier = defaultdict(int)
-    usage_by_month = defaultdict(int)
-    usage_by_day = defaultdict(int)
-
-    today = datetime.now()
-    last_month = today - timedelta(days=30)
-    last_3_months = today - timedelta(days=90)
-
-    for supply_id, details in supplies.items():
-        supply_name = details["name"]
-        supply_type = details.get("type", "Unknown")
-        supplier_id = details["supplier"]
-        supplier_name = suppliers.get(supplier_id, "Unknown")
-        quantity = details["quantity"]
-
-        # Convert the 'created_at' field to a datetime object if it's a string
-        if isinstance(details["created_at"], str):
-            supply_date = datetime.strptime(details["created_at"], "%Y-%m-%d %H:%M:%S")
-        else:
-            supply_date = details["created_at"]
-
-        # Usage by type
-        usage_by_type[supply_type] += quantity
-
-        # Usage by name
-        usage_by_name[supply_name] += quantity
-
-        # Usage by supplier
-        usage_by_supplier[supplier_name] += quantity
-
-        # Usage by day (last month)
-        if supply_date >= last_month:
-            day_key = supply_date.strftime("%Y-%m-%d")
-            usage_by_day[day_key] += quantity
-
-        # Usage by month (last 3 months)
-        if supply_date >= last_3_months:
-            month_key = supply_date.strftime("%Y-%m")
-            usage_by_month[month_key] += quantity
-
-    # Sorting by most recent date for month and day
-    usage_by_month = sorted(
-        usage_by_month.items(),
-        key=lambda x: datetime.strptime(x[0], "%Y-%m"),
-        reverse=True,
-    )
-    usage_by_day = sorted(
-        usage_by_day.items(),
-        key=lambda x: datetime.strptime(x[0], "%Y-%m-%d"),
-        reverse=True,
-    )
-
-    return (
-        sorted(usage_by_type.items(), key=lambda x: x[1], reverse=True),
-        sorted(usage_by_name.items(), key=lambda x: x[1], reverse=True),
-        sorted(usage_by_supplier.items(), key=lambda x: x[1], reverse=True),
-        usage_by_month,
-        usage_by_day,
-    )
-
-
-# Function to create and show the modal for usage report
-def show_usage_report_modal(supplies, suppliers):
-    # Calculate usage statistics
-    usage_by_type, usage_by_name, usage_by_supplier, usage_by_month, usage_by_day = (
-        calculate_usage(supplies, suppliers)
-    )
+from tkinter import ttk, messagebox
+from background import run_in_background
+from database import is_connection_error
+from supply_snapshot import SupplySnapshot
+from usage_report import (
+    cached_usage_report,
+    calculate_usage_columnar,
+    fetch_sorted_usage,
+    sort_usage,
+)
+
+
+# Function to create and show the modal for usage report, reading the
+# supplies, supplier names and running usage totals of the shared store
+def show_usage_report_modal(store):
+    supplies = store.supplies.records
+    suppliers = store.supplier_index
+    usage = store.usage
 
     # Create a modal window to show the report
     modal = tk.Toplevel()
@@ -86,13 +28,15 @@ def show_usage_report_modal(supplies, suppliers):
         "The data is sorted from most used to least used."
     )
     tk.Label(modal, text=description, wraplength=500, justify="left").pack(pady=10)
+    label_status = tk.Label(modal, text="Generating report...")
+    label_status.pack()
 
     # Create notebook (tabs) to organize report sections
     notebook = ttk.Notebook(modal)
     notebook.pack(pady=10, fill="both", expand=True)
 
-    # Helper function to populate tables
-    def create_table(tab, data, columns):
+    # Helper function to create the table of a tab
+    def create_table(tab, columns):
         tree = ttk.Treeview(tab, columns=columns, show="headings")
 
         # Configure columns with center alignment
@@ -100,34 +44,67 @@ def show_usage_report_modal(supplies, suppliers):
             tree.heading(col, text=col, anchor="center")
             tree.column(col, anchor="center")  # Center the data in each column
 
-        for item in data:
-            tree.insert("", tk.END, values=item)
         tree.pack(fill="both", expand=True)
-
-    # Usage by type tab
-    tab_type = ttk.Frame(notebook)
-    notebook.add(tab_type, text="Usage by Type")
-    create_table(tab_type, usage_by_type, ("Type", "Total Used"))
-
-    # Usage by name tab
-    tab_name = ttk.Frame(notebook)
-    notebook.add(tab_name, text="Usage by Supply")
-    create_table(tab_name, usage_by_name, ("Supply Name", "Total Used"))
-
-    # Usage by supplier tab
-    tab_supplier = ttk.Frame(notebook)
-    notebook.add(tab_supplier, text="Usage by Supplier")
-    create_table(tab_supplier, usage_by_supplier, ("Supplier Name", "Total Used"))
-
-    # Usage by month tab
-    tab_month = ttk.Frame(notebook)
-    notebook.add(tab_month, text="Usage by Month")
-    create_table(tab_month, usage_by_month, ("Month", "Total Used"))
-
-    # Usage by day tab (last month)
-    tab_day = ttk.Frame(notebook)
-    notebook.add(tab_day, text="Usage by Day (Last Month)")
-    create_table(tab_day, usage_by_day, ("Day", "Total Used"))
+        return tree
+
+    # One tab per report section: usage by type, name, supplier, month and day
+    sections = [
+        ("Usage by Type", ("Type", "Total Used")),
+        ("Usage by Supply", ("Supply Name", "Total Used")),
+        ("Usage by Supplier", ("Supplier Name", "Total Used")),
+        ("Usage by Month", ("Month", "Total Used")),
+        ("Usage by Day (Last Month)", ("Day", "Total Used")),
+    ]
+    tables = []
+    for title, columns in sections:
+        tab = ttk.Frame(notebook)
+        notebook.add(tab, text=title)
+        tables.append(create_table(tab, columns))
+
+    # Helper function to populate the tables once the report is ready
+    def show_report(report):
+        if not modal.winfo_exists():
+            return
+        label_status.pack_forget()
+        for tree, data in zip(tables, report):
+            for item in data:
+                tree.insert("", tk.END, values=item)
+
+    # When the database cannot be reached (offline mode), the report is
+    # computed from the loaded supplies, here on the Tk thread that owns them.
+    # Other errors are reported.
+    def on_report_error(error):
+        if not modal.winfo_exists():
+            return
+        if not is_connection_error(error):
+            label_status.config(text="The report could not be generated.")
+            messagebox.showerror(
+                "Database Error",
+                f"Could not generate the report: {error}",
+                parent=modal,
+            )
+            return
+        show_report(calculate_usage_columnar(SupplySnapshot(supplies), suppliers))
+        label_status.config(text="Offline: computed from the loaded supplies.")
+        label_status.pack(before=notebook)
+
+    # Show the running totals of the loaded supplies (UsageAggregates) or the
+    # cached report right away when the data did not change since it was
+    # computed, otherwise calculate usage statistics in the database, in the
+    # background
+    if usage.complete:
+        show_report(sort_usage(*usage.report(suppliers)))
+    else:
+        report = cached_usage_report()
+        if report is not None:
+            show_report(report)
+        else:
+            run_in_background(
+                modal,
+                lambda task: fetch_sorted_usage(),
+                on_done=show_report,
+                on_error=on_report_error,
+            )
 
     # Close button
     tk.Button(modal, text="Close", command=modal.destroy).pack(pady=10)